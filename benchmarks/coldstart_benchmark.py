@@ -0,0 +1,170 @@
+"""
+Cold start benchmark for the Lambda entry points.
+
+Every handler referenced by templates/*.yaml is run in fresh interpreters against its sample event from test/, the way
+a new Lambda container would run it. For each entry point the report records the time to import its module, the
+latency of the first call (which includes dependencies loaded lazily on first use), the latency of a warm call and a
+-X importtime breakdown of the import self time per top level package. Importing core, lambda_handlers and
+wrapper_handler without calling anything is measured as well.
+
+Usage:
+    python benchmarks/coldstart_benchmark.py [--output report.json] [--baseline benchmarks/baselines/coldstart.json]
+
+With --baseline the exit status is 1 when a timing regressed by more than --tolerance (and more than --min-delta-ms)
+compared to the baseline. Regenerate the baseline with --output benchmarks/baselines/coldstart.json.
+"""
+from __future__ import print_function
+import argparse
+import glob
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import reporting
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+APP_DIR = os.path.join(ROOT, 'financial_functions')
+TEMPLATES_DIR = os.path.join(ROOT, 'templates')
+EVENTS_DIR = os.path.join(ROOT, 'test')
+
+METRICS = ['import_ms', 'first_call_ms', 'warm_call_ms', 'process_ms']
+
+# Runs in a fresh interpreter with the application directory as working directory and prints the timings as JSON
+CHILD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import {module} as module
+imported = time.perf_counter()
+timings = {{'import_ms': (imported - start) * 1000.0}}
+if {function!r}:
+    handler = getattr(module, {function!r})
+    handler(json.loads({event!r}), None)
+    timings['first_call_ms'] = (time.perf_counter() - imported) * 1000.0
+    warm = []
+    for _ in range({warm_calls}):
+        request = json.loads({event!r})
+        call_start = time.perf_counter()
+        handler(request, None)
+        warm.append((time.perf_counter() - call_start) * 1000.0)
+    warm.sort()
+    timings['warm_call_ms'] = warm[len(warm) // 2]
+print(json.dumps(timings))
+'''
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+def entry_points():
+    """
+    Entry points to benchmark: (case name, module, function, event) tuples for every handler in templates/*.yaml with
+    the matching sample events in test/, followed by the plain module imports
+    """
+    cases = []
+    for template_path in sorted(glob.glob(os.path.join(TEMPLATES_DIR, '*.yaml'))):
+        with open(template_path) as template:
+            handler = re.search(r"Handler: '(\w+)\.(\w+)'", template.read())
+        if handler is None:
+            continue
+        name = os.path.splitext(os.path.basename(template_path))[0]
+        module, function = handler.groups()
+        event_paths = [os.path.join(EVENTS_DIR, name + '.json')]
+        if name == 'wrapper':
+            event_paths = sorted(glob.glob(os.path.join(EVENTS_DIR, 'wrapper-*.json')))
+        for event_path in event_paths:
+            if os.path.exists(event_path):
+                with open(event_path) as event:
+                    case = os.path.splitext(os.path.basename(event_path))[0]
+                    cases.append((case, module, function, event.read()))
+    for module in ('core', 'lambda_handlers', 'wrapper_handler'):
+        cases.append(('import-' + module, module, None, None))
+    return cases
+
+
+def run_child(module, function, event, warm_calls, importtime=False):
+    """
+    Run one entry point in a fresh interpreter
+    :return: Tuple of the timings reported by the child, the wall clock duration of the process in milliseconds and the
+    -X importtime output
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD_SCRIPT.format(module=module, function=function, event=event, warm_calls=warm_calls)]
+
+    # The deployment package is read-only and ships without bytecode for the application modules, so they are compiled
+    # on every cold start as well
+    environment = dict(os.environ, PYTHONDONTWRITEBYTECODE='1', LOG_LEVEL='WARNING')
+    start = time.perf_counter()
+    process = subprocess.run(command, cwd=APP_DIR, env=environment, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    elapsed = (time.perf_counter() - start) * 1000.0
+    if process.returncode != 0:
+        raise RuntimeError('{}.{} failed:\n{}'.format(module, function, process.stderr))
+    return json.loads(process.stdout.strip().splitlines()[-1]), elapsed, process.stderr
+
+
+def import_breakdown(importtime_output):
+    """
+    Aggregate -X importtime output into the import self time in milliseconds per top level package
+    """
+    breakdown = {}
+    for line in importtime_output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            package = match.group(4).split('.')[0]
+            breakdown[package] = breakdown.get(package, 0.0) + int(match.group(1)) / 1000.0
+    return dict((package, round(ms, 3)) for package, ms in breakdown.items() if ms >= 0.5)
+
+
+def benchmark(module, function, event, runs, warm_calls):
+    """
+    Median timings of an entry point over several fresh interpreters, plus the import breakdown of one more run
+    """
+    samples = []
+    for _ in range(runs):
+        timings, elapsed, _ = run_child(module, function, event, warm_calls)
+        timings['process_ms'] = elapsed
+        samples.append(timings)
+    result = dict((metric, round(statistics.median(sample[metric] for sample in samples), 3))
+                  for metric in METRICS if metric in samples[0])
+    _, _, importtime_output = run_child(module, function, event, warm_calls, importtime=True)
+    result['import_breakdown_ms'] = import_breakdown(importtime_output)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per entry point')
+    parser.add_argument('--warm-calls', type=int, default=20, help='warm calls per interpreter')
+    parser.add_argument('--only', nargs='+', help='only run these cases')
+    parser.add_argument('--output', default='-', help="report path, '-' for stdout")
+    parser.add_argument('--baseline', help='baseline report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative slowdown flagged as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help='absolute slowdown always tolerated')
+    options = parser.parse_args()
+
+    cases = {}
+    for case, module, function, event in entry_points():
+        if options.only and case not in options.only:
+            continue
+        cases[case] = benchmark(module, function, event, options.runs, options.warm_calls)
+        print('{:<24} {}'.format(case, ' '.join('{}={}'.format(metric, cases[case][metric])
+                                                for metric in METRICS if metric in cases[case])), file=sys.stderr)
+
+    report = {'environment': reporting.environment(), 'cases': cases}
+    reporting.write_report(options.output, report)
+
+    if options.baseline:
+        regressions = reporting.compare(report, reporting.load_report(options.baseline), METRICS,
+                                        options.tolerance, options.min_delta_ms)
+        reporting.print_regressions(regressions, options.baseline)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+JSON benchmark reports and their comparison against a checked-in baseline.
+
+A report is a dict with an 'environment' entry describing where it was recorded and a 'cases' entry mapping case
+names to dicts of metric values. Lower is better for every metric that is compared.
+"""
+from __future__ import print_function
+import json
+import platform
+import sys
+
+
+def environment():
+    """
+    Describe the machine and interpreter a report was recorded on
+    """
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system()
+    }
+
+
+def write_report(path, report):
+    """
+    Write a report as JSON, to stdout when path is '-'
+    """
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if path == '-':
+        print(text)
+    else:
+        with open(path, 'w') as report_file:
+            report_file.write(text + '\n')
+
+
+def load_report(path):
+    """
+    Read a report written by write_report
+    """
+    with open(path) as report_file:
+        return json.load(report_file)
+
+
+def compare(report, baseline, metrics, tolerance, min_delta):
+    """
+    Compare the cases of a report with a baseline report
+    :param report: Current report
+    :param baseline: Baseline report
+    :param metrics: Names of the metrics to compare, lower values being better
+    :param tolerance: Relative increase over the baseline above which a metric is a regression, e.g. 0.25 for 25%
+    :param min_delta: Absolute increase below which a metric is never a regression, to ignore timer noise
+    :return: List of (case, metric, baseline value, current value) tuples, one per regression
+    """
+    regressions = []
+    for case, values in sorted(report['cases'].items()):
+        baseline_values = baseline['cases'].get(case)
+        if baseline_values is None:
+            continue
+        for metric in metrics:
+            current, previous = values.get(metric), baseline_values.get(metric)
+            if current is None or previous is None:
+                continue
+            if current - previous > max(min_delta, previous * tolerance):
+                regressions.append((case, metric, previous, current))
+    return regressions
+
+
+def print_regressions(regressions, baseline_path, out=sys.stderr):
+    """
+    Print regressions found by compare
+    """
+    if not regressions:
+        print('No regressions against {}'.format(baseline_path), file=out)
+        return
+    print('{} regression(s) against {}:'.format(len(regressions), baseline_path), file=out)
+    for case, metric, previous, current in regressions:
+        print('  {:<32} {:<20} {:>12.3f} -> {:>12.3f} (+{:.0%})'.format(
+            case, metric, previous, current, (current - previous) / previous if previous else float('inf')), file=out)
@@ -0,0 +1,93 @@
+"""
+Scaling benchmark of the shared memory process pool in parallel.py.
+
+Every workload is computed once in this process with the core functions, then with ParallelExecutor for every number
+of workers from 1 to --max-workers. Each parallel run is made twice: with large arrays passed through shared memory
+('shared') and with every job pickled to the workers ('pickled'). The report records per workload, mode and number of
+workers the median time, the speedup over the serial run and the scaling efficiency, the speedup divided by the
+workers. Efficiency can only approach 1 up to the number of physical cores of the machine.
+
+Usage:
+    python benchmarks/scaling_benchmark.py [--size 100000] [--max-workers 4] [--output report.json]
+"""
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import reporting
+import workloads
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'financial_functions'))
+
+import parallel
+
+# Workloads: name mapped to the kernel and a function building its jobs for a size and seed. Rate profiles share one
+# array across jobs, so that it is copied to shared memory once.
+WORKLOADS = {
+    'xnpv_profile': ('xnpv', lambda size, seed: [
+        (rate / 100.0,) + ledger for ledger in [workloads.ledger(size, seed)] for rate in range(1, 17)]),
+    'npv_profile': ('npv', lambda size, seed: [
+        (rate / 1000.0, values) for values in [workloads.cash_flow_series(size, seed)] for rate in range(1, 17)]),
+    'xirr_ledgers': ('xirr', lambda size, seed: [workloads.ledger(size, seed + ledger) for ledger in range(8)]),
+    'irr_batch_loans': ('irr_batch', lambda size, seed: [
+        (workloads.loan_cash_flows(workloads.loan_book(size, seed), 60, seed),)]),
+    'xnpv_small_ledgers': ('xnpv', lambda size, seed: [
+        (0.08,) + workloads.ledger(24, seed + ledger) for ledger in range(max(1, size // 24))])
+}
+
+
+def timed(call, repeat):
+    """
+    Median duration of a call in seconds, after one warm up call
+    """
+    call()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        durations.append(time.perf_counter() - start)
+    return sorted(durations)[len(durations) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=100000, help='ledger rows, cash flows or loans per job')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the workload generator')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1, help='largest number of workers')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--only', nargs='+', choices=sorted(WORKLOADS), help='only run these workloads')
+    parser.add_argument('--output', default='-', help="report path, '-' for stdout")
+    options = parser.parse_args()
+
+    # Overflows while solving long series at extreme rates are expected and handled by the functions
+    warnings.simplefilter('ignore', RuntimeWarning)
+    results = {}
+    for workload in sorted(options.only or WORKLOADS):
+        name, build = WORKLOADS[workload]
+        jobs = build(options.size, options.seed)
+        with parallel.ParallelExecutor(workers=0) as executor:
+            serial = timed(lambda: executor.map(name, jobs), options.repeat)
+        results['{}/serial/0'.format(workload)] = {'seconds': round(serial, 6)}
+        print('{:<20} serial            {:>10.4f} s'.format(workload, serial), file=sys.stderr)
+
+        for workers in range(1, options.max_workers + 1):
+            for mode, threshold in (('shared', parallel.SHARED_MEMORY_THRESHOLD), ('pickled', float('inf'))):
+                with parallel.ParallelExecutor(workers, shared_threshold=threshold) as executor:
+                    seconds = timed(lambda: executor.map(name, jobs), options.repeat)
+                speedup = serial / seconds
+                results['{}/{}/{}'.format(workload, mode, workers)] = {
+                    'seconds': round(seconds, 6), 'speedup': round(speedup, 3),
+                    'efficiency': round(speedup / workers, 3)}
+                print('{:<20} {:<7} {:>2} workers {:>10.4f} s  speedup {:>6.2f}  efficiency {:>5.2f}'.format(
+                    workload, mode, workers, seconds, speedup, speedup / workers), file=sys.stderr)
+
+    report = {'environment': dict(reporting.environment(), cpus=os.cpu_count()), 'seed': options.seed,
+              'size': options.size, 'cases': results}
+    reporting.write_report(options.output, report)
+
+
+if __name__ == '__main__':
+    main()
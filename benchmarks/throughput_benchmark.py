@@ -0,0 +1,296 @@
+"""
+Throughput benchmark of every Lambda handler in lambda_handlers and every public function in core.
+
+Each function is called in a loop on deterministic synthetic workloads from workloads.py (loan books, irregular cash
+flow ledgers and rate schedules) of every requested size it supports. The report records per function and size the
+calls per second, the median and 99th percentile latency and the peak memory allocated by one call, as traced by
+tracemalloc. Functions taking scalars only are run once, with size 1.
+
+Usage:
+    python benchmarks/throughput_benchmark.py [--sizes 1 10 1000 100000] [--only 'handler/x*'] [--phases]
+                                              [--output report.json] [--baseline benchmarks/baselines/throughput.json]
+
+With --phases the handler cases are run with the phase metrics of lambda_handlers recorded into local histograms, and
+their report entries get the median milliseconds spent validating, normalizing, computing and post-processing.
+
+With --baseline the exit status is 1 when the latency or peak memory of a case regressed by more than --tolerance
+compared to the baseline. Regenerate the baseline with --output benchmarks/baselines/throughput.json.
+"""
+from __future__ import print_function
+import argparse
+import collections
+import fnmatch
+import inspect
+import math
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+import reporting
+import workloads
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'financial_functions'))
+
+import numpy
+import core
+import lambda_handlers
+import phase_metrics
+
+METRICS = ['p50_ms', 'p99_ms']
+MEMORY_METRICS = ['peak_memory_kib']
+# Rates of the NPV profile workloads, 1% to 20% in steps of 0.1%
+PROFILE_RATES = [rate / 1000.0 for rate in range(10, 201)]
+
+
+def periodic_request(size, seed, **columns):
+    """
+    Request for a periodic function over a loan book, with scalar arguments for a single loan
+    :param columns: Request argument names mapped to the loan attribute passed for them
+    """
+    loans = workloads.loan_book(size, seed)
+    if size == 1:
+        return dict((name, loans[0][key]) for name, key in columns.items())
+    return dict((name, [loan[key] for loan in loans]) for name, key in columns.items())
+
+
+def amortization_arguments(size, seed):
+    """
+    Positional arguments of the core amortization functions over a loan book
+    """
+    loans = workloads.loan_book(size, seed)
+    rate, nper, pv, when = ([loan[key] for loan in loans] for key in ('rate', 'nper', 'principal', 'type'))
+    return rate, nper, pv, 0, when
+
+
+def ledger_request(size, seed, **extra):
+    """
+    Request for a dated cash flow function over a ledger
+    """
+    values, dates = workloads.ledger(size, seed)
+    return dict(extra, values=values, dates=workloads.iso_dates(dates))
+
+
+def npv_with_derivative(values):
+    """
+    Function returning the NPV of periodic cash flows at a rate and its derivative, as find_root expects
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    periods = numpy.arange(len(values), dtype=numpy.float64)
+
+    def function(rate):
+        with numpy.errstate(over='ignore', invalid='ignore', divide='ignore'):
+            flows = values * (1 + rate) ** -periods
+            return flows.sum(), -(flows * periods).sum() / (1 + rate)
+    return function
+
+
+# Workloads of the handlers: handler name mapped to the minimum size, the maximum size (None if unbounded) and a
+# function building the request for a size and seed. numpy_financial.irr finds the roots of a polynomial of the
+# degree of the number of cash flows, which is cubic in time, so IRR is run on at most 30 years of monthly cash flows.
+HANDLER_WORKLOADS = {
+    'fv': (1, None, lambda size, seed: periodic_request(
+        size, seed, rate='rate', nper='nper', pmt='payment', pv='principal', type='type')),
+    'pv': (1, None, lambda size, seed: periodic_request(
+        size, seed, rate='rate', nper='nper', pmt='payment', type='type')),
+    'pmt': (1, None, lambda size, seed: periodic_request(
+        size, seed, rate='rate', nper='nper', pv='principal', type='type')),
+    'ppmt': (1, None, lambda size, seed: periodic_request(
+        size, seed, rate='rate', per='per', nper='nper', pv='principal', type='type')),
+    'nper': (1, None, lambda size, seed: periodic_request(
+        size, seed, rate='rate', pmt='payment', pv='principal', type='type')),
+    'rate': (1, None, lambda size, seed: periodic_request(
+        size, seed, nper='nper', pmt='payment', pv='principal', type='type')),
+    'fvschedule': (1, None, lambda size, seed: {
+        'principal': 10000, 'schedule': workloads.rate_schedule(size, seed)}),
+    'npv': (2, None, lambda size, seed: {'rate': 0.08, 'values': workloads.cash_flow_series(size, seed)}),
+    'amortization': (1, 1000, lambda size, seed: periodic_request(
+        size, seed, rate='rate', nper='nper', pv='principal', type='type')),
+    'irr': (2, 360, lambda size, seed: {'values': workloads.cash_flow_series(size, seed)}),
+    'mirr': (2, None, lambda size, seed: {
+        'values': workloads.cash_flow_series(size, seed), 'finance_rate': 0.12, 'reinvest_rate': 0.1}),
+    'irr_batch': (1, 100000, lambda size, seed: {
+        'values': workloads.loan_cash_flows(workloads.loan_book(size, seed), 60, seed)}),
+    'xnpv': (2, None, lambda size, seed: ledger_request(size, seed, rate=0.08)),
+    'xirr': (2, None, lambda size, seed: ledger_request(size, seed)),
+    'effect': (1, 1, lambda size, seed: {'nominal_rate': 0.12, 'npery': 12}),
+    'nominal': (1, 1, lambda size, seed: {'effect_rate': 0.12, 'npery': 12}),
+    'sln': (1, 1, lambda size, seed: {'cost': 5000, 'salvage': 300, 'life': 10})
+}
+
+# Workloads of the core functions: function name mapped to the minimum size, the maximum size and a function building
+# the positional arguments for a size and seed
+CORE_WORKLOADS = {
+    'fvschedule': (1, None, lambda size, seed: (10000, workloads.rate_schedule(size, seed))),
+    'xnpv': (2, None, lambda size, seed: (0.08,) + workloads.ledger(size, seed)),
+    'xirr': (2, None, lambda size, seed: workloads.ledger(size, seed)),
+    'cash_flow_series': (2, None, lambda size, seed: workloads.ledger(size, seed)),
+    'xnpv_stream': (2, None, lambda size, seed: (0.08, list(zip(*workloads.ledger(size, seed))))),
+    'xirr_stream': (2, None, lambda size, seed: (list(zip(*workloads.ledger(size, seed))),)),
+    'npv_profile': (2, None, lambda size, seed: (PROFILE_RATES, workloads.cash_flow_series(size, seed))),
+    'xnpv_profile': (2, None, lambda size, seed: (PROFILE_RATES,) + workloads.ledger(size, seed)),
+    'find_root': (2, None, lambda size, seed: (npv_with_derivative(workloads.cash_flow_series(size, seed)), 0.1)),
+    'irr_batch': (1, 100000, lambda size, seed: (
+        workloads.loan_cash_flows(workloads.loan_book(size, seed), 60, seed),)),
+    'amortization_schedule': (1, 1000, lambda size, seed: amortization_arguments(size, seed)),
+    'amortization_schedule_chunks': (1, 100000, lambda size, seed: amortization_arguments(size, seed)),
+    'effect': (1, 1, lambda size, seed: (0.12, 12)),
+    'nominal': (1, 1, lambda size, seed: (0.12, 12)),
+    'rate': (1, 1, lambda size, seed: (60, -200, 10000)),
+    'sln': (1, 1, lambda size, seed: (5000, 300, 10))
+}
+
+
+def handler_names():
+    """
+    Names of the functions in the registry of lambda_handlers, which all have a handler named after them
+    """
+    return sorted(lambda_handlers.FUNCTIONS)
+
+
+def core_function_names():
+    """
+    Names of the public functions defined in core
+    """
+    return sorted(name for name, value in vars(core).items()
+                  if inspect.isfunction(value) and value.__module__ == core.__name__ and not name.startswith('_'))
+
+
+def check_coverage():
+    """
+    Make sure that every handler and core function has a workload, so that new ones are not silently left out
+    """
+    missing = (['handler/' + name for name in handler_names() if name not in HANDLER_WORKLOADS] +
+               ['core/' + name for name in core_function_names() if name not in CORE_WORKLOADS])
+    if missing:
+        raise RuntimeError('No workload for {}, add one to throughput_benchmark.py'.format(', '.join(missing)))
+
+
+def cases(sizes, seed):
+    """
+    Benchmark cases: (case name, function name, size, function building the call to measure) tuples
+    """
+    for kind, names, workloads_by_name in (('handler', handler_names(), HANDLER_WORKLOADS),
+                                           ('core', core_function_names(), CORE_WORKLOADS)):
+        for name in names:
+            min_size, max_size, build = workloads_by_name[name]
+            case_sizes = sorted(set(max(min_size, size if max_size is None else min(size, max_size)) for size in sizes))
+            for size in case_sizes:
+                yield ('{}/{}/{}'.format(kind, name, size), name, size,
+                       lambda kind=kind, name=name, size=size, build=build: bind(kind, name, build(size, seed)))
+
+
+def bind(kind, name, arguments):
+    """
+    Function calling a handler with a request or a core function with its arguments, consuming what generator
+    functions generate
+    """
+    if kind == 'handler':
+        handler = getattr(lambda_handlers, name + '_handler')
+        result = handler(arguments, None)
+        if 'error' in result:
+            raise RuntimeError('{} rejected its workload: {}'.format(name, result['error']))
+        return lambda: handler(arguments, None)
+    function = getattr(core, name)
+    if inspect.isgeneratorfunction(function):
+        return lambda: collections.deque(function(*arguments), maxlen=0)
+    return lambda: function(*arguments)
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest rank percentile of sorted values
+    """
+    return sorted_values[max(0, int(math.ceil(fraction * len(sorted_values))) - 1)]
+
+
+def measure(call, min_time, min_calls, max_calls):
+    """
+    Call a function repeatedly for at least min_time seconds and min_calls calls, after one warm up call
+    :return: Dict with the number of calls, the calls per second, the median and 99th percentile latency in
+    milliseconds and the peak memory allocated during one more call in KiB
+    """
+    call()
+    latencies = []
+    timer = time.perf_counter
+    start = timer()
+    while len(latencies) < min_calls or (timer() - start < min_time and len(latencies) < max_calls):
+        call_start = timer()
+        call()
+        latencies.append(timer() - call_start)
+    elapsed = timer() - start
+    latencies.sort()
+
+    tracemalloc.start()
+    try:
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'calls': len(latencies),
+        'ops_per_sec': round(len(latencies) / elapsed, 3),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000.0, 6),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000.0, 6),
+        'peak_memory_kib': round(peak / 1024.0, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 1000, 100000],
+                        help='loans, cash flows, ledger rows or schedule periods per call')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the workload generator')
+    parser.add_argument('--only', nargs='+', help="only run cases matching these patterns, e.g. 'core/x*'")
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds to call each case for')
+    parser.add_argument('--min-calls', type=int, default=3, help='minimum calls per case')
+    parser.add_argument('--max-calls', type=int, default=100000, help='maximum calls per case')
+    parser.add_argument('--phases', action='store_true', help='record the median time of each phase of the handlers')
+    parser.add_argument('--output', default='-', help="report path, '-' for stdout")
+    parser.add_argument('--baseline', help='baseline report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative slowdown flagged as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help='absolute slowdown always tolerated')
+    parser.add_argument('--min-delta-kib', type=float, default=64.0, help='absolute memory increase always tolerated')
+    options = parser.parse_args()
+
+    check_coverage()
+    # Overflows while solving long series at extreme rates are expected and handled by the functions
+    warnings.simplefilter('ignore', RuntimeWarning)
+    results = {}
+    for case, name, size, build in cases(options.sizes, options.seed):
+        if options.only and not any(fnmatch.fnmatch(case, pattern) for pattern in options.only):
+            continue
+        sink = phase_metrics.HistogramSink()
+        if options.phases and case.startswith('handler/'):
+            lambda_handlers.metrics = phase_metrics.Recorder(sink)
+        try:
+            result = measure(build(), options.min_time, options.min_calls, options.max_calls)
+        finally:
+            lambda_handlers.metrics = phase_metrics.Recorder()
+        result.update(function=name, size=size)
+        results[case] = result
+        print('{:<28} {:>14.1f} ops/s  p50 {:>12.4f} ms  p99 {:>12.4f} ms  peak {:>12.1f} KiB'.format(
+            case, result['ops_per_sec'], result['p50_ms'], result['p99_ms'], result['peak_memory_kib']),
+            file=sys.stderr)
+        if sink.histograms:
+            result['phase_p50_ms'] = dict((phase, sink.histogram(name, phase).percentile(0.5))
+                                          for phase in phase_metrics.PHASES)
+            print('{:<28} {}'.format('', '  '.join('{} {:.4f} ms'.format(phase, milliseconds) for phase, milliseconds
+                                                   in sorted(result['phase_p50_ms'].items()))), file=sys.stderr)
+
+    report = {'environment': reporting.environment(), 'seed': options.seed, 'cases': results}
+    reporting.write_report(options.output, report)
+
+    if options.baseline:
+        baseline = reporting.load_report(options.baseline)
+        regressions = (reporting.compare(report, baseline, METRICS, options.tolerance, options.min_delta_ms) +
+                       reporting.compare(report, baseline, MEMORY_METRICS, options.tolerance, options.min_delta_kib))
+        reporting.print_regressions(regressions, options.baseline)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
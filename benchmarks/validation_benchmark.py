@@ -0,0 +1,73 @@
+"""
+Per-call argument validation overhead of jsonschema.validate compared to the pre-compiled validators in
+schema_validators, for IRR and XNPV payloads of increasing size.
+
+Usage: python benchmarks/validation_benchmark.py [--sizes 10 1000 100000]
+"""
+from __future__ import print_function
+import argparse
+import datetime
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'financial_functions'))
+
+from jsonschema import validate
+import schema_validators
+import validation_json_schemas as schemas
+
+
+def irr_payload(size, rng):
+    """
+    IRR request with one investment followed by size - 1 returns
+    """
+    return {'values': [-1000000.0] + [round(rng.uniform(0, 5000), 2) for _ in range(size - 1)]}
+
+
+def xnpv_payload(size, rng):
+    """
+    XNPV request with size cash flows on consecutive days
+    """
+    start = datetime.date(2000, 1, 1).toordinal()
+    dates = [datetime.date.fromordinal(start + day) for day in range(size)]
+    return {
+        'rate': 0.05,
+        'values': [-1000000.0] + [round(rng.uniform(0, 5000), 2) for _ in range(size - 1)],
+        'dates': ['{}-{}-{}'.format(date.year, date.month, date.day) for date in dates]
+    }
+
+
+def time_per_call(function, min_time=0.5):
+    """
+    Average duration of one call in seconds, repeating the call for at least min_time seconds
+    """
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    while elapsed < min_time:
+        number *= 2
+        elapsed = timer.timeit(number)
+    return elapsed / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--seed', type=int, default=42)
+    options = parser.parse_args()
+
+    rng = random.Random(options.seed)
+    print('{:<6} {:>8} {:>16} {:>16} {:>9}'.format('schema', 'size', 'jsonschema (us)', 'compiled (us)', 'speedup'))
+    for name, build_payload in (('irr', irr_payload), ('xnpv', xnpv_payload)):
+        schema_name = name + '_schema'
+        schema = getattr(schemas, schema_name)
+        for size in options.sizes:
+            payload = build_payload(size, rng)
+            before = time_per_call(lambda: validate(payload, schema))
+            after = time_per_call(lambda: schema_validators.validate(payload, schema_name))
+            print('{:<6} {:>8} {:>16.1f} {:>16.1f} {:>8.1f}x'.format(name, size, before * 1e6, after * 1e6, before / after))
+
+
+if __name__ == '__main__':
+    main()
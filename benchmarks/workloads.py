@@ -0,0 +1,133 @@
+"""
+Deterministic synthetic workloads for the benchmarks.
+
+Every generator takes a size and a seed and always returns the same data for them, so that timings recorded on
+different days or machines are measured on identical inputs. Three kinds of data are generated:
+
+* loan books: amortizing loans with realistic principals, rates and terms,
+* cash flow ledgers: irregularly dated cash flows, an investment followed by returns and occasional further
+  investments, from a handful up to millions of rows,
+* rate schedules: periodic interest rates following a bounded random walk.
+"""
+import datetime
+import math
+import random
+
+TERMS_IN_MONTHS = (12, 24, 36, 60, 84, 120, 180, 240, 300, 360)
+LEDGER_START = datetime.date(2010, 1, 1)
+LEDGER_YEARS = 10
+
+
+def rng(seed, *names):
+    """
+    Random number generator for one workload. String seeds are hashed deterministically, unlike other objects.
+    """
+    return random.Random(':'.join(str(part) for part in (seed,) + names))
+
+
+def loan_book(size, seed=0):
+    """
+    Amortizing loans
+    :param size: Number of loans
+    :param seed: Seed of the generator
+    :return: List of dicts with the principal, the annual rate, the monthly rate, the term in months, the current
+    period, the monthly payment (negative, as paid by the borrower) and whether payments are due at the beginning of
+    the period
+    """
+    generator = rng(seed, 'loan_book', size)
+    loans = []
+    for _ in range(size):
+        principal = round(math.exp(generator.uniform(math.log(5000), math.log(1000000))), -2)
+        annual_rate = round(generator.uniform(0.02, 0.12), 4)
+        rate = annual_rate / 12
+        nper = generator.choice(TERMS_IN_MONTHS)
+        payment = round(principal * rate / (1 - (1 + rate) ** -nper), 2)
+        loans.append({
+            'principal': principal,
+            'annual_rate': annual_rate,
+            'rate': rate,
+            'nper': nper,
+            'per': generator.randint(1, nper),
+            'payment': -payment,
+            'type': 1 if generator.random() < 0.1 else 0
+        })
+    return loans
+
+
+def loan_cash_flows(loans, periods, seed=0):
+    """
+    Periodic cash flows of loans seen from the lender: the principal paid out followed by the monthly payments, some
+    of them missed or increased by a prepayment, truncated or padded with zeros to a fixed number of periods
+    :param loans: Loans from loan_book
+    :param periods: Number of cash flows per loan
+    :param seed: Seed of the generator
+    :return: List of lists of cash flows
+    """
+    generator = rng(seed, 'loan_cash_flows', len(loans), periods)
+    series = []
+    for loan in loans:
+        flows = [-loan['principal']]
+        for _ in range(min(loan['nper'], periods - 1)):
+            draw = generator.random()
+            if draw < 0.02:
+                flows.append(0.0)
+            elif draw < 0.05:
+                flows.append(round(-loan['payment'] * generator.uniform(2, 10), 2))
+            else:
+                flows.append(-loan['payment'])
+        series.append(flows + [0.0] * (periods - len(flows)))
+    return series
+
+
+def cash_flow_series(size, seed=0):
+    """
+    Periodic cash flows of an investment: one outflow followed by size - 1 returns, a few of them negative
+    :param size: Number of cash flows, at least 2
+    :param seed: Seed of the generator
+    :return: List of cash flows
+    """
+    generator = rng(seed, 'cash_flow_series', size)
+    returns = [round(generator.uniform(-0.2, 1.0) * 1000, 2) for _ in range(size - 1)]
+    returns[-1] = abs(returns[-1]) + 1000
+    return [-round(sum(returns) * generator.uniform(0.5, 0.9), 2)] + returns
+
+
+def ledger(size, seed=0):
+    """
+    Irregular cash flow ledger: an investment on the first day followed by size - 1 cash flows at random dates over
+    LEDGER_YEARS years, several of them on the same day for large ledgers
+    :param size: Number of rows, at least 2
+    :param seed: Seed of the generator
+    :return: Tuple of the list of cash flows and the list of their dates, in chronological order
+    """
+    generator = rng(seed, 'ledger', size)
+    horizon = (LEDGER_START.replace(year=LEDGER_START.year + LEDGER_YEARS) - LEDGER_START).days
+    offsets = sorted(generator.randrange(1, horizon) for _ in range(size - 1))
+    dates = [LEDGER_START] + [LEDGER_START + datetime.timedelta(days=offset) for offset in offsets]
+    returns = [round(generator.lognormvariate(6, 1) * (-1 if generator.random() < 0.05 else 1), 2)
+               for _ in range(size - 1)]
+    returns[-1] = abs(returns[-1])
+    return [-round(sum(returns) * generator.uniform(0.6, 0.9), 2)] + returns, dates
+
+
+def rate_schedule(size, seed=0):
+    """
+    Periodic interest rates following a random walk around 4% that stays between 0% and 15%
+    :param size: Number of periods
+    :param seed: Seed of the generator
+    :return: List of rates
+    """
+    generator = rng(seed, 'rate_schedule', size)
+    rate = 0.04
+    schedule = []
+    for _ in range(size):
+        rate = min(0.15, max(0.0, rate + generator.gauss(0, 0.0025)))
+        schedule.append(round(rate, 5))
+    return schedule
+
+
+def iso_dates(dates):
+    """
+    Format dates the way requests pass them
+    """
+    return [date.isoformat() for date in dates]
@@ -0,0 +1,75 @@
+# Binary columnar encoding of large numeric arrays. A column is a dict of the NumPy dtype string, the shape and the
+# base64 of the little-endian array data, such as {"dtype": "<f8", "shape": [3], "data": "AAAAAAAA8D8..."}. Decoding
+# wraps the decoded bytes without copying them, and skips parsing and validating every number as JSON.
+
+import base64
+import binascii
+from lazy_import import LazyModule
+
+numpy = LazyModule('numpy')
+
+# dtypes of binary columns: cash flows and rates as float64, dates as int32 day ordinals
+FLOAT64 = '<f8'
+ORDINAL = '<i4'
+
+# dtypes of encoded results: the array dtype kind mapped to the dtype its arrays are encoded as
+RESULT_DTYPES = {'f': FLOAT64, 'i': '<i8', 'u': '<i8', 'b': '|b1'}
+
+# Value of result_encoding asking for array results as binary columns
+BASE64 = 'base64'
+
+
+def is_column(value):
+    """
+    Whether an argument is a binary column rather than a JSON array
+    """
+    return type(value) is dict and 'data' in value
+
+
+def decode(column):
+    """
+    Array of a binary column, sharing the memory of the decoded bytes. The array is read-only.
+    :param column: Dict with the dtype, shape and base64 data of the array
+    :return: NumPy array
+    :raises ValueError: if the data is not base64 or its size does not match the dtype and shape
+    """
+    try:
+        data = base64.b64decode(column['data'], validate=True)
+    except binascii.Error as err:
+        raise ValueError('data of a binary array is not valid base64: {}'.format(err))
+    dtype = numpy.dtype(column['dtype'])
+    shape = tuple(column['shape'])
+    count = 1
+    for size in shape:
+        count *= size
+    if len(data) != count * dtype.itemsize:
+        raise ValueError('binary array of shape {} and dtype {} needs {} bytes of data, got {}'.format(
+            list(shape), column['dtype'], count * dtype.itemsize, len(data)))
+    return numpy.frombuffer(data, dtype).reshape(shape)
+
+
+def encode(values):
+    """
+    Binary column of an array
+    :param values: NumPy array or nested lists of numbers, None for NaN
+    :return: Dict with the dtype, shape and base64 data of the array
+    """
+    array = numpy.asarray(values)
+    if array.dtype.kind not in RESULT_DTYPES:
+        array = numpy.asarray(values, dtype=numpy.float64)
+    array = numpy.ascontiguousarray(array, dtype=RESULT_DTYPES[array.dtype.kind])
+    return {'dtype': array.dtype.str, 'shape': list(array.shape), 'data': base64.b64encode(array).decode('ascii')}
+
+
+def encode_response(response):
+    """
+    Response with every array of numbers in it encoded as a binary column, including the arrays in dicts and lists of
+    dicts such as the schedules of AMORTIZATION. Scalars, strings and errors are kept as they are.
+    """
+    if isinstance(response, dict):
+        return dict((name, encode_response(value)) for name, value in response.items())
+    if isinstance(response, list) and response and not isinstance(response[0], (dict, str)):
+        return encode(response)
+    if isinstance(response, list):
+        return [encode_response(value) for value in response]
+    return response
@@ -1,32 +1,449 @@
 # Additional financial functions not already provided by numpy
 
+import collections
 import datetime
 import functools
-from scipy import optimize
+import itertools
+import math
+from lazy_import import LazyModule
+
+# Only the cash flow functions need NumPy, the simple ones should not pay for importing it
+numpy = LazyModule('numpy')
+
+# Cash flow count from which xnpv evaluates with NumPy instead of plain Python. Below it the cost of building the arrays
+# outweighs the vectorized evaluation.
+XNPV_NUMPY_THRESHOLD = 64
+
+# Discount factors computed at once by the rate profiles, bounding their memory to 32 MiB per block of rates
+PROFILE_BLOCK_ITEMS = 1 << 22
+
+# Outcome of an iterative solve: the root found, the number of function evaluations used and whether it converged
+SolverResult = collections.namedtuple('SolverResult', ['root', 'iterations', 'converged'])
+
+# Amortization schedule of one or more loans, with one entry per period: the period number starting at 1, the payment,
+# its interest and principal parts and the balance remaining after the payment. Signs follow numpy_financial, a positive
+# pv gives negative payments.
+AmortizationSchedule = collections.namedtuple('AmortizationSchedule',
+                                              ['period', 'payment', 'interest', 'principal', 'balance'])
+
+# Loans per chunk yielded by amortization_schedule_chunks
+AMORTIZATION_CHUNK_SIZE = 1000
+
+# Rates evaluated to find a sign change of the NPV when Newton's method cannot make progress from the guess
+__BRACKET_SCAN_RATES = (-0.99, -0.9, -0.5, -0.2, 0.0, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 100.0)
 
 def fvschedule(principal, schedule=[]):
     """
     Calculates future value with a variable interest rate schedule.
     """
+    if hasattr(schedule, 'tolist'):
+        # Compounding Python floats keeps the results of NumPy arrays and lists identical, and is faster
+        schedule = schedule.tolist()
     return functools.reduce(lambda x, y: x + (x * y), schedule, principal)
 
+class CashFlowSeries(object):
+    """
+    Cash flows as a float64 array, with their dates as int32 day ordinals and year fractions from the first date for
+    dated schedules. Built by cash_flow_series, which checks the series once, so that the functions given a series
+    do not check it again.
+    """
+    __slots__ = ('values', 'ordinals', 'years', 'minimum', 'maximum')
+
+    def __init__(self, values, ordinals, years, minimum, maximum):
+        self.values = values
+        self.ordinals = ordinals
+        self.years = years
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return '<CashFlowSeries len={} min={!r} max={!r} dated={}>'.format(len(self), self.minimum, self.maximum,
+                                                                           self.ordinals is not None)
+
+    @property
+    def has_both_signs(self):
+        """
+        Whether the series has a positive cash flow and a cash flow that is not, as rate of return functions require
+        """
+        return self.maximum > 0 and self.minimum <= 0
+
+    def cache_key(self):
+        """
+        Arrays identifying the series in result cache keys
+        """
+        return self.values, self.ordinals
+
+def cash_flow_series(values, dates=None):
+    """
+    Returns a CashFlowSeries of the cash flows and, for dated schedules, their dates, after checking that there are as
+    many dates as cash flows and that they are in chronological order.
+    Dates can be date/datetime objects, whose time of day is ignored, or a datetime64 or integer day ordinal array.
+    """
+    values = numpy.asarray(values, dtype=numpy.float64).reshape(-1)
+    minimum, maximum = (float(values.min()), float(values.max())) if len(values) else (math.nan, math.nan)
+    if dates is None:
+        return CashFlowSeries(values, None, None, minimum, maximum)
+
+    if len(values) != len(dates):
+        raise ValueError('values and dates must be the same length')
+    ordinals = __day_ordinals(dates)
+    if len(ordinals) > 1 and (ordinals[1:] < ordinals[:-1]).any():
+        raise ValueError('dates must be in chronological order')
+    years = (ordinals - ordinals[0]) / 365.0 if len(ordinals) else numpy.zeros(0)
+    return CashFlowSeries(values, ordinals.astype(numpy.int32), years, minimum, maximum)
+
 def xnpv(rate, values=[], dates=[]):
     """
     Calculates the Net Present Value for a schedule of cash flows that is not necessarily periodic.
+    Dates can be date/datetime objects or, evaluated with NumPy, a datetime64 or integer day ordinal array. values can
+    also be a dated CashFlowSeries, without dates.
     """
+    if isinstance(values, CashFlowSeries):
+        return float((values.values / (1 + rate) ** values.years).sum())
     if len(values) != len(dates):
         raise ValueError('values and dates must be the same length')
-    if sorted(dates) != dates:
+    if len(values) >= XNPV_NUMPY_THRESHOLD or isinstance(dates, numpy.ndarray):
+        return __xnpv_numpy(rate, values, __day_ordinals(dates))
+
+    if any(later < earlier for earlier, later in zip(dates, itertools.islice(dates, 1, None))):
         raise ValueError('dates must be in chronological order')
-        
+
     first_date = dates[0]
-    return sum([value / ((1 + rate) ** ((date - first_date).days/365.0)) for (value, date) in zip(values, dates)])
+    return sum(value / ((1 + rate) ** ((date - first_date).days/365.0)) for (value, date) in zip(values, dates))
+
+def xnpv_stream(rate, cash_flows, derivative=False):
+    """
+    Calculates the Net Present Value of a schedule of cash flows read once from an iterable of (value, date) pairs,
+    such as the rows of a database cursor, in constant memory. Dates are date/datetime objects, whose time of day is
+    ignored, or integer day ordinals. Their chronological order is checked as the pairs are read, and the discounted
+    cash flows are added with Neumaier's compensated summation. With derivative, a tuple of the xnpv and its derivative
+    with respect to the rate is returned, computed in the same pass.
+    """
+    base = 1.0 + rate
+    if not base > 0:
+        return (math.nan, math.nan) if derivative else math.nan
+
+    total = total_error = slope = slope_error = 0.0
+    first = previous = None
+    for value, date in cash_flows:
+        ordinal = date.toordinal() if hasattr(date, 'toordinal') else int(date)
+        if first is None:
+            first = previous = ordinal
+        elif ordinal < previous:
+            raise ValueError('dates must be in chronological order')
+        previous = ordinal
+
+        years = (ordinal - first) / 365.0
+        try:
+            flow = value / base ** years
+        except OverflowError:
+            # The discount factor is beyond the float range, the cash flow is worth nothing
+            flow = 0.0
+        except ZeroDivisionError:
+            flow = math.copysign(math.inf, value) if value else math.nan
+        total, total_error = __neumaier_add(total, total_error, flow)
+        if derivative:
+            slope, slope_error = __neumaier_add(slope, slope_error, -years * flow / base)
+
+    result = __neumaier_total(total, total_error)
+    return (result, __neumaier_total(slope, slope_error)) if derivative else result
+
+def __neumaier_add(total, error, value):
+    """
+    Adds value to a running sum, returning the new sum and the accumulated rounding error of the additions
+    """
+    added = total + value
+    if abs(total) >= abs(value):
+        error += (total - added) + value
+    else:
+        error += (value - added) + total
+    return added, error
+
+def __neumaier_total(total, error):
+    # Infinite or NaN sums make the rounding error NaN, which must not spoil them
+    return total + error if math.isfinite(total) else total
+
+def __day_ordinals(dates):
+    """
+    Returns the given dates as an array of integer day ordinals. The time of day of datetime objects is ignored.
+    """
+    if isinstance(dates, numpy.ndarray):
+        if numpy.issubdtype(dates.dtype, numpy.datetime64):
+            return dates.astype('datetime64[D]').astype(numpy.int64)
+        return dates.astype(numpy.int64, copy=False)
+    return numpy.fromiter(map(datetime.date.toordinal, dates), numpy.int64, len(dates))
+
+def __xnpv_numpy(rate, values, ordinals):
+    """
+    Vectorized xnpv over day ordinals. Checks the chronological order and discounts all cash flows in single passes.
+    """
+    if len(ordinals) > 1 and (ordinals[1:] < ordinals[:-1]).any():
+        raise ValueError('dates must be in chronological order')
+    years = (ordinals - ordinals[0]) / 365.0
+    return float((numpy.asarray(values, dtype=numpy.float64) / (1 + rate) ** years).sum())
+
+def npv_profile(rates, values):
+    """
+    Net Present Value of periodic cash flows at each of many rates, like numpy_financial.npv at every rate: the first
+    cash flow is at period 0. The cash flows are discounted at all rates as one matrix of rates by periods.
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    return __discounted_sums(rates, values, numpy.arange(len(values), dtype=numpy.float64))
+
+def xnpv_profile(rates, values=[], dates=[]):
+    """
+    Net Present Value for a schedule of cash flows that is not necessarily periodic at each of many rates, like xnpv at
+    every rate. The dates are checked and converted to year fractions once, then the cash flows are discounted at all
+    rates as one matrix of rates by dates. values can also be a dated CashFlowSeries, without dates.
+    """
+    series = values if isinstance(values, CashFlowSeries) else cash_flow_series(values, dates)
+    return __discounted_sums(rates, series.values, series.years)
+
+def __discounted_sums(rates, values, exponents):
+    """
+    Returns an array with the sum of the values discounted by (1 + rate) ** exponents for every rate, evaluated in
+    blocks of rates of at most PROFILE_BLOCK_ITEMS discount factors.
+    """
+    rates = numpy.asarray(rates, dtype=numpy.float64).reshape(-1, 1)
+    result = numpy.empty(len(rates))
+    block = max(1, PROFILE_BLOCK_ITEMS // max(1, len(exponents)))
+    for start in range(0, len(rates), block):
+        result[start:start + block] = (values / (1 + rates[start:start + block]) ** exponents).sum(axis=1)
+    return result
+
+def xirr(values=[], dates=[], guess=0.1, tol=1.48e-8, maxiter=50, full_output=False):
+    """
+    Returns the internal rate of return for a schedule of cash flows that is not necessarily periodic.
+    Solved with Newton's method on the analytic derivative of xnpv, falling back to bisection whenever a Newton step
+    leaves the interval known to contain the root. tol is the absolute tolerance on the rate and maxiter the maximum
+    number of xnpv evaluations. With full_output a SolverResult is returned instead of only the rate.
+    values can also be a dated CashFlowSeries, without dates.
+    """
+    series = values if isinstance(values, CashFlowSeries) else cash_flow_series(values, dates)
+    result = find_root(lambda rate: __xnpv_with_derivative(rate, series.values, series.years), guess, tol, maxiter)
+    if full_output:
+        return result
+    if not result.converged:
+        raise RuntimeError('Failed to converge after {} iterations, value is {}'.format(result.iterations, result.root))
+    return result.root
+
+def xirr_stream(cash_flows, guess=0.1, tol=1.48e-8, maxiter=50, full_output=False):
+    """
+    Returns the internal rate of return for a schedule of cash flows read from (value, date) pairs like xnpv_stream,
+    without ever holding them in memory. Every iteration reads the pairs again, so cash_flows is either a re-iterable
+    such as a list, or a function returning a new iterator of the pairs, such as a new database cursor.
+    Solved like xirr, with the xnpv and its derivative computed in one pass per iteration.
+    :raises TypeError: if cash_flows is an iterator, which can only be read once
+    """
+    if callable(cash_flows):
+        read = cash_flows
+    elif iter(cash_flows) is cash_flows:
+        raise TypeError('cash_flows must be re-iterable or a function returning an iterator, an iterator can only be '
+                        'read once')
+    else:
+        read = lambda: cash_flows
+    result = find_root(lambda rate: xnpv_stream(rate, read(), derivative=True), guess, tol, maxiter)
+    if full_output:
+        return result
+    if not result.converged:
+        raise RuntimeError('Failed to converge after {} iterations, value is {}'.format(result.iterations, result.root))
+    return result.root
+
+def __xnpv_with_derivative(rate, values, years):
+    """
+    Returns the xnpv at the given rate and its derivative with respect to the rate, computed in one vectorized pass.
+    """
+    with numpy.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        flows = values * (1 + rate) ** -years
+        return flows.sum(), -(flows * years).sum() / (1 + rate)
+
+def find_root(function, guess, tol=1.48e-8, maxiter=50):
+    """
+    Finds a rate in (-1, inf) where function, returning a (value, derivative) tuple, is zero.
+    Newton steps are taken while they stay inside the bracket of rates with opposite signs seen so far and at least
+    halve the step size. Otherwise the bracket is bisected. When no bracket is known yet and a Newton step is unusable,
+    a fixed set of rates is scanned for a sign change.
+    """
+    positive = negative = None
+    rate = guess
+    previous_step = float('inf')
+    iterations = 0
+    while iterations < maxiter:
+        value, derivative = function(rate)
+        iterations += 1
+        if value == 0:
+            return SolverResult(float(rate), iterations, True)
+        if value > 0:
+            positive = rate
+        elif value < 0:
+            negative = rate
+
+        candidate = rate - value / derivative if derivative else float('nan')
+        if positive is not None and negative is not None:
+            low, high = min(positive, negative), max(positive, negative)
+            if not low < candidate < high or abs(candidate - rate) > abs(previous_step) / 2:
+                candidate = (low + high) / 2
+        elif not -1 < candidate < float('inf'):
+            bracket, scanned = __scan_for_bracket(function, maxiter - iterations)
+            iterations += scanned
+            if bracket is None:
+                break
+            positive, negative = bracket
+            # Evaluate the middle of the bracket before measuring any step from it, the step from the last rate says
+            # nothing about convergence
+            rate = (positive + negative) / 2
+            previous_step = float('inf')
+            continue
+
+        step = candidate - rate
+        if abs(step) <= tol:
+            return SolverResult(float(candidate), iterations, True)
+        previous_step = step
+        rate = candidate
+    return SolverResult(float(rate), iterations, False)
+
+def __scan_for_bracket(function, maxiter):
+    """
+    Scans __BRACKET_SCAN_RATES for two neighbouring rates where function changes sign.
+    Returns a (positive rate, negative rate) tuple or None, and the number of evaluations used.
+    """
+    previous = None
+    for iterations, rate in enumerate(__BRACKET_SCAN_RATES[:maxiter], 1):
+        value = function(rate)[0]
+        if value == 0:
+            return (rate, rate), iterations
+        if previous is not None and math.copysign(1, value) != math.copysign(1, previous[1]) and math.isfinite(value):
+            return ((rate, previous[0]) if value > 0 else (previous[0], rate)), iterations
+        if math.isfinite(value):
+            previous = (rate, value)
+    return None, min(maxiter, len(__BRACKET_SCAN_RATES))
+
+def irr_batch(series, guess=0.1, tol=1.48e-8, maxiter=50):
+    """
+    Returns the internal rates of return of many periodic cash flow series, solved together.
+    series is a list of possibly ragged lists or a 2-D array padded with zeros or NaN. Every row is solved with the
+    safeguarded Newton iteration of find_root, vectorized across rows; rows drop out of the iteration once converged.
+    Returns a SolverResult of arrays: the rates (NaN when not converged), the evaluations per row and converged flags.
+    Rows without at least one positive and one negative value are reported as not converged. guess is a single rate or
+    one rate per row.
+    """
+    values = __padded_rows(series)
+    rows, columns = values.shape
+    periods = numpy.arange(columns, dtype=numpy.float64)
+
+    rates = numpy.array(numpy.broadcast_to(numpy.asarray(guess, dtype=numpy.float64), (rows,)))
+    iterations = numpy.zeros(rows, dtype=numpy.int64)
+    converged = numpy.zeros(rows, dtype=bool)
+    positive = numpy.full(rows, numpy.nan)
+    negative = numpy.full(rows, numpy.nan)
+    previous_step = numpy.full(rows, numpy.inf)
+    active = numpy.flatnonzero((values > 0).any(axis=1) & (values < 0).any(axis=1))
+
+    with numpy.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        while active.size:
+            rate = rates[active]
+            npv, derivative = __npv_with_derivative(rate, values[active], periods)
+            iterations[active] += 1
 
-def xirr(values=[], dates=[], guess=0.1):
+            positive[active] = numpy.where(npv > 0, rate, positive[active])
+            negative[active] = numpy.where(npv < 0, rate, negative[active])
+            low = numpy.fmin(positive[active], negative[active])
+            high = numpy.fmax(positive[active], negative[active])
+            bracketed = ~numpy.isnan(positive[active]) & ~numpy.isnan(negative[active])
+
+            candidate = rate - npv / derivative
+            bisect = bracketed & ~((low < candidate) & (candidate < high) &
+                                   (numpy.abs(candidate - rate) <= numpy.abs(previous_step[active]) / 2))
+            candidate = numpy.where(bisect, (low + high) / 2, candidate)
+
+            # Rows without a bracket whose Newton step is unusable scan for a sign change like find_root
+            failed = numpy.zeros(active.size, dtype=bool)
+            unusable = numpy.flatnonzero(~bracketed & ~((candidate > -1) & (candidate < numpy.inf)))
+            if unusable.size:
+                found, scan_positive, scan_negative = __scan_rows_for_bracket(values[active[unusable]], periods)
+                iterations[active[unusable]] += len(__BRACKET_SCAN_RATES)
+                positive[active[unusable]] = scan_positive
+                negative[active[unusable]] = scan_negative
+                candidate[unusable] = (scan_positive + scan_negative) / 2
+                failed[unusable] = ~found
+
+            step = candidate - rate
+            # Scanned rows go on from the middle of their bracket, the step from their last rate says nothing about
+            # convergence
+            step[unusable] = numpy.inf
+            done = ((npv == 0) | (numpy.abs(step) <= tol)) & ~failed
+            rates[active] = numpy.where(npv == 0, rate, candidate)
+            previous_step[active] = step
+            converged[active[done]] = True
+            active = active[~done & ~failed & (iterations[active] < maxiter)]
+
+    rates[~converged] = numpy.nan
+    return SolverResult(rates, iterations, converged)
+
+def __padded_rows(series):
+    """
+    Returns the cash flow series as a 2-D float64 array, padding ragged rows with zeros and replacing NaN padding.
+    Zeros appended after the last cash flow do not change the NPV of a row.
+    """
+    if isinstance(series, numpy.ndarray):
+        return numpy.nan_to_num(numpy.atleast_2d(series).astype(numpy.float64), nan=0.0)
+    values = numpy.zeros((len(series), max([len(row) for row in series] or [0])))
+    for index, row in enumerate(series):
+        values[index, :len(row)] = row
+    return numpy.nan_to_num(values, nan=0.0)
+
+def __npv_with_derivative(rate, values, periods):
+    """
+    Returns the NPV of every row of values at the matching rate and its derivative with respect to the rate.
+    """
+    discounted = values * (1 + rate[:, numpy.newaxis]) ** -periods
+    return discounted.sum(axis=1), -(discounted * periods).sum(axis=1) / (1 + rate)
+
+def __scan_rows_for_bracket(values, periods):
+    """
+    Vectorized __scan_for_bracket over rows. Returns whether a sign change was found per row, and for those rows a
+    rate with a positive and a rate with a negative NPV at neighbouring scan rates.
     """
-    Returns the internal rate of return for a schedule of cash flows that is not necessarily periodic. 
+    scan_rates = numpy.array(__BRACKET_SCAN_RATES)
+    npv = (values[:, numpy.newaxis, :] * (1 + scan_rates[:, numpy.newaxis]) ** -periods).sum(axis=2)
+    changes = (numpy.sign(npv[:, 1:]) != numpy.sign(npv[:, :-1])) & numpy.isfinite(npv[:, 1:]) & numpy.isfinite(npv[:, :-1])
+    found = changes.any(axis=1)
+    first = changes.argmax(axis=1)
+    rows = numpy.arange(len(values))
+    left, right = scan_rates[first], scan_rates[first + 1]
+    left_positive = npv[rows, first] > 0
+    scan_positive = numpy.where(found, numpy.where(left_positive, left, right), numpy.nan)
+    scan_negative = numpy.where(found, numpy.where(left_positive, right, left), numpy.nan)
+    return found, scan_positive, scan_negative
+
+def rate(nper, pmt, pv, fv=0, when=0, guess=0.1, tol=1e-6, maxiter=100, full_output=False):
+    """
+    Returns the interest rate per period of an annuity, like numpy_financial.rate and with the same Newton iteration,
+    so that both return the same rates. With full_output a SolverResult is returned, counting the Newton steps as the
+    iterations, instead of the rate or NaN when the iteration does not converge.
     """
-    return optimize.newton(lambda r: xnpv(r, values, dates), guess)
+    nper, pmt, pv, fv, when = [numpy.asarray(arg) for arg in (nper, pmt, pv, fv, when)]
+    rate = guess
+    iterations = 0
+    converged = False
+    with numpy.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        while iterations < maxiter and not converged:
+            growth = (rate + 1) ** nper
+            previous_growth = (rate + 1) ** (nper - 1)
+            value = fv + growth * pv + pmt * (growth - 1) * (rate * when + 1) / rate
+            derivative = (nper * previous_growth * pv - pmt * (growth - 1) * (rate * when + 1) / (rate ** 2) +
+                          nper * pmt * previous_growth * (rate * when + 1) / rate + pmt * (growth - 1) * when / rate)
+            next_rate = rate - value / derivative
+            converged = bool(numpy.all(abs(next_rate - rate) < tol))
+            iterations += 1
+            rate = next_rate
+    root = rate if converged else numpy.nan + rate
+    if full_output:
+        return SolverResult(float(root) if numpy.ndim(root) == 0 else root, iterations, converged)
+    return root
 
 def effect(nominal_rate, npery):
     """
@@ -51,3 +468,54 @@ def sln(cost, salvage, life):
     Returns the straight-line depreciation of an asset for one period.
     """
     return (float(cost) - float(salvage)) / float(life)
+
+def amortization_schedule(rate, nper, pv, fv=0, when=0):
+    """
+    Returns the AmortizationSchedule of loans with constant payments, computed for all periods at once.
+    The arguments follow numpy_financial.pmt and can be scalars or arrays broadcast against each other, one element per
+    loan. nper must be a whole number of periods. The payment, interest and principal of every period equal
+    numpy_financial.pmt, ipmt and ppmt. For a single loan every field is a 1-D array over its periods. For arrays of
+    loans they are 2-D arrays of one row per loan over the longest term, with zero payments after the term of shorter
+    loans and their balance staying at its final value.
+    """
+    rate, nper, pv, fv, when = numpy.broadcast_arrays(*[numpy.asarray(arg, dtype=numpy.float64)
+                                                        for arg in (rate, nper, pv, fv, when)])
+    scalar = rate.ndim == 0
+    rate, nper, pv, fv, when = [arg.reshape(-1, 1) for arg in (rate, nper, pv, fv, when)]
+    period = numpy.arange(1, int(nper.max()) + 1 if nper.size else 1, dtype=numpy.float64)
+
+    with numpy.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        zero_rate = rate == 0
+        growth = (1 + rate) ** nper
+        annuity = numpy.where(zero_rate, nper, (1 + rate * when) * (growth - 1) / rate)
+        payment = numpy.where(zero_rate, -(fv + pv) / nper, -(fv + pv * growth) / annuity)
+
+        # Balance of numpy_financial.fv after elapsed periods, counting each period at most up to the loan's term
+        def future_balance(elapsed):
+            elapsed = numpy.minimum(elapsed, nper)
+            elapsed_growth = (1 + rate) ** elapsed
+            paid = numpy.where(zero_rate, elapsed, (1 + rate * when) * (elapsed_growth - 1) / rate)
+            return pv * elapsed_growth + payment * paid
+
+        # With payments at the beginning of periods the interest of a period is accrued during the previous one
+        interest = -future_balance(period - 1) * rate / (1 + rate * when)
+        interest = numpy.where((when == 1) & (period == 1), 0.0, interest)
+        balance = future_balance(period) / (1 + rate * when)
+        in_term = period <= nper
+        payments = numpy.where(in_term, payment, 0.0)
+        interest = numpy.where(in_term, interest, 0.0)
+
+    period = numpy.broadcast_to(period.astype(numpy.int64), payments.shape)
+    schedule = AmortizationSchedule(period, payments, interest, payments - interest, balance)
+    return AmortizationSchedule(*[field[0] for field in schedule]) if scalar else schedule
+
+def amortization_schedule_chunks(rate, nper, pv, fv=0, when=0, chunk_size=AMORTIZATION_CHUNK_SIZE):
+    """
+    Generates the amortization schedules of many loans in chunks of chunk_size loans, so that the schedules of a large
+    portfolio can be streamed with bounded memory. Takes the same arguments as amortization_schedule and yields
+    (index of the first loan in the chunk, AmortizationSchedule of the chunk) tuples.
+    """
+    args = numpy.broadcast_arrays(*[numpy.atleast_1d(numpy.asarray(arg, dtype=numpy.float64))
+                                    for arg in (rate, nper, pv, fv, when)])
+    for start in range(0, len(args[0]), chunk_size):
+        yield start, amortization_schedule(*[arg[start:start + chunk_size] for arg in args])
@@ -1,336 +1,632 @@
 from __future__ import print_function
 import sys
+import collections
+import functools
 import log_helper
 sys.path.append('lib')
-import numpy_financial as numpy
-from jsonschema import validate
-from jsonschema.exceptions import ValidationError
-import validation_json_schemas as schemas
-import core as ff
-from datetime import datetime
+from lazy_import import LazyModule
+import schema_validators
+import result_cache
+import warm_start
+import binary_arrays
+import phase_metrics
+import profiling
+from datetime import date
+
+# Heavy dependencies are imported on first use, so that each function only pays for what it needs on a cold start
+numpy = LazyModule('numpy_financial')
+np = LazyModule('numpy')
+ff = LazyModule('core')
 
 logger = log_helper.getLogger(__name__)
 
-
-def __validate_arguments(function_name, arguments_json, json_schema):
-    """
-    Validate the arguments in the provided JSON against the provided json schema
+# Results of repeated calculations, kept across the warm invocations of a container. Opt-in with RESULT_CACHE_SIZE.
+cache = result_cache.from_environment()
+# Solutions of the iterative solvers, seeding the next solve of the same instrument. Opt-in with WARM_START_SIZE.
+guesses = warm_start.from_environment()
+# Per-phase latency of the invocations, shared with wrapper_handler. Opt-in with PHASE_METRICS.
+metrics = phase_metrics.from_environment()
+# Profiles of a sample of the invocations, shared with wrapper_handler. Opt-in with PROFILE_SAMPLE_RATE.
+profiler = profiling.from_environment()
+
+# Distinct date strings whose day ordinal is cached. Ledgers repeat the same dates, monthly ones endlessly.
+DATE_CACHE_SIZE = 8192
+# Day ordinal of 1970-01-01, day 0 of epoch day numbers
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Day ordinal of 9999-12-31, the last date of Python and Excel
+MAX_ORDINAL = date.max.toordinal()
+# Leading cash flows identifying a series for warm starts when the request has no instrument_id. A deal solved again
+# with cash flows appended keeps its fingerprint.
+WARM_START_PREFIX = 8
+
+
+def __validate_arguments(function_name, arguments_json, schema_name):
+    """
+    Validate the arguments in the provided JSON against the named json schema
     :param function_name:
     :param arguments_json:
-    :param json_schema:
+    :param schema_name: Name of the schema in validation_json_schemas
     :return: Dict containing whether the provided json is valid and an error message if validation failed.
     """
-    try:
-        validate(arguments_json, json_schema)
+    err = schema_validators.find_error(arguments_json, schema_name)
+    if err is None:
         return {'isValid': True}
-    except ValidationError as err:
-        logger.error("Invalid {} request with args: {}. Exception: {}".format(function_name, arguments_json, err))
-        return {'isValid': False, 'error': err.message}
+    # The string form of a ValidationError contains the whole instance and schema, only log where and what failed
+    logger.error("Invalid %s request with args: %s. Error at %s: %s", function_name, log_helper.summarize(arguments_json),
+                 '/'.join(map(str, err.absolute_path)) or 'request', log_helper.summarize(err.message))
+    return {'isValid': False, 'error': err.message}
 
 
-def __call_numpy(method, args):
+def __validate_array_lengths(request, names):
     """
-    Call a NumPy method with a given set of arguments
-    :param method: NumPy method to call
-    :param args: Arguments for the provided NumPy method
-    :return: Result from NumPy
+    Validate that all array valued arguments can be broadcast against each other
+    :param request: Dict containing the parameters to pass to the formula.
+    :param names: Names of the parameters that accept arrays
+    :return: Error message if the arrays have different lengths, otherwise None
     """
-    logger.info("Calling numpy.{} with args: {}".format(method, args))
-    return {'result': getattr(numpy, method)(*args)}
+    lengths = set(len(request[name]) for name in names if isinstance(request.get(name), list))
+    if len(lengths) > 1:
+        return 'array arguments must all have the same length'
+    return None
+
 
-def __call_ff(method, args):
+def __to_result(value):
     """
-    Call a core financial function method with a given set of arguments
-    :param method: Method to call
-    :param args: Arguments for the provided method
-    :return: Calculation result
+    Convert a NumPy result into a JSON serializable value
+    :param value: Result from NumPy
+    :return: The value itself for scalars, a scalar for 0-d arrays and a list for array results
     """
-    logger.info("Calling ff.{} with args: {}".format(method, args))
-    return {'result': getattr(ff, method)(*args)}
+    # A result cannot be an array before NumPy is imported, and the simple functions should not import it to find out
+    loaded_numpy = sys.modules.get('numpy')
+    if loaded_numpy is not None and isinstance(value, loaded_numpy.ndarray):
+        return value.item() if value.ndim == 0 else value.tolist()
+    return value
 
 
-def fv_handler(request, context):
+def __cached(name, args, compute):
     """
-    Future Value calculation
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    Look up the result of a calculation in the result cache, computing it on a miss
+    :param name: Name of the calculation
+    :param args: Arguments of the calculation
+    :param compute: Function without arguments computing the result
+    :return: Calculation result
     """
-    logger.info("FV request: {}".format(request))
+    result = cache.get_or_compute(name, args, compute)
+    if cache.enabled:
+        logger.debug("Result cache: %s", cache)
+    return result
 
-    validation_result = __validate_arguments('FV', request, schemas.fv_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
 
-    args = [request['rate'], request['nper'], request.get('pmt', 0), request.get('pv', 0), request.get('type', 0)]
-    return __call_numpy('fv', args)
-
-def fvschedule_handler(request, context):
+def __nper(rate, pmt, pv, fv, when):
     """
-    Returns the future value of an initial principal after applying a series of compound interest rates.
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    numpy.nper that also supports arrays mixing zero and non-zero rates. numpy.nper switches every element to its zero
+    rate formula as soon as any rate is zero, so both groups are solved separately.
     """
-    logger.info("FVSCHEDULE request: {}".format(request))
+    rate, pmt, pv, fv, when = np.broadcast_arrays(*map(np.asarray, [rate, pmt, pv, fv, when]))
+    zero_rate = rate == 0
+    if rate.ndim == 0 or zero_rate.all() or not zero_rate.any():
+        return numpy.nper(rate, pmt, pv, fv, when)
 
-    validation_result = __validate_arguments('FVSCHEDULE', request, schemas.fvschedule_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
+    result = np.empty(rate.shape)
+    for mask in (zero_rate, ~zero_rate):
+        result[mask] = numpy.nper(rate[mask], pmt[mask], pv[mask], fv[mask], when[mask])
+    return result
 
-    args = [request['principal'], request.get('schedule', [])]
-    return __call_ff('fvschedule', args)
 
-def pv_handler(request, context):
+def __rate(nper, pmt, pv, fv, when, guess):
     """
-    Present Value calculation
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    numpy.rate that also supports arrays where some elements do not converge. numpy.rate returns NaN for every element
+    unless all of them converge, so NaN elements of an array result are solved again one at a time.
     """
-    logger.info("PV request: {}".format(request))
-
-    validation_result = __validate_arguments('PV', request, schemas.pv_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
+    result = numpy.rate(nper, pmt, pv, fv, when, guess)
+    if np.ndim(result) == 0 or not np.isnan(result).any():
+        return result
 
-    args = [request['rate'], request['nper'], request.get('pmt', 0), request.get('fv', 0), request.get('type', 0)]
-    return __call_numpy('pv', args)
+    args = np.broadcast_arrays(*map(np.asarray, [nper, pmt, pv, fv, when, guess]))
+    for index in np.flatnonzero(np.isnan(result)):
+        result[index] = numpy.rate(*[arg[index] for arg in args])
+    return result
 
-
-def npv_handler(request, context):
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def __date_ordinal(text):
     """
-    Net Present Value of a cash flow series
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    Day ordinal of a year-month-day string, zero padded or not. Much faster than datetime.strptime.
+    :param text: Date such as "2016-04-01" or "2016-4-1"
+    :return: Proleptic Gregorian ordinal of the date
+    :raises ValueError: if the date does not exist
     """
-    logger.info("NPV request: {}".format(request))
-
-    validation_result = __validate_arguments('NPV', request, schemas.npv_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
-
-    # Need to append a 0 entry to the beginning of the values list for NumPy NPV to align with Excel
-    # Excel assumes the investment begins one period before the first value cash flow whereas
-    # NumPy assumes they begin at the same time.
-    args = [request['rate'], [0] + request['values']]
-    return __call_numpy('npv', args)
+    year, month, day = text.split('-')
+    try:
+        return date(int(year), int(month), int(day)).toordinal()
+    except ValueError as err:
+        raise ValueError("'{}' is not a valid date: {}".format(text, err))
 
 
-def xnpv_handler(request, context):
+def __parse_dates(dates, date_format):
     """
-    Net Present Value of a cash flow series that's not necessarily periodic.
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    Convert the dates of a request into day ordinals
+    :param dates: List of year-month-day strings or of integer day numbers, or NumPy array of day numbers
+    :param date_format: What integer day numbers count from, 'ordinal' or 'epoch'
+    :return: NumPy array of day ordinals
+    :raises ValueError: if a date does not exist, or a day number is before 0001-01-01 or after 9999-12-31
     """
-    logger.info("XNPV request: {}".format(request))
+    if len(dates) and type(dates[0]) is str:
+        return np.fromiter(map(__date_ordinal, dates), np.int64, len(dates))
+    offset = EPOCH_ORDINAL if date_format == 'epoch' else 0
+    # Day numbers outside of the dates Python knows would also wrap around in the int32 ordinals of cash flow series
+    out_of_range = 'dates must be {} day numbers between {} and {}'.format(date_format, 1 - offset, MAX_ORDINAL - offset)
+    try:
+        ordinals = np.array(dates, dtype=np.int64) + offset
+    except OverflowError:
+        raise ValueError(out_of_range)
+    if len(ordinals) and (ordinals.min() < 1 or ordinals.max() > MAX_ORDINAL):
+        raise ValueError(out_of_range)
+    return ordinals
 
-    validation_result = __validate_arguments('XNPV', request, schemas.xnpv_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
 
-    if len(request['values']) != len(request['dates']):
-        return {'error': 'values and dates must have the same length'}
+def __amortization_schedules(rate, nper, pv, fv, when):
+    """
+    Amortization schedules as dicts of per period lists. Loans given as arrays are computed in chunks and each of their
+    schedules is trimmed to its own term.
+    """
+    if not any(isinstance(arg, list) for arg in (rate, nper, pv, fv, when)):
+        schedule = ff.amortization_schedule(rate, nper, pv, fv, when)
+        return dict((name, column.tolist()) for name, column in schedule._asdict().items())
 
-    dates = list(map(lambda s: datetime.strptime(s, '%Y-%m-%d'), request['dates']))
-    args = [request['rate'], request['values'], dates]
-    return __call_ff('xnpv', args)
+    terms = np.broadcast_arrays(*map(np.asarray, [rate, nper, pv, fv, when]))[1]
+    schedules = []
+    for start, chunk in ff.amortization_schedule_chunks(rate, nper, pv, fv, when):
+        for row in range(len(chunk.period)):
+            term = int(terms[start + row])
+            schedules.append(dict((name, column[row, :term].tolist()) for name, column in chunk._asdict().items()))
+    return schedules
 
 
-def pmt_handler(request, context):
+def __lazy_function(module, name):
     """
-    Compute the payment against loan principal plus interest
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    Function calling module.name, so that a function of a lazily imported module can be registered without importing
+    the module before the first call
     """
-    logger.info("PMT request: {}".format(request))
-
-    validation_result = __validate_arguments('PMT', request, schemas.pmt_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
+    def call(*args):
+        return getattr(module, name)(*args)
+    return call
 
-    args = [request['rate'], request['nper'], request['pv'], request.get('fv', 0), request.get('type', 0)]
-    return __call_numpy('pmt', args)
 
-
-def ppmt_handler(request, context):
+def __array_lengths(*names):
     """
-    Compute the payment against loan principal
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    Check that the array valued arguments among names can be broadcast against each other
     """
-    logger.info("PPMT request: {}".format(request))
+    return lambda request: __validate_array_lengths(request, names)
 
-    validation_result = __validate_arguments('PPMT', request, schemas.ppmt_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
 
-    args = [request['rate'], request['per'], request['nper'], request['pv'], request.get('fv', 0), request.get('type', 0)]
-    return __call_numpy('ppmt', args)
+def __nonzero_life(request):
+    return 'life cannot be zero' if request['life'] == 0 else None
 
 
-def irr_handler(request, context):
+def __excel_npv_args(request, args):
     """
-    Internal Rate of Return calculation.
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    Prepend a 0 entry to the values for NumPy NPV to align with Excel. Excel assumes the investment begins one period
+    before the first value cash flow whereas NumPy assumes they begin at the same time.
     """
-    logger.info("IRR request: {}".format(request))
-
-    validation_result = __validate_arguments('IRR', request, schemas.irr_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
+    if isinstance(args[1], list):
+        return [args[0], [0] + args[1]]
+    return [args[0], np.concatenate(([0.0], args[1]))]
 
-    # IRR requires at least one positive and one negative value
-    sorted_values = sorted(request.get('values'))
-    values_length = len(request.get('values'))
-    if sorted_values[0] > 0 or sorted_values[values_length - 1] <= 0:
-        return {'error': "IRR requires at least one positive and one negative value"}
 
-    args = [request['values']]
-    return __call_numpy('irr', args)
+def __npv(rate, values):
+    """
+    numpy.npv at a rate, or the NPV profile over an array of rates computed in one pass
+    """
+    if isinstance(rate, list):
+        return ff.npv_profile(rate, values)
+    return numpy.npv(rate, values)
 
 
-def mirr_handler(request, context):
+def __xnpv(rate, series):
     """
-    Modified Internal Rate of Return calculation.
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    XNPV at a rate, or the XNPV profile over an array of rates, of a dated CashFlowSeries
     """
-    logger.info("MIRR request: {}".format(request))
+    if isinstance(rate, list):
+        return ff.xnpv_profile(rate, series)
+    return ff.xnpv(rate, series)
 
-    validation_result = __validate_arguments('MIRR', request, schemas.mirr_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
 
-    # MIRR requires at least one positive and one negative value
-    sorted_values = sorted(request.get('values'))
-    values_length = len(request.get('values'))
-    if sorted_values[0] > 0 or sorted_values[values_length - 1] <= 0:
-        return {'error': "MIRR requires at least one positive and one negative value"}
+def __xirr(series, guess):
+    return ff.xirr(series, guess=guess)
 
-    args = [request['values'], request['finance_rate'], request['reinvest_rate']]
-    return __call_numpy('mirr', args)
 
-
-def xirr_handler(request, context):
+def __cash_flow_series(label=None, dated=False):
     """
-    Returns the internal rate of return for a schedule of cash flows that is not necessarily periodic.
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    Replace the cash flows argument, first in the argument list, and the dates after it for dated schedules by a
+    CashFlowSeries, which checks the lengths and the date order once. For rate of return functions, named by label,
+    the series must contain at least one positive and one negative value.
+    :param dated: Whether the function takes dates, parsed as the date_format of the request says
     """
-    logger.info("XIRR request: {}".format(request))
-
-    validation_result = __validate_arguments('XIRR', request, schemas.xirr_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
+    def prepare(request, args):
+        if dated:
+            dates = __parse_dates(args[1], request.get('date_format', 'ordinal'))
+            series = ff.cash_flow_series(args[0], dates)
+            args = [series] + args[2:]
+        else:
+            series = ff.cash_flow_series(args[0])
+            # numpy_financial takes the array of cash flows
+            args = [series.values] + args[1:]
+        if label is not None and not series.has_both_signs:
+            raise ValueError("{} requires at least one positive and one negative value".format(label))
+        return args
+    return prepare
 
-    # XIRR requires at least one positive and one negative value
-    sorted_values = sorted(request.get('values'))
-    values_length = len(request.get('values'))
-    if sorted_values[0] > 0 or sorted_values[values_length - 1] <= 0:
-        return {'error': "XIRR requires at least one positive and one negative value"}
 
-    if len(request['values']) != len(request['dates']):
-        return {'error': 'values and dates must have the same length'}
+def __rate_and_series(request, args):
+    return [args[0]] + __cash_flow_series(dated=True)(request, args[1:])
 
-    dates = list(map(lambda s: datetime.strptime(s, '%Y-%m-%d'), request['dates']))
-    args = [request['values'], dates, request.get('guess', 0.1)]
-    return __call_ff('xirr', args)
 
+def __whole_npery_args(request, args):
+    return [args[0], int(args[1])]
 
-def nper_handler(request, context):
-    """
-    Number of periodic payments required to pay off a loan.
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
-    """
-    logger.info("NPER request: {}".format(request))
-
-    validation_result = __validate_arguments('NPER', request, schemas.nper_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
 
-    args = [request['rate'], request.get('pmt', 0), request['pv'], request.get('fv', 0), request.get('type', 0)]
-    result = __call_numpy('nper', args)
-    # numpy.nper returns a numpy.ndarray object with the result in it . Need to unwrap the result.
-    return dict(map(lambda entry: (entry[0], entry[1].item(0)), result.items()))
+def __result_response(result):
+    return {'result': result}
 
 
-def rate_handler(request, context):
+def __irr_batch_response(result):
     """
-    Rate of interest period.
-    :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    Response with the rate of every series, None where it did not converge, and a flag per series
     """
-    logger.info("Rate request: {}".format(request))
-
-    validation_result = __validate_arguments('Rate', request, schemas.rate_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
+    converged = result.converged.tolist()
+    return {'result': [rate if flag else None for rate, flag in zip(result.root.tolist(), converged)],
+            'converged': converged}
 
-    args = [request['nper'], request.get('pmt', 0), request['pv'], request.get('fv', 0), request.get('type', 0), request.get('guess', 0.10)]
-    return __call_numpy('rate', args)
 
 
-def effect_handler(request, context):
+def __warm_solve(key, request, guess, solve):
     """
-    Effective annual interest rate
+    Solve from the solution remembered for an instrument, unless the request has its own guess, and remember the new
+    solution. A seeded solve that does not converge is solved again from the guess, so that warm starts never fail a
+    request that succeeds without them.
+    :param key: Fingerprint of the instrument
     :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    :param guess: Guess of the request or its default
+    :param solve: Function of a guess returning a SolverResult
+    :return: SolverResult
+    """
+    seed = guesses.get(key) if 'guess' not in request else None
+    result = solve(guess if seed is None else seed.root)
+    if seed is not None and not result.converged:
+        logger.info("Warm start from %r did not converge, solving from %r", seed.root, guess)
+        seed = None
+        result = solve(guess)
+    if result.converged:
+        guesses.put(key, result.root, result.iterations, seed)
+    if seed is not None:
+        logger.info("Warm started from %r: %d iterations, %d saved", seed.root, result.iterations,
+                    seed.cold_iterations - result.iterations)
+    logger.debug("Warm starts: %s", guesses)
+    return result
+
+
+def __instrument_key(name, request, *fingerprint):
+    instrument_id = request.get('instrument_id')
+    return (name, 'id', instrument_id) if instrument_id is not None else (name,) + fingerprint
+
+
+def __warm_xirr(request, args):
+    """
+    XIRR seeded with the last rate of the same instrument
+    """
+    series, guess = args
+    key = __instrument_key('xirr', request, tuple(series.values[:WARM_START_PREFIX].tolist()),
+                           tuple(series.ordinals[:WARM_START_PREFIX].tolist()))
+    result = __warm_solve(key, request, guess, lambda guess: ff.xirr(series, guess=guess, full_output=True))
+    if not result.converged:
+        raise RuntimeError('Failed to converge after {} iterations, value is {}'.format(result.iterations, result.root))
+    return result.root
+
+
+def __warm_rate(request, args):
+    """
+    RATE of a single annuity seeded with the last rate of the same instrument, identified by its payment, present
+    and future value and payment timing. Arrays of annuities are solved without seeds.
+    """
+    if any(isinstance(arg, list) for arg in args):
+        return __rate(*args)
+    nper, pmt, pv, fv, when, guess = args
+    key = __instrument_key('rate', request, pmt, pv, fv, when)
+    result = __warm_solve(key, request, guess, lambda guess: ff.rate(nper, pmt, pv, fv, when, guess, full_output=True))
+    return result.root
+
+
+def __warm_irr_batch(request, args):
+    """
+    IRR_BATCH with every series seeded with the last rate of the series with the same leading cash flows
+    """
+    series, guess = args
+    keys = [('irr_batch',) + tuple(row[:WARM_START_PREFIX]) for row in series]
+    seeds = [guesses.get(key) for key in keys] if 'guess' not in request else [None] * len(keys)
+    result = ff.irr_batch(series, [guess if seed is None else seed.root for seed in seeds])
+    # Seeded series that do not converge are solved again from the guess, like in __warm_solve
+    retry = [row for row, seed in enumerate(seeds) if seed is not None and not result.converged[row]]
+    if retry:
+        retried = ff.irr_batch([series[row] for row in retry], guess)
+        for field, retried_field in zip(result, retried):
+            field[retry] = retried_field
+        for row in retry:
+            seeds[row] = None
+    saved = 0
+    for key, seed, root, iterations, converged in zip(keys, seeds, result.root.tolist(), result.iterations.tolist(),
+                                                      result.converged.tolist()):
+        if converged:
+            guesses.put(key, root, iterations, seed)
+        if seed is not None:
+            saved += seed.cold_iterations - iterations
+    logger.info("Warm started %d of %d series, %d iterations saved", len(seeds) - seeds.count(None), len(seeds), saved)
+    return result
+
+# Marks a parameter without a default, which the schema of its function requires
+REQUIRED = object()
+
+# Definition of a financial function, from which its Lambda handler, the wrapper and batches evaluate it.
+# name: name of the function in wrapper requests and of its handler without the _handler suffix
+# label: name of the function in logs
+# description: first line of the docstring of its handler
+# schema: name of the schema of its arguments in validation_json_schemas
+# parameters: (argument name, default) tuples in the positional order of the backend, REQUIRED for no default
+# checks: functions of a valid request returning an error message when it cannot be evaluated, otherwise None
+# prepare: function of the request and the argument list returning the arguments for the backend, raising ValueError
+#          for arguments it cannot convert, or None
+# backend: function computing the result from the arguments
+# vectorized: function computing the results of many scalar requests at once from an array of every argument, or None
+# call_name: name of the backend in logs and result cache keys
+# cached: whether results are kept in the result cache
+# respond: function building the response from the result
+# warm_start: function of the request and the arguments computing the result like the backend, with the solver seeded
+#             from the guess cache, or None
+FunctionDefinition = collections.namedtuple('FunctionDefinition', [
+    'name', 'label', 'description', 'schema', 'parameters', 'checks', 'prepare', 'backend', 'vectorized', 'call_name',
+    'cached', 'respond', 'warm_start'])
+
+
+def __define(name, label, description, parameters, backend, call_name, checks=(), prepare=None, vectorized=False,
+             cached=True, respond=__result_response, warm_start=None):
+    """
+    FunctionDefinition of a function whose schema is named after it
+    :param vectorized: Whether the backend broadcasts over array arguments, so that it also evaluates batches
+    """
+    return FunctionDefinition(name, label, description, name + '_schema', tuple(parameters), tuple(checks), prepare,
+                              backend, backend if vectorized else None, call_name, cached, respond, warm_start)
+
+
+__PERIODIC = {
+    'fv': [('rate', REQUIRED), ('nper', REQUIRED), ('pmt', 0), ('pv', 0), ('type', 0)],
+    'pv': [('rate', REQUIRED), ('nper', REQUIRED), ('pmt', 0), ('fv', 0), ('type', 0)],
+    'pmt': [('rate', REQUIRED), ('nper', REQUIRED), ('pv', REQUIRED), ('fv', 0), ('type', 0)],
+    'ppmt': [('rate', REQUIRED), ('per', REQUIRED), ('nper', REQUIRED), ('pv', REQUIRED), ('fv', 0), ('type', 0)],
+    'nper': [('rate', REQUIRED), ('pmt', 0), ('pv', REQUIRED), ('fv', 0), ('type', 0)],
+    'rate': [('nper', REQUIRED), ('pmt', 0), ('pv', REQUIRED), ('fv', 0), ('type', 0), ('guess', 0.10)]
+}
+
+# The supported functions by name
+FUNCTIONS = dict((definition.name, definition) for definition in [
+    __define('fv', 'FV', 'Future Value calculation', __PERIODIC['fv'], __lazy_function(numpy, 'fv'), 'numpy.fv',
+             checks=[__array_lengths(*[name for name, _ in __PERIODIC['fv']])], vectorized=True),
+    __define('fvschedule', 'FVSCHEDULE',
+             'Returns the future value of an initial principal after applying a series of compound interest rates.',
+             [('principal', REQUIRED), ('schedule', [])], __lazy_function(ff, 'fvschedule'), 'ff.fvschedule'),
+    __define('pv', 'PV', 'Present Value calculation', __PERIODIC['pv'], __lazy_function(numpy, 'pv'), 'numpy.pv',
+             checks=[__array_lengths(*[name for name, _ in __PERIODIC['pv']])], vectorized=True),
+    __define('npv', 'NPV', 'Net Present Value of a cash flow series', [('rate', REQUIRED), ('values', REQUIRED)],
+             __npv, 'numpy.npv', prepare=__excel_npv_args),
+    __define('xnpv', 'XNPV', "Net Present Value of a cash flow series that's not necessarily periodic.",
+             [('rate', REQUIRED), ('values', REQUIRED), ('dates', REQUIRED)], __xnpv, 'ff.xnpv',
+             prepare=__rate_and_series),
+    __define('pmt', 'PMT', 'Compute the payment against loan principal plus interest', __PERIODIC['pmt'],
+             __lazy_function(numpy, 'pmt'), 'numpy.pmt',
+             checks=[__array_lengths(*[name for name, _ in __PERIODIC['pmt']])], vectorized=True),
+    __define('ppmt', 'PPMT', 'Compute the payment against loan principal', __PERIODIC['ppmt'],
+             __lazy_function(numpy, 'ppmt'), 'numpy.ppmt',
+             checks=[__array_lengths(*[name for name, _ in __PERIODIC['ppmt']])], vectorized=True),
+    __define('amortization', 'AMORTIZATION',
+             'Amortization schedule of a loan: the payment, its interest and principal parts and the remaining balance '
+             'of every period over the full term', __PERIODIC['pmt'], __amortization_schedules,
+             'ff.amortization_schedule', checks=[__array_lengths(*[name for name, _ in __PERIODIC['pmt']])]),
+    __define('irr', 'IRR', 'Internal Rate of Return calculation.', [('values', REQUIRED)],
+             __lazy_function(numpy, 'irr'), 'numpy.irr', prepare=__cash_flow_series('IRR')),
+    __define('irr_batch', 'IRR_BATCH',
+             'Internal Rate of Return calculation for many cash flow series, solved together.',
+             [('values', REQUIRED), ('guess', 0.1)], __lazy_function(ff, 'irr_batch'), 'ff.irr_batch', cached=False,
+             respond=__irr_batch_response, warm_start=__warm_irr_batch),
+    __define('mirr', 'MIRR', 'Modified Internal Rate of Return calculation.',
+             [('values', REQUIRED), ('finance_rate', REQUIRED), ('reinvest_rate', REQUIRED)],
+             __lazy_function(numpy, 'mirr'), 'numpy.mirr', prepare=__cash_flow_series('MIRR')),
+    __define('xirr', 'XIRR',
+             'Returns the internal rate of return for a schedule of cash flows that is not necessarily periodic.',
+             [('values', REQUIRED), ('dates', REQUIRED), ('guess', 0.1)], __xirr, 'ff.xirr',
+             prepare=__cash_flow_series('XIRR', dated=True),
+             warm_start=__warm_xirr),
+    # numpy.nper returns a numpy.ndarray object, which is unwrapped into a scalar or a list like every other result
+    __define('nper', 'NPER', 'Number of periodic payments required to pay off a loan.', __PERIODIC['nper'], __nper,
+             'numpy.nper', checks=[__array_lengths(*[name for name, _ in __PERIODIC['nper']])], vectorized=True),
+    __define('rate', 'RATE', 'Rate of interest period.', __PERIODIC['rate'], __rate, 'numpy.rate',
+             checks=[__array_lengths(*[name for name, _ in __PERIODIC['rate']])], vectorized=True,
+             warm_start=__warm_rate),
+    __define('effect', 'EFFECT', 'Effective annual interest rate', [('nominal_rate', REQUIRED), ('npery', REQUIRED)],
+             __lazy_function(ff, 'effect'), 'ff.effect', prepare=__whole_npery_args),
+    __define('nominal', 'NOMINAL', 'Nominal annual interest rate', [('effect_rate', REQUIRED), ('npery', REQUIRED)],
+             __lazy_function(ff, 'nominal'), 'ff.nominal', prepare=__whole_npery_args),
+    __define('sln', 'SLN', 'Straight line depreciation of an asset for one period',
+             [('cost', REQUIRED), ('salvage', REQUIRED), ('life', REQUIRED)], __lazy_function(ff, 'sln'), 'ff.sln',
+             checks=[__nonzero_life])
+])
+
+
+def __decode_columns(request):
+    """
+    Decode the binary column arguments of a valid request into NumPy arrays
+    :param request: Dict containing the parameters to pass to the formula.
+    :return: The request itself when it has no binary columns, otherwise a copy with the decoded arrays
+    :raises ValueError: if a binary column cannot be decoded
     """
-    logger.info("Effect request: {}".format(request))
-
-    validation_result = __validate_arguments('Effect', request, schemas.effect_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
-
-    args = [request['nominal_rate'], int(request['npery'])]
-    return __call_ff('effect', args)
+    names = [name for name, value in request.items() if binary_arrays.is_column(value)]
+    if not names:
+        return request
+    request = dict(request)
+    for name in names:
+        request[name] = binary_arrays.decode(request[name])
+    return request
 
 
-def nominal_handler(request, context):
+def find_error(definition, request, validated=False):
     """
-    Nominal annual interest rate
+    Validate the arguments of a request against the schema and the checks of its function
+    :param definition: FunctionDefinition of the function
     :param request: Dict containing the parameters to pass to the formula.
-    :param context: Lambda execution context
-    :return: Dict with a 'result' entry containing the result of the calculation
+    :param validated: Whether the request is already known to match the schema
+    :return: Error message, or None if the request can be evaluated
     """
-    logger.info("Nominal request: {}".format(request))
+    if not validated:
+        validation_result = __validate_arguments(definition.label, request, definition.schema)
+        if not validation_result.get('isValid'):
+            return validation_result.get('error')
+    try:
+        request = __decode_columns(request)
+    except ValueError as err:
+        return str(err)
+    for check in definition.checks:
+        error = check(request)
+        if error:
+            return error
+    return None
 
-    validation_result = __validate_arguments('nominal', request, schemas.nominal_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
 
-    args = [request['effect_rate'], int(request['npery'])]
-    return __call_ff('nominal', args)
+def evaluate(definition, request, validated=False, timer=None):
+    """
+    Evaluate a request for a function
+    :param definition: FunctionDefinition of the function
+    :param request: Dict containing the parameters to pass to the formula.
+    :param validated: Whether the request is already known to match the schema, so that it is not validated again
+    :param timer: PhaseTimer of a caller timing a larger invocation, such as a wrapper request, and recording it. When
+    None and the phase metrics are enabled, the evaluation is timed and recorded by itself.
+    :return: Dict with a 'result' entry containing the result of the calculation, or an 'error' entry. Array results
+    are binary columns when the request has a result_encoding of 'base64'.
+    """
+    if timer is not None or not metrics.enabled:
+        return __evaluate(definition, request, validated, timer)
+    timer = metrics.start(definition.name, request)
+    try:
+        return __evaluate(definition, request, validated, timer)
+    finally:
+        metrics.record(timer)
 
 
-def sln_handler(request, context):
+def __evaluate(definition, request, validated, timer):
+    """
+    evaluate, marking the end of each phase on the timer when there is one
     """
-    Straight line depreciation of an asset for one period
+    if not validated:
+        validation_result = __validate_arguments(definition.label, request, definition.schema)
+        if not validation_result.get('isValid'):
+            return {'error': validation_result.get('error')}
+    if timer is not None:
+        timer.mark('validate')
+    try:
+        request = __decode_columns(request)
+    except ValueError as err:
+        return {'error': str(err)}
+    if timer is not None:
+        timer.mark('normalize')
+    error = find_error(definition, request, validated=True)
+    if error:
+        return {'error': error}
+    if timer is not None:
+        timer.mark('validate')
+
+    args = arguments(definition, request)
+    if definition.prepare is not None:
+        try:
+            args = definition.prepare(request, args)
+        except ValueError as err:
+            return {'error': str(err)}
+    if timer is not None:
+        timer.mark('normalize')
+
+    logger.info("Calling %s with args: %s", definition.call_name, log_helper.summarize(args))
+    if definition.warm_start is not None and guesses.enabled:
+        compute = lambda: __to_result(definition.warm_start(request, args))
+    else:
+        compute = lambda: __to_result(definition.backend(*args))
+    return respond(definition, request, args, compute, timer)
+
+
+def arguments(definition, request):
+    """
+    Arguments of the backend of a function, in the order of its parameters and with their defaults
+    :param definition: FunctionDefinition of the function
+    :param request: Dict containing the parameters to pass to the formula, already validated
+    :return: List of arguments
+    """
+    return [request[name] if default is REQUIRED else request.get(name, default)
+            for name, default in definition.parameters]
+
+
+def respond(definition, request, args, compute, timer=None):
+    """
+    Response of a request whose result is computed, or looked up in the result cache for cached functions. Batches
+    evaluating many requests in one call build the response of each through here, like the single requests.
+    :param definition: FunctionDefinition of the function
+    :param request: Dict containing the parameters of the request, for its result_encoding
+    :param args: Arguments of the backend, which make the key of the result cache
+    :param compute: Function without arguments computing the result
+    :param timer: PhaseTimer of the request, or None when the phase metrics are disabled
+    :return: Dict with a 'result' entry, with its arrays encoded as binary columns when the request has a
+    result_encoding of 'base64'
+    """
+    result = __cached(definition.call_name, args, compute) if definition.cached else compute()
+    if timer is not None:
+        timer.mark('compute')
+    response = definition.respond(result)
+    if request.get('result_encoding') == binary_arrays.BASE64:
+        response = binary_arrays.encode_response(response)
+    if timer is not None:
+        timer.mark('post_process')
+    return response
+
+
+def __handler_of(name):
+    """
+    Lambda handler of a function, evaluating its requests with its FunctionDefinition
+    """
+    definition = FUNCTIONS[name]
+
+    def handler(request, context):
+        log_helper.log_request(logger, definition.label, request)
+        if profiler.enabled:
+            return profiler.run(name, evaluate, definition, request)
+        return evaluate(definition, request)
+
+    handler.__name__ = handler.__qualname__ = name + '_handler'
+    handler.__doc__ = """
+    {}
     :param request: Dict containing the parameters to pass to the formula.
     :param context: Lambda execution context
     :return: Dict with a 'result' entry containing the result of the calculation
-    """
-    logger.info("SLN request: {}".format(request))
-
-    validation_result = __validate_arguments('sln', request, schemas.sln_schema)
-    if not validation_result.get('isValid'):
-        return {'error': validation_result.get('error')}
-    if request['life'] == 0:
-        return {'error': 'life cannot be zero'}
-
-    args = [request['cost'], request['salvage'], request['life']]
-    return __call_ff('sln', args)
-
+    """.format(definition.description)
+    return handler
+
+
+fv_handler = __handler_of('fv')
+fvschedule_handler = __handler_of('fvschedule')
+pv_handler = __handler_of('pv')
+npv_handler = __handler_of('npv')
+xnpv_handler = __handler_of('xnpv')
+pmt_handler = __handler_of('pmt')
+ppmt_handler = __handler_of('ppmt')
+amortization_handler = __handler_of('amortization')
+irr_handler = __handler_of('irr')
+irr_batch_handler = __handler_of('irr_batch')
+mirr_handler = __handler_of('mirr')
+xirr_handler = __handler_of('xirr')
+nper_handler = __handler_of('nper')
+rate_handler = __handler_of('rate')
+effect_handler = __handler_of('effect')
+nominal_handler = __handler_of('nominal')
+sln_handler = __handler_of('sln')
@@ -0,0 +1,21 @@
+# Deferred imports for heavy dependencies, so that each function only pays for the modules it actually uses
+
+import importlib
+
+
+class LazyModule(object):
+    """
+    Stand-in for a module that is imported the first time one of its attributes is used.
+    Attributes are cached on the stand-in after their first lookup, so later uses cost a plain attribute access.
+    """
+
+    def __init__(self, module_name):
+        self._module_name = module_name
+
+    def __getattr__(self, attribute):
+        value = getattr(importlib.import_module(self._module_name), attribute)
+        setattr(self, attribute, value)
+        return value
+
+    def __repr__(self):
+        return "<lazy module '{}'>".format(self._module_name)
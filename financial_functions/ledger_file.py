@@ -0,0 +1,233 @@
+# Ledgers of dated cash flows stored in a binary file, for XNPV and XIRR over more rows than fit in memory as Python
+# lists. The file is memory-mapped and evaluated in fixed-size chunks of rows, and the pages of every chunk are released
+# once it is evaluated, so resident memory stays flat whatever the size of the file.
+#
+# Layout, little-endian: the 8 byte magic FFLEDGR1, the row count as uint64, the float64 values of all rows, then the
+# int32 day ordinals of all rows, where 0001-01-01 is day 1 like Python's date.toordinal.
+
+import math
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from lazy_import import LazyModule
+import core
+
+numpy = LazyModule('numpy')
+
+MAGIC = b'FFLEDGR1'
+HEADER = struct.Struct('<8sQ')
+VALUE_DTYPE = '<f8'
+ORDINAL_DTYPE = '<i4'
+# Bytes per row: a float64 value and an int32 ordinal
+ROW_BYTES = 12
+
+# Rows evaluated at once, 768 KiB of the file
+CHUNK_ROWS = 1 << 16
+
+
+class LedgerFile(object):
+    """
+    Read-only memory map of a ledger file
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path of the ledger file
+        :raises ValueError: if the file is not a ledger file or is truncated
+        """
+        with open(path, 'rb') as ledger:
+            header = ledger.read(HEADER.size)
+            if len(header) != HEADER.size or header[:len(MAGIC)] != MAGIC:
+                raise ValueError('{} is not a ledger file'.format(path))
+            self.rows = HEADER.unpack(header)[1]
+            size = os.fstat(ledger.fileno()).st_size
+            if size != HEADER.size + self.rows * ROW_BYTES:
+                raise ValueError('{} should have {} bytes for {} rows, it has {}'.format(
+                    path, HEADER.size + self.rows * ROW_BYTES, self.rows, size))
+            self.__mmap = mmap.mmap(ledger.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__ordinals_offset = HEADER.size + 8 * self.rows
+
+    def __len__(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Unmap the file
+        """
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+
+    def chunks(self, chunk_rows=CHUNK_ROWS):
+        """
+        Iterate over the rows in order, chunk_rows at a time. The pages of a chunk are released when the next one is
+        requested.
+        :return: Iterator of (values, ordinals) tuples of a float64 and an int64 array, copied out of the file
+        """
+        for start in range(0, self.rows, chunk_rows):
+            stop = min(start + chunk_rows, self.rows)
+            values = numpy.frombuffer(self.__mmap, VALUE_DTYPE, stop - start, HEADER.size + 8 * start)
+            ordinals = numpy.frombuffer(self.__mmap, ORDINAL_DTYPE, stop - start, self.__ordinals_offset + 4 * start)
+            chunk = (values.astype(numpy.float64), ordinals.astype(numpy.int64))
+            # The views export the buffer of the map, which cannot be closed while they exist
+            del values, ordinals
+            yield chunk
+            self.__release(HEADER.size + 8 * start, HEADER.size + 8 * stop)
+            self.__release(self.__ordinals_offset + 4 * start, self.__ordinals_offset + 4 * stop)
+
+    def __release(self, start, stop):
+        """
+        Drop the pages lying entirely between two offsets from resident memory. They are read again from the file
+        when needed.
+        """
+        start = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+        stop = stop // mmap.PAGESIZE * mmap.PAGESIZE
+        if stop > start and hasattr(self.__mmap, 'madvise'):
+            self.__mmap.madvise(mmap.MADV_DONTNEED, start, stop - start)
+
+    def first_ordinal(self):
+        """
+        Day ordinal of the first row
+        """
+        return int(numpy.frombuffer(self.__mmap, ORDINAL_DTYPE, 1, self.__ordinals_offset)[0])
+
+    def check_dates(self, chunk_rows=CHUNK_ROWS):
+        """
+        Check that the ledger has rows and that their dates are in chronological order, reading it once
+        :raises ValueError: if the ledger is empty or its dates are not in chronological order
+        """
+        if not self.rows:
+            raise ValueError('the ledger has no rows')
+        previous = self.first_ordinal()
+        for _, ordinals in self.chunks(chunk_rows):
+            if ordinals[0] < previous or (ordinals[1:] < ordinals[:-1]).any():
+                raise ValueError('dates must be in chronological order')
+            previous = ordinals[-1]
+
+    def xnpv(self, rate, chunk_rows=CHUNK_ROWS):
+        """
+        Net Present Value of the cash flows of the ledger, like core.xnpv over all of its rows. Each chunk is evaluated
+        with core.xnpv and discounted from its first date to the first date of the ledger.
+        :raises ValueError: if the ledger is empty or its dates are not in chronological order
+        """
+        if not self.rows:
+            raise ValueError('the ledger has no rows')
+        first = self.first_ordinal()
+        previous = first
+        partials = []
+        for values, ordinals in self.chunks(chunk_rows):
+            if ordinals[0] < previous:
+                raise ValueError('dates must be in chronological order')
+            previous = ordinals[-1]
+            partials.append(core.xnpv(rate, values, ordinals) * (1 + rate) ** (-(ordinals[0] - first) / 365.0))
+        return math.fsum(partials)
+
+    def xirr(self, guess=0.1, tol=1.48e-8, maxiter=50, full_output=False, chunk_rows=CHUNK_ROWS):
+        """
+        Internal rate of return of the cash flows of the ledger, like core.xirr over all of its rows. Every iteration
+        of core.find_root reads the ledger once, chunk by chunk.
+        :raises ValueError: if the ledger is empty or its dates are not in chronological order
+        :raises RuntimeError: if the rate does not converge, unless full_output is set
+        """
+        self.check_dates(chunk_rows)
+        first = self.first_ordinal()
+
+        def xnpv_with_derivative(rate):
+            totals, derivatives = [], []
+            for values, ordinals in self.chunks(chunk_rows):
+                years = (ordinals - first) / 365.0
+                with numpy.errstate(over='ignore', invalid='ignore', divide='ignore'):
+                    flows = values * (1 + rate) ** -years
+                    totals.append(flows.sum())
+                    derivatives.append(-(flows * years).sum() / (1 + rate))
+            return math.fsum(totals), math.fsum(derivatives)
+
+        result = core.find_root(xnpv_with_derivative, guess, tol, maxiter)
+        if full_output:
+            return result
+        if not result.converged:
+            raise RuntimeError('Failed to converge after {} iterations, value is {}'.format(result.iterations,
+                                                                                            result.root))
+        return result.root
+
+
+class LedgerWriter(object):
+    """
+    Writes a ledger file from rows appended in batches, keeping only one batch in memory. The ordinals are kept in a
+    temporary file until the writer is closed, then appended after the values.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path of the ledger file, replaced if it exists
+        """
+        self.path = path
+        self.rows = 0
+        self.__file = open(path, 'wb')
+        self.__file.write(HEADER.pack(MAGIC, 0))
+        self.__ordinals = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.__discard()
+
+    def append(self, values, ordinals):
+        """
+        Append rows to the ledger
+        :param values: Cash flows of the rows
+        :param ordinals: Day ordinals of the rows
+        :raises ValueError: if values and ordinals have different lengths or an ordinal does not fit in an int32
+        """
+        values = numpy.asarray(values, dtype=VALUE_DTYPE)
+        ordinals = numpy.asarray(ordinals)
+        if len(values) != len(ordinals):
+            raise ValueError('values and dates must be the same length')
+        if len(ordinals) and (ordinals.min() < 1 or ordinals.max() > numpy.iinfo(numpy.int32).max):
+            raise ValueError('day ordinals must be between 1 and {}'.format(numpy.iinfo(numpy.int32).max))
+        self.__file.write(values.tobytes())
+        self.__ordinals.write(ordinals.astype(ORDINAL_DTYPE).tobytes())
+        self.rows += len(values)
+
+    def close(self):
+        """
+        Complete the ledger file
+        """
+        if self.__file is None:
+            return
+        self.__ordinals.seek(0)
+        shutil.copyfileobj(self.__ordinals, self.__file)
+        self.__file.seek(0)
+        self.__file.write(HEADER.pack(MAGIC, self.rows))
+        self.__file.close()
+        self.__ordinals.close()
+        self.__file = None
+
+    def __discard(self):
+        self.__file.close()
+        self.__ordinals.close()
+        self.__file = None
+        os.remove(self.path)
+
+
+def write(path, values, ordinals):
+    """
+    Write a ledger file from arrays in memory
+    :param path: Path of the ledger file
+    :param values: Cash flows
+    :param ordinals: Day ordinals of the cash flows
+    """
+    with LedgerWriter(path) as writer:
+        writer.append(values, ordinals)
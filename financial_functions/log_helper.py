@@ -1,6 +1,20 @@
 import os
 import sys
+import json
+import time
+import hashlib
 import logging
+import random
+
+# Lists, tuples and arrays with more items than this are logged as a summary of their length, minimum, maximum and hash
+MAX_LOGGED_ITEMS = int(os.getenv('LOG_MAX_ITEMS', '10'))
+# Strings longer than this are truncated in logs
+MAX_LOGGED_CHARS = int(os.getenv('LOG_MAX_CHARS', '200'))
+# Fraction of requests whose complete payload is logged at DEBUG level, between 0 and 1
+PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0'))
+
+_NUMBER_TYPES = (int, float)
+
 
 def getLogger(name):
     """
@@ -15,3 +29,117 @@ def getLogger(name):
     logger = logging.getLogger(name)
     logger.setLevel(numeric_level)
     return logger
+
+
+class Summary(object):
+    """
+    Log argument standing in for a request payload or any other value. It is only turned into text when a log record
+    containing it is actually emitted, with large arrays summarized and long strings truncated.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return _summarize(self.value)
+
+    __repr__ = __str__
+
+
+def summarize(value):
+    """
+    Wrap a value to be logged as a %s argument of a logger call
+    :param value: Payload to log
+    :return: Summary formatting the value when the record is emitted
+    """
+    return Summary(value)
+
+
+def log_request(logger, function_name, request):
+    """
+    Log a request at INFO level as a summary. A sample of requests, set by the LOG_PAYLOAD_SAMPLE_RATE environment
+    variable, is logged completely at DEBUG level as well.
+    :param logger: Logger to log to
+    :param function_name: Name of the function the request is for
+    :param request: Request payload
+    """
+    logger.info("%s request: %s", function_name, Summary(request))
+    if PAYLOAD_SAMPLE_RATE > 0 and logger.isEnabledFor(logging.DEBUG) and random.random() < PAYLOAD_SAMPLE_RATE:
+        logger.debug("%s full request: %s", function_name, request)
+
+
+def metric_line(namespace, dimensions, values, unit='Milliseconds'):
+    """
+    CloudWatch Embedded Metric Format line of metric values
+    :param namespace: CloudWatch namespace of the metrics
+    :param dimensions: Dict of the dimension names and values, all used as one dimension set
+    :param values: Dict of the metric names and values
+    :param unit: CloudWatch unit of the values
+    :return: JSON text of the line
+    """
+    line = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': namespace,
+                'Dimensions': [sorted(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': unit} for name in values]
+            }]
+        }
+    }
+    line.update(dimensions)
+    line.update(values)
+    return json.dumps(line, separators=(',', ':'))
+
+
+def emit_metrics(namespace, dimensions, values, unit='Milliseconds'):
+    """
+    Write metric values as an Embedded Metric Format line to stdout, where Lambda sends it to CloudWatch Logs and
+    CloudWatch extracts the metrics from it. It is not logged through logging, whose prefix would hide the JSON.
+    """
+    sys.stdout.write(metric_line(namespace, dimensions, values, unit) + '\n')
+    sys.stdout.flush()
+
+
+def _summarize(value):
+    """
+    Text for a value with lists, tuples and arrays of more than MAX_LOGGED_ITEMS items replaced by a summary
+    """
+    if isinstance(value, dict):
+        return '{' + ', '.join('{!r}: {}'.format(key, _summarize(item)) for key, item in value.items()) + '}'
+    if isinstance(value, (list, tuple)):
+        if len(value) > MAX_LOGGED_ITEMS:
+            return _summarize_sequence(value)
+        text = ', '.join(_summarize(item) for item in value)
+        return '[' + text + ']' if isinstance(value, list) else '(' + text + (',)' if len(value) == 1 else ')')
+    if type(value).__module__ == 'numpy' and hasattr(value, 'tobytes') and getattr(value, 'ndim', 0) > 0:
+        return _summarize_array(value)
+    text = repr(value)
+    if len(text) > MAX_LOGGED_CHARS:
+        return '{}...<{} chars>'.format(text[:MAX_LOGGED_CHARS], len(text))
+    return text
+
+
+def _summarize_sequence(values):
+    """
+    Summary of a list or tuple: its length, the minimum and maximum of plain numbers or strings and a hash of its items
+    """
+    fields = ['len={}'.format(len(values))]
+    if all(type(item) in _NUMBER_TYPES for item in values) or all(type(item) is str for item in values):
+        fields.append('min={!r} max={!r}'.format(min(values), max(values)))
+    fields.append('hash={}'.format(hashlib.blake2b(repr(values).encode(), digest_size=8).hexdigest()))
+    return '<{} {}>'.format(type(values).__name__, ' '.join(fields))
+
+
+def _summarize_array(array):
+    """
+    Summary of a NumPy array, or the array itself when it is small
+    """
+    if array.size <= MAX_LOGGED_ITEMS:
+        return _summarize(array.tolist())
+    fields = ['shape={}'.format(array.shape), 'dtype={}'.format(array.dtype)]
+    if array.dtype.kind in 'iuf':
+        fields.append('min={!r} max={!r}'.format(array.min().item(), array.max().item()))
+    fields.append('hash={}'.format(hashlib.blake2b(array.tobytes(), digest_size=8).hexdigest()))
+    return '<ndarray {}>'.format(' '.join(fields))
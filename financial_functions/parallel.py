@@ -0,0 +1,316 @@
+# Process pool running the core cash flow kernels on large arrays. Large arrays are handed to the workers through
+# multiprocessing.shared_memory blocks instead of being pickled, and large results come back the same way. AWS Lambda
+# provides no /dev/shm, so this is meant for the batch tools and our own hosts rather than for the handlers.
+
+import collections
+import concurrent.futures
+import datetime
+import math
+import os
+from multiprocessing import resource_tracker, shared_memory
+from lazy_import import LazyModule
+import core
+
+numpy = LazyModule('numpy')
+numpy_financial = LazyModule('numpy_financial')
+
+# Items from which an array argument is passed through shared memory and its job is split across the workers
+SHARED_MEMORY_THRESHOLD = 10000
+
+# Kinds of array arguments: cash flows are passed as float64, dates as int64 day ordinals and series of irr_batch as a
+# 2-D float64 array padded with zeros
+VALUES, DATES, ROWS = 'values', 'dates', 'rows'
+
+# Array argument stored in a shared memory block, as sent to the workers
+SharedArray = collections.namedtuple('SharedArray', ['name', 'dtype', 'shape'])
+
+# Kernel run by the workers. function computes a whole job from its arguments. arrays maps the positions of array
+# arguments to their kind. split computes the part of a large job between two indexes of its arrays, or is None when
+# jobs cannot be split. outputs gives the dtypes of the per-row result arrays that split writes into, or None when the
+# partial results are numbers that add up to the result of the job.
+Kernel = collections.namedtuple('Kernel', ['function', 'arrays', 'split', 'outputs'])
+
+
+class ParallelExecutor(object):
+    """
+    Process pool computing many jobs of one kernel. Jobs with an array of at least shared_threshold items have their
+    arrays copied once into shared memory, which the workers map without copying, and are split into one range of
+    their arrays per worker where the kernel allows it. Smaller jobs are pickled to the workers in chunks.
+    """
+
+    def __init__(self, workers=None, shared_threshold=SHARED_MEMORY_THRESHOLD, chunk_size=None):
+        """
+        :param workers: Number of worker processes, 0 to compute every job in this process. Defaults to the CPUs.
+        :param shared_threshold: Items of an array argument from which it is passed through shared memory
+        :param chunk_size: Small jobs sent to a worker at once. Defaults to about four chunks per worker.
+        """
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.shared_threshold = shared_threshold
+        self.chunk_size = chunk_size
+        self.__executor = None
+        if self.workers:
+            # Workers attaching to blocks must report to the tracker of this process, so it has to run before they start
+            resource_tracker.ensure_running()
+            self.__executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Stop the worker processes
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+    def map(self, name, jobs):
+        """
+        Compute jobs of a kernel
+        :param name: Name of the kernel: npv, xnpv, xirr or irr_batch
+        :param jobs: Iterable of tuples of the positional arguments of numpy_financial.npv or the core function
+        :return: List of the results in the order of the jobs. The first exception raised by a job is raised again.
+        """
+        kernel = KERNELS[name]
+        jobs = [tuple(job) for job in jobs]
+        if not self.workers:
+            return [kernel.function(*job) for job in jobs]
+
+        blocks = {}
+        futures = []
+        large = []
+        try:
+            small = [index for index, job in enumerate(jobs) if not self.__is_large(kernel, job)]
+            chunk_size = self.chunk_size or max(1, int(math.ceil(len(small) / (4.0 * self.workers))))
+            chunks = [small[start:start + chunk_size] for start in range(0, len(small), chunk_size)]
+            for indexes in chunks:
+                futures.append(self.__executor.submit(
+                    _run_tasks, [(name, jobs[index], None, None, None) for index in indexes]))
+            small = set(small)
+            for index in range(len(jobs)):
+                if index not in small:
+                    large.append((index,) + self.__submit_large(name, kernel, jobs[index], blocks, futures))
+
+            return _collect(kernel, len(jobs), zip(chunks, futures), large)
+        finally:
+            for future in futures:
+                future.cancel()
+            # The views of the blocks have to be gone before the blocks can be closed
+            del large[:]
+            _release(blocks)
+
+    def __is_large(self, kernel, job):
+        return any(_item_count(job[position]) >= self.shared_threshold
+                   for position in kernel.arrays if position < len(job))
+
+    def __submit_large(self, name, kernel, job, blocks, futures):
+        """
+        Copy the arrays of a large job into shared memory and submit one task per range of its arrays
+        :return: Tuple of the futures of the tasks, also appended to futures, and the shared output arrays, or None
+        when the kernel has no outputs
+        """
+        args = list(job)
+        for position, kind in kernel.arrays.items():
+            if position < len(args):
+                args[position] = _share(args[position], kind, blocks)
+        lengths = set(arg.shape[0] for arg in args if isinstance(arg, SharedArray))
+        if len(lengths) > 1:
+            raise ValueError('values and dates must be the same length')
+        length = lengths.pop()
+        items = max(_item_count(arg) for arg in args if isinstance(arg, SharedArray))
+
+        outputs = descriptors = None
+        if kernel.outputs is not None:
+            outputs = [_create(dtype, (length,), blocks) for dtype in kernel.outputs]
+            descriptors = [_describe(output, blocks) for output in outputs]
+
+        count = 1 if kernel.split is None else max(1, min(self.workers, length, items // self.shared_threshold))
+        bounds = [length * part // count for part in range(count + 1)]
+        parts = [self.__executor.submit(_run_tasks, [(name, tuple(args), start, stop, descriptors)])
+                 for start, stop in zip(bounds, bounds[1:])]
+        futures.extend(parts)
+        return parts, outputs
+
+
+def _collect(kernel, count, chunks, large):
+    """
+    Results of the jobs of a map call from the futures of its chunks of small jobs and the tasks of its large jobs
+    """
+    results = [None] * count
+    for indexes, future in chunks:
+        for index, result in zip(indexes, future.result()):
+            results[index] = result
+    for index, parts, outputs in large:
+        partials = [future.result()[0] for future in parts]
+        if outputs is not None:
+            results[index] = core.SolverResult(*[numpy.array(output) for output in outputs])
+        elif kernel.split is None:
+            results[index] = partials[0]
+        else:
+            results[index] = math.fsum(partials)
+    return results
+
+
+def _item_count(value):
+    """
+    Number of items of an array argument, counting every cash flow of the series of irr_batch
+    """
+    if isinstance(value, SharedArray):
+        return int(numpy.prod(value.shape))
+    if hasattr(value, 'size'):
+        return value.size
+    if isinstance(value, (list, tuple)):
+        if value and isinstance(value[0], (list, tuple)):
+            return sum(len(row) for row in value)
+        return len(value)
+    return 0
+
+
+def _as_array(value, kind):
+    """
+    Array argument as the array stored in shared memory
+    """
+    if kind == DATES:
+        if isinstance(value, numpy.ndarray):
+            if numpy.issubdtype(value.dtype, numpy.datetime64):
+                return value.astype('datetime64[D]').astype(numpy.int64)
+            return value.astype(numpy.int64, copy=False)
+        return numpy.fromiter(map(datetime.date.toordinal, value), numpy.int64, len(value))
+    if kind == ROWS and isinstance(value, numpy.ndarray):
+        return numpy.atleast_2d(value).astype(numpy.float64, copy=False)
+    if kind == ROWS:
+        rows = numpy.zeros((len(value), max([len(row) for row in value] or [0])))
+        for index, row in enumerate(value):
+            rows[index, :len(row)] = row
+        return rows
+    return numpy.asarray(value, dtype=numpy.float64)
+
+
+def _create(dtype, shape, blocks):
+    """
+    Array in a new shared memory block owned by this process
+    """
+    dtype = numpy.dtype(dtype)
+    block = shared_memory.SharedMemory(create=True, size=max(1, int(numpy.prod(shape)) * dtype.itemsize))
+    array = numpy.ndarray(shape, dtype, buffer=block.buf)
+    blocks[id(array)] = (block, array)
+    return array
+
+
+def _share(value, kind, blocks):
+    """
+    Descriptor of a copy of an array argument in shared memory. An argument passed to several jobs is copied once.
+    """
+    if id(value) in blocks:
+        return _describe(blocks[id(value)][1], blocks)
+    array = _as_array(value, kind)
+    shared = _create(array.dtype, array.shape, blocks)
+    shared[...] = array
+    # Keep the argument alive with its block, so that its id cannot be reused by another argument
+    blocks[id(value)] = (None, shared, value)
+    return _describe(shared, blocks)
+
+
+def _describe(array, blocks):
+    return SharedArray(blocks[id(array)][0].name, array.dtype.str, array.shape)
+
+
+def _release(blocks):
+    """
+    Close and remove the shared memory blocks of a map call
+    """
+    owned = [entry[0] for entry in blocks.values() if entry[0] is not None]
+    blocks.clear()
+    for block in owned:
+        block.close()
+        block.unlink()
+
+
+def _run_tasks(tasks):
+    """
+    Run a list of (kernel name, arguments, start, stop, outputs) tasks in a worker. Tasks without a range compute a
+    whole job from pickled arguments, the others the range of a job whose arrays are in shared memory.
+    """
+    return [_run_task(*task) for task in tasks]
+
+
+def _run_task(name, args, start, stop, outputs):
+    kernel = KERNELS[name]
+    if start is None:
+        return kernel.function(*args)
+
+    blocks = []
+    try:
+        return _run_range(kernel, args, start, stop, outputs, blocks)
+    except Exception as err:
+        # Drop the traceback, whose frames hold views of the blocks, so that the blocks can be closed
+        error = err.with_traceback(None)
+    finally:
+        for block in blocks:
+            block.close()
+    raise error
+
+
+def _run_range(kernel, args, start, stop, outputs, blocks):
+    args = [_attach(arg, blocks) if isinstance(arg, SharedArray) else arg for arg in args]
+    outputs = [_attach(output, blocks) for output in outputs or []]
+    if kernel.split is None:
+        return kernel.function(*args)
+    return kernel.split(start, stop, args, outputs)
+
+
+def _attach(descriptor, blocks):
+    block = shared_memory.SharedMemory(name=descriptor.name)
+    blocks.append(block)
+    return numpy.ndarray(descriptor.shape, numpy.dtype(descriptor.dtype), buffer=block.buf)
+
+
+def _npv(rate, values):
+    return float(numpy_financial.npv(rate, values))
+
+
+def _npv_range(start, stop, args, outputs):
+    """
+    NPV of the cash flows of periods start to stop, discounted to period 0 like numpy_financial.npv
+    """
+    rate, values = args
+    periods = numpy.arange(start, stop, dtype=numpy.float64)
+    return float((values[start:stop] / (1 + rate) ** periods).sum())
+
+
+def _xnpv_range(start, stop, args, outputs):
+    """
+    XNPV of the cash flows from start to stop, discounted to the first date of the whole schedule
+    """
+    rate, values, ordinals = args
+    # The range overlaps the previous one by a date, so that the order is checked across ranges as well
+    overlap = ordinals[max(0, start - 1):stop]
+    if len(overlap) > 1 and (overlap[1:] < overlap[:-1]).any():
+        raise ValueError('dates must be in chronological order')
+    years = (ordinals[start:stop] - ordinals[0]) / 365.0
+    return float((values[start:stop] / (1 + rate) ** years).sum())
+
+
+def _irr_batch_range(start, stop, args, outputs):
+    """
+    Solve the rows from start to stop with core.irr_batch and write the SolverResult fields into the output arrays.
+    A guess per row is sliced like the rows.
+    """
+    args = list(args)
+    if len(args) > 1 and numpy.ndim(args[1]):
+        args[1] = numpy.asarray(args[1])[start:stop]
+    result = core.irr_batch(args[0][start:stop], *args[1:])
+    for output, field in zip(outputs, result):
+        output[start:stop] = field
+
+
+# Kernels by name. Results match numpy_financial.npv and the core functions up to floating point rounding.
+KERNELS = {
+    'npv': Kernel(_npv, {1: VALUES}, _npv_range, None),
+    'xnpv': Kernel(core.xnpv, {1: VALUES, 2: DATES}, _xnpv_range, None),
+    'xirr': Kernel(core.xirr, {0: VALUES, 1: DATES}, None, None),
+    'irr_batch': Kernel(core.irr_batch, {0: ROWS}, _irr_batch_range, ('float64', 'int64', 'bool'))
+}
@@ -0,0 +1,240 @@
+# Latency of the phases of handler invocations: validating the request against its schema and checks, normalizing its
+# arguments (decoding binary columns, parsing dates, building cash flow series), computing the result, and
+# post-processing it into the response. Every invocation is recorded with its function name, the size bucket of its
+# largest array argument and whether it was the first of the container, either as CloudWatch Embedded Metric Format
+# log lines or into local histograms for tests and benchmarks.
+
+import math
+import os
+import threading
+import time
+import binary_arrays
+import log_helper
+
+PHASES = ('validate', 'normalize', 'compute', 'post_process')
+
+# CloudWatch namespace of the metrics, unless set by PHASE_METRICS_NAMESPACE
+NAMESPACE = 'FinancialFunctions'
+
+# Upper bound of the first histogram bucket in milliseconds, each next bucket is twice as wide
+HISTOGRAM_RESOLUTION_MS = 0.001
+
+
+def request_size(request):
+    """
+    Number of items of the largest array argument of a request, 1 for requests of scalars only. The arguments of
+    wrapper requests are looked into, and a batch counts its sub-requests.
+    """
+    if isinstance(request, dict):
+        if binary_arrays.is_column(request):
+            count = 1
+            for size in request.get('shape', ()):
+                count *= size if isinstance(size, int) else 1
+            return count
+        return max([request_size(value) for value in request.values()] or [1])
+    if isinstance(request, (list, tuple)) or hasattr(request, 'ndim'):
+        return len(request) if getattr(request, 'ndim', 1) else 1
+    return 1
+
+
+def size_bucket(size):
+    """
+    Power of ten a size is rounded up to, as a metric dimension: '1', '10', '100'...
+    """
+    return str(10 ** int(math.ceil(math.log10(size)))) if size > 1 else '1'
+
+
+class PhaseTimer(object):
+    """
+    Durations of the phases of one invocation. Each mark adds the time elapsed since the previous mark to a phase, so
+    that a phase interrupted by another, such as validation finished after decoding the arguments, is added up.
+    """
+    __slots__ = ('function_name', 'size', 'durations', 'last')
+
+    def __init__(self, function_name, size):
+        self.function_name = function_name
+        self.size = size
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        """
+        End a phase
+        :param phase: One of PHASES
+        """
+        now = time.perf_counter()
+        self.durations[phase] += now - self.last
+        self.last = now
+
+    def share(self, group, count):
+        """
+        Add an equal share of the phases timed for a group of invocations evaluated together, such as the rows of a
+        vectorized batch, and continue timing from now
+        :param group: PhaseTimer of the group
+        :param count: Number of invocations in the group
+        """
+        for phase, seconds in group.durations.items():
+            self.durations[phase] += seconds / count
+        self.last = time.perf_counter()
+
+
+class Histogram(object):
+    """
+    Durations counted in buckets growing by factors of 2 from HISTOGRAM_RESOLUTION_MS, with their exact count, sum,
+    minimum and maximum
+    """
+    __slots__ = ('buckets', 'count', 'total', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = 0.0
+
+    def add(self, milliseconds):
+        bucket = 0
+        if milliseconds > HISTOGRAM_RESOLUTION_MS:
+            bucket = int(math.ceil(math.log2(milliseconds / HISTOGRAM_RESOLUTION_MS)))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += milliseconds
+        self.minimum = min(self.minimum, milliseconds)
+        self.maximum = max(self.maximum, milliseconds)
+
+    def merge(self, other):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    def percentile(self, fraction):
+        """
+        Upper bound of the bucket holding a percentile, at most the maximum duration
+        :param fraction: Percentile between 0 and 1
+        """
+        if not self.count:
+            return math.nan
+        rank = max(1, int(math.ceil(fraction * self.count)))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(HISTOGRAM_RESOLUTION_MS * 2 ** bucket, self.maximum)
+        return self.maximum
+
+
+class HistogramSink(object):
+    """
+    Sink aggregating the durations of every phase into a Histogram per function name, size bucket, cold or warm start
+    and phase
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.__lock = threading.Lock()
+
+    def __call__(self, dimensions, durations):
+        key = (dimensions['FunctionName'], dimensions['SizeBucket'], dimensions['Start'])
+        with self.__lock:
+            for phase, milliseconds in durations.items():
+                histogram = self.histograms.get(key + (phase,))
+                if histogram is None:
+                    histogram = self.histograms[key + (phase,)] = Histogram()
+                histogram.add(milliseconds)
+
+    def histogram(self, function_name, phase):
+        """
+        Histogram of a phase of a function over all sizes and starts
+        """
+        merged = Histogram()
+        with self.__lock:
+            for (name, _, _, histogram_phase), histogram in self.histograms.items():
+                if name == function_name and histogram_phase == phase:
+                    merged.merge(histogram)
+        return merged
+
+    def summary(self):
+        """
+        :return: Dict mapping 'function/phase' to the count, mean, median, 99th percentile and maximum in milliseconds
+        """
+        names = sorted(set(key[0] for key in self.histograms))
+        summary = {}
+        for name in names:
+            for phase in PHASES:
+                histogram = self.histogram(name, phase)
+                if histogram.count:
+                    summary['{}/{}'.format(name, phase)] = {
+                        'count': histogram.count, 'mean_ms': histogram.mean, 'p50_ms': histogram.percentile(0.5),
+                        'p99_ms': histogram.percentile(0.99), 'max_ms': histogram.maximum}
+        return summary
+
+
+class EmfSink(object):
+    """
+    Sink writing every invocation as a CloudWatch Embedded Metric Format line
+    """
+
+    def __init__(self, namespace=NAMESPACE):
+        self.namespace = namespace
+
+    def __call__(self, dimensions, durations):
+        log_helper.emit_metrics(self.namespace, dimensions, durations)
+
+
+class Recorder(object):
+    """
+    Starts the PhaseTimer of invocations and hands their durations to a sink. Without a sink the handlers do not time
+    anything.
+    """
+
+    def __init__(self, sink=None):
+        """
+        :param sink: Function called with the dimensions of an invocation and the durations of its phases in
+        milliseconds, None to disable the metrics
+        """
+        self.sink = sink
+        self.cold = True
+
+    @property
+    def enabled(self):
+        return self.sink is not None
+
+    def start(self, function_name, request):
+        """
+        Timer of an invocation, started now
+        :param function_name: Name of the function, which can be set on the timer later when not known yet
+        :param request: Request of the invocation, sized for the SizeBucket dimension
+        """
+        return PhaseTimer(function_name, request_size(request))
+
+    def record(self, timer):
+        """
+        Hand the durations of a finished invocation to the sink. The first invocation recorded is the cold start.
+        """
+        dimensions = {'FunctionName': timer.function_name, 'SizeBucket': size_bucket(timer.size),
+                      'Start': 'cold' if self.cold else 'warm'}
+        self.cold = False
+        self.sink(dimensions, dict((phase, round(seconds * 1000.0, 6)) for phase, seconds in timer.durations.items()))
+
+
+def from_environment():
+    """
+    Recorder configured by the PHASE_METRICS environment variable: 'emf' for Embedded Metric Format lines in the
+    namespace set by PHASE_METRICS_NAMESPACE, 'local' for histograms kept in memory, disabled when unset or 'off'
+    :raises ValueError: if PHASE_METRICS has another value
+    """
+    mode = os.getenv('PHASE_METRICS', 'off').lower()
+    if mode == 'emf':
+        return Recorder(EmfSink(os.getenv('PHASE_METRICS_NAMESPACE', NAMESPACE)))
+    if mode == 'local':
+        return Recorder(HistogramSink())
+    if mode in ('', 'off'):
+        return Recorder()
+    raise ValueError('Invalid PHASE_METRICS: {}, use emf, local or off'.format(mode))
@@ -0,0 +1,135 @@
+# Profiling of a sample of the invocations with cProfile, to see where the time of a function goes inside
+# numpy_financial or core in production. The stats of the sampled invocations of each function are added up for the
+# lifetime of the container and written to a pstats file after every sample, which can be read with pstats or snakeviz.
+
+import os
+import random
+import threading
+import log_helper
+from lazy_import import LazyModule
+
+# Only imported when a request is profiled
+cProfile = LazyModule('cProfile')
+pstats = LazyModule('pstats')
+
+logger = log_helper.getLogger(__name__)
+
+# Directory of the stats files, the only writable one on Lambda, unless set by PROFILE_DIR
+DIRECTORY = '/tmp'
+
+
+def hot_functions(stats, top):
+    """
+    Functions that took the most time themselves, excluding the functions they called
+    :param stats: pstats.Stats of a profile
+    :param top: Number of functions
+    :return: List of dicts with the function as file:line(name), its number of calls, its own time and its cumulative
+    time in milliseconds
+    """
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    return [{'function': __function_name(function), 'calls': calls, 'own_ms': round(own * 1000.0, 6),
+             'cumulative_ms': round(cumulative * 1000.0, 6)}
+            for function, (_, calls, own, cumulative, _) in rows]
+
+
+def __function_name(function):
+    """
+    file:line(name) of a profiled function, with the file reduced to its package directory and name
+    """
+    filename, line, name = function
+    if filename == '~':
+        # Built-in functions have no file
+        return name
+    return '{}:{}({})'.format('/'.join(filename.split(os.sep)[-2:]), line, name)
+
+
+class Profiler(object):
+    """
+    Profiles a fraction of the calls it runs and aggregates their stats per function name
+    """
+
+    def __init__(self, sample_rate=0.0, directory=DIRECTORY, response_top=0):
+        """
+        :param sample_rate: Fraction of the calls profiled, between 0 and 1. 0 disables profiling.
+        :param directory: Directory the stats files are written to, one per function name
+        :param response_top: Number of hot functions added to the responses of profiled calls under a 'profile' entry,
+        0 for none
+        """
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.response_top = response_top
+        self.samples = {}
+        self.__stats = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def path(self, function_name):
+        """
+        Path of the stats file of a function
+        """
+        return os.path.join(self.directory, 'profile-{}.pstats'.format(function_name))
+
+    def run(self, function_name, function, *args):
+        """
+        Call a function, profiled when the call is sampled
+        :param function_name: Name the stats of the call are aggregated under
+        :param function: Function to call with args, returning a response dict
+        :return: Response of the function, with the hot functions of the call under a 'profile' entry when it was
+        profiled and response_top is set
+        """
+        if random.random() >= self.sample_rate:
+            return function(*args)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as err:
+            # Another profiler, such as a debugger or a coverage tool, is already active
+            logger.warning("Not profiling %s: %s", function_name, err)
+            return function(*args)
+        try:
+            response = function(*args)
+        finally:
+            profile.disable()
+            stats = pstats.Stats(profile)
+            self.__aggregate(function_name, profile)
+        if self.response_top and isinstance(response, dict):
+            response = dict(response, profile=hot_functions(stats, self.response_top))
+        return response
+
+    def __aggregate(self, function_name, profile):
+        """
+        Add the stats of a profiled call to those of its function and write them to its stats file
+        """
+        with self.__lock:
+            stats = self.__stats.get(function_name)
+            if stats is None:
+                stats = self.__stats[function_name] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self.samples[function_name] = self.samples.get(function_name, 0) + 1
+            try:
+                stats.dump_stats(self.path(function_name))
+            except OSError as err:
+                logger.warning("Cannot write the profile of %s: %s", function_name, err)
+                return
+        logger.debug("Profile of %d %s calls written to %s", self.samples[function_name], function_name,
+                     self.path(function_name))
+
+    def stats(self, function_name):
+        """
+        pstats.Stats aggregated over the profiled calls of a function, None when none was profiled
+        """
+        with self.__lock:
+            return self.__stats.get(function_name)
+
+
+def from_environment():
+    """
+    Profiler configured by the PROFILE_SAMPLE_RATE, PROFILE_DIR and PROFILE_RESPONSE_TOP environment variables,
+    disabled unless PROFILE_SAMPLE_RATE is set
+    """
+    return Profiler(float(os.getenv('PROFILE_SAMPLE_RATE', '0')), os.getenv('PROFILE_DIR', DIRECTORY),
+                    int(os.getenv('PROFILE_RESPONSE_TOP', '0')))
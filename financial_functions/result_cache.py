@@ -0,0 +1,173 @@
+# Opt-in memoization of calculation results. The cache lives in the module, so it is shared by the warm invocations
+# of a Lambda container.
+
+import collections
+import hashlib
+import os
+import struct
+import sys
+import threading
+
+_PLAIN_TYPES = frozenset([int, float, str, bool, type(None)])
+
+
+class ResultCache(object):
+    """
+    LRU cache of calculation results, bounded by a number of entries and by an approximate number of bytes.
+    Arguments are turned into a canonical key in which lists and arrays of more than hash_items items are replaced by
+    a hash of their contents, so that large payloads are neither kept alive nor compared item by item.
+    """
+
+    def __init__(self, max_entries, max_bytes, hash_items=32):
+        """
+        :param max_entries: Maximum number of cached results, 0 disables the cache
+        :param max_bytes: Maximum approximate size of the cached keys and results in bytes
+        :param hash_items: Number of items from which list and array arguments are hashed instead of kept in the key
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hash_items = hash_items
+        self.__entries = collections.OrderedDict()
+        self.__lock = threading.Lock()
+        self.__bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get_or_compute(self, name, args, compute):
+        """
+        Return the cached result of a calculation, computing and caching it on a miss. Exceptions are not cached.
+        :param name: Name of the calculation, for example 'numpy.pmt'
+        :param args: Arguments of the calculation
+        :param compute: Function without arguments computing the result
+        :return: Result of the calculation. Cached lists are returned as copies, so that callers cannot modify them.
+        """
+        if not self.enabled:
+            return compute()
+
+        key = make_key(name, args, self.hash_items)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return _copy(entry[0])
+            self.misses += 1
+
+        result = compute()
+        size = approximate_size(key) + approximate_size(result)
+        if size > self.max_bytes:
+            return result
+
+        with self.__lock:
+            previous = self.__entries.pop(key, None)
+            if previous is not None:
+                self.__bytes -= previous[1]
+            self.__entries[key] = (_copy(result), size)
+            self.__bytes += size
+            while len(self.__entries) > self.max_entries or self.__bytes > self.max_bytes:
+                self.__bytes -= self.__entries.popitem(last=False)[1][1]
+                self.evictions += 1
+        return result
+
+    def stats(self):
+        """
+        Counters of the cache
+        :return: Dict with the hits, misses and evictions since the cache was created or cleared, and the current
+        number of entries and their approximate size in bytes
+        """
+        with self.__lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self.__entries), 'bytes': self.__bytes}
+
+    def __repr__(self):
+        return '<ResultCache {}>'.format(' '.join('{}={}'.format(name, value) for name, value in self.stats().items()))
+
+    def clear(self):
+        """
+        Remove all entries and reset the counters
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+
+def from_environment():
+    """
+    Create a cache configured by the RESULT_CACHE_SIZE (maximum entries, 0 by default which disables the cache),
+    RESULT_CACHE_MAX_BYTES (64 MiB by default) and RESULT_CACHE_HASH_ITEMS (32 by default) environment variables
+    """
+    return ResultCache(int(os.getenv('RESULT_CACHE_SIZE', '0')),
+                       int(os.getenv('RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+                       int(os.getenv('RESULT_CACHE_HASH_ITEMS', '32')))
+
+
+def make_key(name, args, hash_items=32):
+    """
+    Canonical, hashable key of a calculation
+    :param name: Name of the calculation
+    :param args: List of arguments: plain values, lists of plain values, NumPy arrays or objects with a cache_key
+    method returning the arguments identifying them
+    :param hash_items: Number of items from which lists and arrays are replaced by a hash of their contents
+    :return: Tuple identifying the calculation
+    """
+    return (name,) + tuple(_key_part(arg, hash_items) for arg in args)
+
+
+def _key_part(value, hash_items):
+    """
+    Key of one argument. Lists are tagged so that they never equal a tuple of the same values.
+    """
+    if type(value) in _PLAIN_TYPES:
+        return value
+    if isinstance(value, (list, tuple)):
+        if len(value) <= hash_items:
+            return (type(value).__name__,) + tuple(_key_part(item, hash_items) for item in value)
+        return ('hash', type(value).__name__, len(value), _digest_sequence(value))
+    if type(value).__module__ == 'numpy' and hasattr(value, 'tobytes'):
+        if value.size <= hash_items:
+            return ('ndarray', str(value.dtype), value.shape, value.tobytes())
+        return ('hash', str(value.dtype), value.shape, hashlib.blake2b(value.tobytes(), digest_size=16).digest())
+    cache_key = getattr(value, 'cache_key', None)
+    if cache_key is not None:
+        # Objects such as a CashFlowSeries are identified by the arrays they hold
+        return (type(value).__name__,) + tuple(_key_part(part, hash_items) for part in cache_key())
+    return ('repr', repr(value))
+
+
+def _digest_sequence(values):
+    """
+    Hash of the items of a list. Lists of numbers are packed as doubles, which is much cheaper than formatting them.
+    Like in keys of short lists, where 1 == 1.0, integers and floats of the same value are not told apart, which is
+    how NumPy sees them as well.
+    """
+    try:
+        return hashlib.blake2b(struct.pack('{}d'.format(len(values)), *values), digest_size=16).digest()
+    except (struct.error, OverflowError):
+        return hashlib.blake2b(repr(values).encode(), digest_size=16).digest()
+
+
+def approximate_size(value):
+    """
+    Approximate memory used by a key or result in bytes, counting the items of lists, tuples and dicts
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(approximate_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(approximate_size(key) + approximate_size(item) for key, item in value.items())
+    return size
+
+
+def _copy(value):
+    """
+    Copy lists and dicts so that cached results are never shared with callers
+    """
+    if isinstance(value, dict):
+        return dict((key, _copy(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_copy(item) for item in value] if value and isinstance(value[0], (list, dict)) else list(value)
+    return value
@@ -0,0 +1,200 @@
+# Validators for the JSON schemas in validation_json_schemas, compiled once when the module is loaded
+
+import re
+import validation_json_schemas as schemas
+from lazy_import import LazyModule
+
+# jsonschema is only needed to describe why an instance is invalid
+jsonschema_exceptions = LazyModule('jsonschema.exceptions')
+jsonschema_validators = LazyModule('jsonschema.validators')
+
+_NUMBER_TYPES = frozenset([int, float])
+_ENUM_TYPES = frozenset([int, float, str])
+_JSON_TYPES = frozenset([int, float, bool, str, list, dict, type(None)])
+
+
+class SchemaValidator(object):
+    """
+    Pre-compiled validator for one JSON schema.
+
+    Valid instances are recognized by a plain Python check compiled from the schema, in which arrays of plain numbers
+    (or plain strings matching a pattern) are checked with a specialized loop instead of walking every element through
+    the generic validator machinery. Only when that check fails is jsonschema loaded, and the instance validated again
+    with it, so that errors are reported exactly as jsonschema.validate would have reported them.
+    """
+
+    def __init__(self, schema):
+        self.__schema = schema
+        self.__is_valid = _compile(schema)
+        self.__validator = None
+
+    def validate(self, instance):
+        """
+        Validate an instance against the schema
+        :param instance: Instance to validate
+        :return: None
+        :raises ValidationError: if the instance is invalid
+        """
+        error = self.find_error(instance)
+        if error is not None:
+            raise error
+
+    def find_error(self, instance):
+        """
+        Find the error jsonschema.validate would raise for the instance
+        :param instance: Instance to validate
+        :return: ValidationError, or None if the instance is valid
+        """
+        if self.__is_valid is not None and self.__is_valid(instance):
+            return None
+        # best_match ranks all the errors of the instance, so the first invalid element is not necessarily the one
+        # jsonschema reports
+        return jsonschema_exceptions.best_match(self.__build_validator().iter_errors(instance))
+
+    def __build_validator(self):
+        """
+        Build the jsonschema validator used to describe errors, the first time one is needed
+        """
+        if self.__validator is None:
+            cls = jsonschema_validators.validator_for(self.__schema)
+            cls.check_schema(self.__schema)
+            self.__validator = cls(self.__schema)
+        return self.__validator
+
+
+def _array_check(property_schema):
+    """
+    Build a fast check for an array property whose items are plain numbers, plain integers or plain strings matching a
+    pattern
+    :param property_schema: Schema of the property
+    :return: Function returning whether all items are valid, or None if the property has no fast path
+    """
+    types = property_schema.get('type')
+    items = property_schema.get('items')
+    if not isinstance(items, dict) or 'array' not in (types if isinstance(types, list) else [types]):
+        return None
+
+    # minItems/maxItems inside items only apply to nested arrays and never to the number or string items themselves
+    keywords = set(items) - set(['minItems', 'maxItems'])
+    if items.get('type') == 'number' and keywords == set(['type']):
+        return _all_numbers
+    if items.get('type') == 'integer' and keywords == set(['type']):
+        return lambda values: all(type(value) is int for value in values)
+    if items.get('type') == 'string' and keywords == set(['type', 'pattern']):
+        search = re.compile(items['pattern']).search
+        return lambda values: all(type(value) is str for value in values) and all(map(search, values))
+    if items.get('type') == 'array' and keywords == set(['type', 'items']) and _array_check(items) is _all_numbers:
+        # Array of numeric arrays, such as the cash flow series of IRR_BATCH
+        min_items, max_items = items.get('minItems', 0), items.get('maxItems', float('inf'))
+        return lambda rows: all(type(row) is list and min_items <= len(row) <= max_items and _all_numbers(row)
+                                for row in rows)
+    return None
+
+
+def _all_numbers(values):
+    """
+    Returns whether all values are plain ints or floats
+    """
+    return all(map(_NUMBER_TYPES.__contains__, map(type, values)))
+
+
+_TYPE_CHECKS = {
+    'number': lambda value: type(value) in _NUMBER_TYPES,
+    'integer': lambda value: type(value) is int,
+    'string': lambda value: type(value) is str,
+    'array': lambda value: type(value) is list,
+    'object': lambda value: type(value) is dict
+}
+
+
+def _applies_to(instance_type, check):
+    """
+    Wrap a check for a keyword that only constrains instances of one type. Other JSON types pass, and types that are
+    not plain JSON types fail so that jsonschema decides about them.
+    """
+    return lambda value: check(value) if type(value) is instance_type else type(value) in _JSON_TYPES
+
+
+def _compile(schema):
+    """
+    Compile a schema into a function returning whether an instance is valid, for the subset of JSON schema used in
+    validation_json_schemas. The function can return False for valid instances of types it does not know about, such
+    as a Decimal, but never returns True for an invalid instance.
+    :param schema: JSON schema
+    :return: Validity check, or None if the schema uses keywords outside of the supported subset
+    """
+    checks = []
+    for keyword, argument in schema.items():
+        if keyword == 'type':
+            types = argument if isinstance(argument, list) else [argument]
+            if not all(name in _TYPE_CHECKS for name in types):
+                return None
+            type_checks = [_TYPE_CHECKS[name] for name in types]
+            checks.append(lambda value, type_checks=type_checks: any(check(value) for check in type_checks))
+        elif keyword == 'enum':
+            checks.append(lambda value, options=argument: type(value) in _ENUM_TYPES and value in options)
+        elif keyword == 'minimum':
+            checks.append(lambda value, minimum=argument: value >= minimum if type(value) in _NUMBER_TYPES
+                          else type(value) in _JSON_TYPES - _NUMBER_TYPES)
+        elif keyword == 'maximum':
+            checks.append(lambda value, maximum=argument: value <= maximum if type(value) in _NUMBER_TYPES
+                          else type(value) in _JSON_TYPES - _NUMBER_TYPES)
+        elif keyword == 'minItems':
+            checks.append(_applies_to(list, lambda value, minimum=argument: len(value) >= minimum))
+        elif keyword == 'maxItems':
+            checks.append(_applies_to(list, lambda value, maximum=argument: len(value) <= maximum))
+        elif keyword == 'pattern':
+            checks.append(_applies_to(str, lambda value, search=re.compile(argument).search: bool(search(value))))
+        elif keyword == 'items':
+            array_check = _array_check({'type': 'array', 'items': argument})
+            if array_check is None:
+                item_check = _compile(argument)
+                if item_check is None:
+                    return None
+                array_check = lambda values, item_check=item_check: all(map(item_check, values))
+            checks.append(_applies_to(list, array_check))
+        elif keyword == 'properties':
+            property_checks = {}
+            for name, property_schema in argument.items():
+                property_checks[name] = _compile(property_schema)
+                if property_checks[name] is None:
+                    return None
+            checks.append(_applies_to(dict, lambda value, property_checks=property_checks: all(
+                property_checks[name](value[name]) for name in property_checks if name in value)))
+        elif keyword == 'required':
+            checks.append(_applies_to(dict, lambda value, required=argument: all(name in value for name in required)))
+        elif keyword == 'additionalProperties' and argument is False:
+            allowed = frozenset(schema.get('properties', {}))
+            checks.append(_applies_to(dict, lambda value, allowed=allowed: allowed.issuperset(value)))
+        elif keyword == 'anyOf':
+            options = [_compile(option) for option in argument]
+            if None in options:
+                return None
+            checks.append(lambda value, options=options: any(option(value) for option in options))
+        else:
+            return None
+    return lambda value: all(check(value) for check in checks)
+
+
+VALIDATORS = dict((name, SchemaValidator(schema)) for name, schema in vars(schemas).items() if name.endswith('_schema'))
+
+
+def find_error(instance, schema_name):
+    """
+    Validate an instance against one of the schemas in validation_json_schemas
+    :param instance: Instance to validate
+    :param schema_name: Name of the schema, for example 'irr_schema'
+    :return: ValidationError, or None if the instance is valid
+    """
+    return VALIDATORS[schema_name].find_error(instance)
+
+
+def validate(instance, schema_name):
+    """
+    Validate an instance against one of the schemas in validation_json_schemas
+    :param instance: Instance to validate
+    :param schema_name: Name of the schema, for example 'irr_schema'
+    :return: None
+    :raises ValidationError: if the instance is invalid
+    """
+    VALIDATORS[schema_name].validate(instance)
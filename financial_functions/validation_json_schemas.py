@@ -1,24 +1,117 @@
 # TODO validate type is in valid set of values for all below
 
-fv_schema = {
-    "type": "object",
-    "properties": {
-        "rate": {
-            "type": "number"
+# Arguments of the periodic functions (FV, PV, PMT, PPMT, NPER, RATE) accept either a single number or, Excel array
+# formula style, an array of numbers. Array arguments are broadcast against each other and produce an array result.
+# The rate of NPV and XNPV accepts an array of rates as well, for the net present value profile over those rates.
+number_or_array = {
+    "type": ["number", "array"],
+    "items": {
+        "type": "number"
+    },
+    "minItems": 1
+}
+
+period_or_array = {
+    "type": ["number", "array"],
+    "minimum": 1,
+    "items": {
+        "type": "number",
+        "minimum": 1
+    },
+    "minItems": 1
+}
+
+type_or_array = {
+    "anyOf": [
+        {
+            "type": "integer",
+            "enum": [0, 1]
         },
-        "nper": {
-            "type": "number"
+        {
+            "type": "array",
+            "items": {
+                "type": "integer",
+                "enum": [0, 1]
+            },
+            "minItems": 1
+        }
+    ]
+}
+
+# Large arrays of numbers can be sent as binary columns instead of JSON arrays: the base64 of the little-endian array
+# data with its dtype and shape, float64 ("<f8") for cash flows and rates and int32 ("<i4") for day number dates.
+def binary_array(dtype):
+    return {
+        "type": "object",
+        "properties": {
+            "dtype": {
+                "enum": [dtype]
+            },
+            "shape": {
+                "type": "array",
+                "items": {
+                    "type": "integer",
+                    "minimum": 0
+                },
+                "minItems": 1,
+                "maxItems": 1
+            },
+            "data": {
+                "type": "string"
+            }
         },
-        "pmt": {
-            "type": "number"
+        "required": ["dtype", "shape", "data"],
+        "additionalProperties": False
+    }
+
+
+# Encoding of array results: "json" arrays, the default, or "base64" binary columns in the same format
+result_encoding = {
+    "enum": ["json", "base64"]
+}
+
+# Dates of XNPV and XIRR are either all year-month-day strings, zero padded or not such as "2016-04-01" or "2016-4-1",
+# or all integer day numbers. date_format sets what integer day numbers count from: "ordinal" for proleptic Gregorian
+# ordinals where 0001-01-01 is day 1, like Python's date.toordinal and the default, or "epoch" for days since 1970-01-01.
+dates_array = {
+    "anyOf": [
+        {
+            "type": "array",
+            "items": {
+                "type": "string",
+                "pattern": "^[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}$"
+            }
         },
-        "pv": {
-            "type": "number"
+        {
+            "type": "array",
+            "items": {
+                "type": "integer"
+            }
         },
-        "type": {
-            "type": "integer",
-            "enum": [0, 1]
-        }
+        binary_array("<i4")
+    ]
+}
+
+date_format = {
+    "enum": ["ordinal", "epoch"]
+}
+
+# Identifier of the deal or loan a rate is solved for, under which its solution seeds the next solve when warm starts
+# are enabled
+instrument_id = {
+    "type": "string",
+    "pattern": "^.{1,256}$"
+}
+
+fv_schema = {
+    "type": "object",
+    "properties": {
+        "rate": number_or_array,
+        "nper": number_or_array,
+        "pmt": number_or_array,
+        "pv": number_or_array,
+        "type": type_or_array,
+        "result_encoding": result_encoding
     },
     "anyOf": [
         {
@@ -38,10 +131,15 @@ fvschedule_schema = {
             "type": "number"
         },
         "schedule": {
-            "type": "array",
-            "items": {
-                "type": "number"
-            }
+            "anyOf": [
+                {
+                    "type": "array",
+                    "items": {
+                        "type": "number"
+                    }
+                },
+                binary_array("<f8")
+            ]
         }
     },
     "required": ["principal", "schedule"],
@@ -51,22 +149,12 @@ fvschedule_schema = {
 pv_schema = {
     "type": "object",
     "properties": {
-        "rate": {
-            "type": "number"
-        },
-        "nper": {
-            "type": "number"
-        },
-        "pmt": {
-            "type": "number"
-        },
-        "fv": {
-            "type": "number"
-        },
-        "type": {
-            "type": "integer",
-            "enum": [0, 1]
-        }
+        "rate": number_or_array,
+        "nper": number_or_array,
+        "pmt": number_or_array,
+        "fv": number_or_array,
+        "type": type_or_array,
+        "result_encoding": result_encoding
     },
     "anyOf": [
         {
@@ -82,16 +170,20 @@ pv_schema = {
 npv_schema = {
     "type": "object",
     "properties": {
-        "rate": {
-            "type": "number"
-        },
+        "rate": number_or_array,
         "values": {
-            "type": "array",
-            "items": {
-                "type": "number",
-                "minItems": 1
-            }
-        }
+            "anyOf": [
+                {
+                    "type": "array",
+                    "items": {
+                        "type": "number",
+                        "minItems": 1
+                    }
+                },
+                binary_array("<f8")
+            ]
+        },
+        "result_encoding": result_encoding
     },
     "required": ["rate", "values"],
     "additionalProperties": False
@@ -100,24 +192,22 @@ npv_schema = {
 xnpv_schema = {
     "type": "object",
     "properties": {
-        "rate": {
-            "type": "number"
-        },
+        "rate": number_or_array,
         "values": {
-            "type": "array",
-            "items": {
-                "type": "number",
-                "minItems": 1
-            }
-        },
-        "dates": {
-            "type": "array",
-            "items": {
-                "type": "string",
-                "minItems": 1,
-                "pattern": "^[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}$"
-            }
-        }
+            "anyOf": [
+                {
+                    "type": "array",
+                    "items": {
+                        "type": "number",
+                        "minItems": 1
+                    }
+                },
+                binary_array("<f8")
+            ]
+        },
+        "dates": dates_array,
+        "date_format": date_format,
+        "result_encoding": result_encoding
     },
     "required": ["rate", "values", "dates"],
     "additionalProperties": False
@@ -126,22 +216,12 @@ xnpv_schema = {
 pmt_schema = {
     "type": "object",
     "properties": {
-        "rate": {
-            "type": "number"
-        },
-        "nper": {
-            "type": "number"
-        },
-        "pv": {
-            "type": "number"
-        },
-        "fv": {
-            "type": "number"
-        },
-        "type": {
-            "type": "integer",
-            "enum": [0, 1]
-        }
+        "rate": number_or_array,
+        "nper": number_or_array,
+        "pv": number_or_array,
+        "fv": number_or_array,
+        "type": type_or_array,
+        "result_encoding": result_encoding
     },
     "required": ["rate", "nper", "pv"],
     "additionalProperties": False
@@ -150,28 +230,39 @@ pmt_schema = {
 ppmt_schema = {
     "type": "object",
     "properties": {
-        "rate": {
-            "type": "number"
-        },
-        "per": {
-            "type": "number",
-            "minimum": 1
-        },
+        "rate": number_or_array,
+        "per": period_or_array,
+        "nper": number_or_array,
+        "pv": number_or_array,
+        "fv": number_or_array,
+        "type": type_or_array,
+        "result_encoding": result_encoding
+    },
+    "required": ["rate", "per", "nper", "pv"],
+    "additionalProperties": False
+}
+
+amortization_schema = {
+    "type": "object",
+    "properties": {
+        "rate": number_or_array,
         "nper": {
-            "type": "number"
-        },
-        "pv": {
-            "type": "number"
-        },
-        "fv": {
-            "type": "number"
+            "type": ["integer", "array"],
+            "minimum": 1,
+            "maximum": 1200,
+            "items": {
+                "type": "integer",
+                "minimum": 1,
+                "maximum": 1200
+            },
+            "minItems": 1
         },
-        "type": {
-            "type": "integer",
-            "enum": [0, 1]
-        }
+        "pv": number_or_array,
+        "fv": number_or_array,
+        "type": type_or_array,
+        "result_encoding": result_encoding
     },
-    "required": ["rate", "per", "nper", "pv"],
+    "required": ["rate", "nper", "pv"],
     "additionalProperties": False
 }
 
@@ -179,26 +270,59 @@ irr_schema = {
     "type": "object",
     "properties": {
         "values": {
-            "type": "array",
-            "items": {
-                "type": "number"
-            },
-            "minItems": 2
+            "anyOf": [
+                {
+                    "type": "array",
+                    "items": {
+                        "type": "number"
+                    },
+                    "minItems": 2
+                },
+                binary_array("<f8")
+            ]
         }
     },
     "required": ["values"],
     "additionalProperties": False
 }
 
-mirr_schema = {
+irr_batch_schema = {
     "type": "object",
     "properties": {
         "values": {
             "type": "array",
             "items": {
-                "type": "number"
+                "type": "array",
+                "items": {
+                    "type": "number"
+                },
+                "minItems": 2
             },
-            "minItems": 2
+            "minItems": 1
+        },
+        "guess": {
+            "type": "number"
+        },
+        "result_encoding": result_encoding
+    },
+    "required": ["values"],
+    "additionalProperties": False
+}
+
+mirr_schema = {
+    "type": "object",
+    "properties": {
+        "values": {
+            "anyOf": [
+                {
+                    "type": "array",
+                    "items": {
+                        "type": "number"
+                    },
+                    "minItems": 2
+                },
+                binary_array("<f8")
+            ]
         },
         "finance_rate": {
             "type": "number"
@@ -215,23 +339,23 @@ xirr_schema = {
     "type": "object",
     "properties": {
         "values": {
-            "type": "array",
-            "items": {
-                "type": "number"
-            },
-            "minItems": 2
-        },
-        "dates": {
-            "type": "array",
-            "items": {
-                "type": "string",
-                "minItems": 2,
-                "pattern": "^[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}$"
-            }
-        },
+            "anyOf": [
+                {
+                    "type": "array",
+                    "items": {
+                        "type": "number"
+                    },
+                    "minItems": 2
+                },
+                binary_array("<f8")
+            ]
+        },
+        "dates": dates_array,
+        "date_format": date_format,
         "guess": {
             "type": "number"
-        }
+        },
+        "instrument_id": instrument_id
     },
     "required": ["values", "dates"],
     "additionalProperties": False
@@ -240,22 +364,12 @@ xirr_schema = {
 nper_schema = {
     "type": "object",
     "properties": {
-        "rate": {
-            "type": "number"
-        },
-        "pmt": {
-            "type": "number"
-        },
-        "pv": {
-            "type": "number"
-        },
-        "fv": {
-            "type": "number"
-        },
-        "type": {
-            "type": "integer",
-            "enum": [0, 1]
-        }
+        "rate": number_or_array,
+        "pmt": number_or_array,
+        "pv": number_or_array,
+        "fv": number_or_array,
+        "type": type_or_array,
+        "result_encoding": result_encoding
     },
     "anyOf": [
         {
@@ -271,25 +385,14 @@ nper_schema = {
 rate_schema = {
     "type": "object",
     "properties": {
-        "nper": {
-            "type": "number"
-        },
-        "pmt": {
-            "type": "number"
-        },
-        "pv": {
-            "type": "number"
-        },
-        "fv": {
-            "type": "number"
-        },
-        "type": {
-            "type": "integer",
-            "enum": [0, 1]
-        },
-        "guess": {
-            "type": "number"
-        }
+        "nper": number_or_array,
+        "pmt": number_or_array,
+        "pv": number_or_array,
+        "fv": number_or_array,
+        "type": type_or_array,
+        "guess": number_or_array,
+        "instrument_id": instrument_id,
+        "result_encoding": result_encoding
     },
     "anyOf": [
         {
@@ -362,3 +465,14 @@ wrapper_schema = {
     "required": ["function_name", "args"],
     "additionalProperties": False
 }
+
+batch_wrapper_schema = {
+    "type": "object",
+    "properties": {
+        "requests": {
+            "type": "array"
+        }
+    },
+    "required": ["requests"],
+    "additionalProperties": False
+}
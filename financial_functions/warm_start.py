@@ -0,0 +1,93 @@
+# Starting points for the iterative solvers, remembered from earlier solutions of the same instrument. The cache lives in
+# the module, so it is shared by the warm invocations of a Lambda container.
+
+import collections
+import os
+import threading
+
+# Solution remembered for an instrument: the root found last and the iterations its first solve took without a seed
+Seed = collections.namedtuple('Seed', ['root', 'cold_iterations'])
+
+
+class GuessCache(object):
+    """
+    LRU cache of solver solutions keyed by a fingerprint of the instrument, such as its id or the first cash flows of its
+    series. A deal solved again with one more cash flow appended is seeded with its previous rate, which is usually
+    within a few basis points of the new one. Counts how many iterations seeded solves saved compared to the first,
+    unseeded solve of their instrument.
+    """
+
+    def __init__(self, max_entries):
+        """
+        :param max_entries: Maximum number of remembered solutions, 0 disables warm starts
+        """
+        self.max_entries = max_entries
+        self.__entries = collections.OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits = self.misses = self.iterations_saved = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """
+        Seed remembered for an instrument
+        :param key: Fingerprint of the instrument
+        :return: Seed, or None when the instrument was not solved recently
+        """
+        with self.__lock:
+            seed = self.__entries.get(key)
+            if seed is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return seed
+
+    def put(self, key, root, iterations, seed=None):
+        """
+        Remember the solution of an instrument
+        :param key: Fingerprint of the instrument
+        :param root: Root found by the solver
+        :param iterations: Iterations the solver used
+        :param seed: Seed the solver started from, None for a solve from the default or a caller's guess
+        """
+        with self.__lock:
+            if seed is None:
+                self.__entries[key] = Seed(root, iterations)
+            else:
+                self.__entries[key] = Seed(root, seed.cold_iterations)
+                self.iterations_saved += seed.cold_iterations - iterations
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Counters of the cache
+        :return: Dict with the hits, misses and iterations saved since the cache was created or cleared, and the
+        current number of entries
+        """
+        with self.__lock:
+            return {'hits': self.hits, 'misses': self.misses, 'iterations_saved': self.iterations_saved,
+                    'entries': len(self.__entries)}
+
+    def __repr__(self):
+        return '<GuessCache {}>'.format(' '.join('{}={}'.format(name, value) for name, value in self.stats().items()))
+
+    def clear(self):
+        """
+        Remove all entries and reset the counters
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.hits = self.misses = self.iterations_saved = 0
+
+
+def from_environment():
+    """
+    Create a cache configured by the WARM_START_SIZE environment variable, the maximum number of remembered solutions,
+    0 by default which disables warm starts
+    """
+    return GuessCache(int(os.getenv('WARM_START_SIZE', '0')))
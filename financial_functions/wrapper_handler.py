@@ -1,30 +1,232 @@
 import lambda_handlers as handlers
-import validation_json_schemas as schemas
-from jsonschema import validate
-from jsonschema.exceptions import ValidationError
+import schema_validators
 import log_helper
 import sys
+import json
+from lazy_import import LazyModule
+
+# Only needed for vectorized batches, the handlers load what a single function needs themselves
+numpy = LazyModule('numpy')
 
 logger = log_helper.getLogger(__name__)
 
+# Error returned for function names that are not in the registry of lambda_handlers
+INVALID_FUNCTION_ERROR = "Invalid function name: {}. Please see documentation for help on supported functions"
+
+
 def financial_functions_handler(request, context):
     """
     This function takes in an arbritary financial function and its parameters as inputs and returns the result of that calculation
+    :param request: Dict containing the financial function name (function_name) and its parameters (args), or a batch of
+    such dicts (requests)
+    :param context: Lambda execution context
+    :return: Dict with a 'result' entry containing the result of the calculation, or for a batch a 'results' entry
+    containing one result or error dict per sub-request in the order they were given
+    """
+    log_helper.log_request(logger, 'financial function', request)
+
+    handler = __batch_handler if isinstance(request, dict) and 'requests' in request else __single_handler
+    if handlers.profiler.enabled:
+        return handlers.profiler.run(__profile_name(request), handler, request, context)
+    return handler(request, context)
+
+
+def __profile_name(request):
+    """
+    Name the profiles of a request are aggregated under: its function, 'batch' for batches and 'wrapper' for requests
+    naming no known function
+    """
+    if isinstance(request, dict) and 'requests' in request:
+        return 'batch'
+    function_name = request.get('function_name') if isinstance(request, dict) else None
+    return function_name if isinstance(function_name, str) and function_name in handlers.FUNCTIONS else 'wrapper'
+
+
+def __single_handler(request, context):
+    """
+    Dispatch a single {function_name, args} request to the matching function handler
     :param request: Dict containing the financial function name (function_name) and its parameters (args)
     :param context: Lambda execution context
     :return: Dict with a 'result' entry containing the result of the calculation
     """
-    logger.info("financial function request: {}".format(request))
+    metrics = handlers.metrics
+    if not metrics.enabled:
+        return __dispatch(request, None)
+    timer = metrics.start('wrapper', request)
+    try:
+        return __dispatch(request, timer)
+    finally:
+        metrics.record(timer)
+
+
+def __dispatch(request, timer):
+    """
+    Validate a single request against the wrapper schema and evaluate it with the FunctionDefinition of its function
+    :param timer: PhaseTimer of the request, or None when the phase metrics are disabled
+    """
+    err = schema_validators.find_error(request, 'wrapper_schema')
+    if err is not None:
+        logger.info("Invalid request: %s. Error: %s", log_helper.summarize(request), log_helper.summarize(err.message))
+        return {'error': err.message}
+
+    definition = handlers.FUNCTIONS.get(request['function_name'])
+    if definition is None:
+        return {'error': INVALID_FUNCTION_ERROR.format(request['function_name'])}
+    if timer is not None:
+        timer.function_name = definition.name
+    return handlers.evaluate(definition, request['args'], timer=timer)
 
+
+def __batch_handler(request, context):
+    """
+    Evaluate a batch of heterogeneous sub-requests. Identical sub-requests are only computed once and sub-requests for
+    the same vectorizable function are evaluated in one NumPy call. A failing sub-request only fails its own entry.
+    The batch is recorded in the phase metrics as the function 'batch', and each sub-request evaluated on its own as
+    its function.
+    :param request: Dict with a 'requests' entry containing a list of {function_name, args} dicts
+    :param context: Lambda execution context
+    :return: Dict with a 'results' entry containing a result or error dict for every sub-request
+    """
+    metrics = handlers.metrics
+    timer = metrics.start('batch', request) if metrics.enabled else None
     try:
-        validate(request, schemas.wrapper_schema)
-    except ValidationError as err:
-        logger.info("Invalid request: {}. Exception: {}".format(request, err))
+        return __evaluate_batch(request, context, timer)
+    finally:
+        if timer is not None:
+            metrics.record(timer)
+
+
+def __evaluate_batch(request, context, timer):
+    """
+    __batch_handler, marking the end of each phase on the timer when there is one
+    """
+    err = schema_validators.find_error(request, 'batch_wrapper_schema')
+    if err is not None:
+        logger.info("Invalid batch request. Error: %s", log_helper.summarize(err.message))
         return {'error': err.message}
+    if timer is not None:
+        timer.mark('validate')
+
+    sub_requests = request['requests']
+
+    # Collapse identical sub-requests and group the distinct ones by function name
+    positions = {}
+    groups = {}
+    for index, sub_request in enumerate(sub_requests):
+        key = __request_key(sub_request, index)
+        if key not in positions:
+            positions[key] = []
+            function_name = sub_request.get('function_name') if isinstance(sub_request, dict) else None
+            groups.setdefault(function_name, []).append((key, sub_request))
+        positions[key].append(index)
+    if timer is not None:
+        timer.mark('normalize')
+
+    computed = {}
+    for function_name, entries in groups.items():
+        definition = handlers.FUNCTIONS.get(function_name) if isinstance(function_name, str) else None
+        if definition is not None and definition.vectorized is not None:
+            computed.update(__vectorized_batch(definition, entries, context))
+        else:
+            for key, sub_request in entries:
+                computed[key] = __single_batch_entry(sub_request, context)
+    if timer is not None:
+        timer.mark('compute')
+
+    results = [None] * len(sub_requests)
+    for key, indices in positions.items():
+        for index in indices:
+            results[index] = dict(computed[key])
+    if timer is not None:
+        timer.mark('post_process')
+    return {'results': results}
+
+
+def __request_key(sub_request, index):
+    """
+    Canonical key used to detect identical sub-requests
+    :param sub_request: Sub-request of a batch
+    :param index: Position of the sub-request, used as the key when the sub-request cannot be serialized
+    :return: Hashable key
+    """
+    try:
+        return json.dumps(sub_request, sort_keys=True)
+    except (TypeError, ValueError):
+        return index
+
+
+def __single_batch_entry(sub_request, context, definition=None):
+    """
+    Evaluate one sub-request of a batch through the regular single request path
+    :param sub_request: Dict containing the function name and its arguments
+    :param context: Lambda execution context
+    :param definition: FunctionDefinition of the sub-request when its arguments were already validated against their
+    schema, so that they are not validated again
+    :return: Result or error dict
+    """
+    try:
+        if definition is not None:
+            return handlers.evaluate(definition, sub_request['args'], validated=True)
+        return __single_handler(sub_request, context)
+    except Exception as err:
+        logger.exception("Failed batch sub-request: %s", log_helper.summarize(sub_request))
+        return {'error': str(err)}
+
+
+def __vectorized_batch(definition, entries, context):
+    """
+    Evaluate all sub-requests for one vectorizable function with a single NumPy call. Sub-requests that fail
+    validation get their own error, and rows NumPy cannot solve together are retried one at a time. The response of
+    every row is built like that of a single request, through the result cache and the result_encoding, and each row
+    is recorded in the phase metrics as its function with an equal share of the NumPy call.
+    :param definition: FunctionDefinition of the financial function shared by all entries
+    :param entries: List of (key, sub_request) tuples
+    :param context: Lambda execution context
+    :return: Dict mapping each entry key to its result or error dict
+    """
+    metrics = handlers.metrics
+    computed = {}
+    rows = []
+    for key, sub_request in entries:
+        timer = metrics.start(definition.name, sub_request) if metrics.enabled else None
+        err = schema_validators.find_error(sub_request, 'wrapper_schema')
+        error = err.message if err is not None else handlers.find_error(definition, sub_request['args'])
+        if timer is not None:
+            timer.mark('validate')
+        if error is not None:
+            computed[key] = {'error': error}
+            if timer is not None:
+                metrics.record(timer)
+        elif any(isinstance(value, (list, dict)) for value in sub_request['args'].values()):
+            # Array valued sub-requests are already vectorized
+            computed[key] = __single_batch_entry(sub_request, context, definition)
+        else:
+            rows.append((key, sub_request, timer))
+
+    if not rows:
+        return computed
+
+    group = metrics.start(definition.name, None) if metrics.enabled else None
+    row_args = [handlers.arguments(definition, sub_request['args']) for _, sub_request, _ in rows]
+    columns = [numpy.array(column) for column in zip(*row_args)]
+    if group is not None:
+        group.mark('normalize')
+    logger.info("Calling %s on a batch of %d rows", definition.call_name, len(rows))
+    try:
+        results = numpy.broadcast_to(definition.vectorized(*columns), (len(rows),)).tolist()
+    except Exception as err:
+        logger.warning("Vectorized %s failed, evaluating rows individually. Exception: %s", definition.call_name, err)
+        results = [float('nan')] * len(rows)
+    if group is not None:
+        group.mark('compute')
 
-    function_name = request['function_name']
-    function_handler_name = function_name + "_handler"
-    if hasattr(handlers, function_handler_name):
-        return getattr(handlers, function_handler_name)(request['args'], context)
-    else:
-        return {"error": "Invalid function name: " + function_name + ". Please see documentation for help on supported functions"}
+    for (key, sub_request, timer), args, result in zip(rows, row_args, results):
+        if not numpy.isfinite(result):
+            computed[key] = __single_batch_entry(sub_request, context, definition)
+            continue
+        if timer is not None:
+            timer.share(group, len(rows))
+        computed[key] = handlers.respond(definition, sub_request['args'], args, lambda result=result: result, timer)
+        if timer is not None:
+            metrics.record(timer)
+    return computed
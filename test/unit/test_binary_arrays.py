@@ -0,0 +1,44 @@
+import base64
+import numpy
+import pytest
+import binary_arrays
+
+
+def test_decode_shares_the_decoded_bytes():
+    array = numpy.array([-100.0, 39.5, 1e300])
+    column = {'dtype': '<f8', 'shape': [3], 'data': base64.b64encode(array.tobytes()).decode('ascii')}
+    decoded = binary_arrays.decode(column)
+    assert decoded.tolist() == array.tolist()
+    assert not decoded.flags.owndata
+    assert not decoded.flags.writeable
+
+
+def test_decode_ordinals():
+    ordinals = numpy.array([736330, 736361], dtype='<i4')
+    column = {'dtype': '<i4', 'shape': [2], 'data': base64.b64encode(ordinals.tobytes()).decode('ascii')}
+    assert binary_arrays.decode(column).tolist() == [736330, 736361]
+
+
+def test_decode_invalid_data():
+    with pytest.raises(ValueError, match='base64'):
+        binary_arrays.decode({'dtype': '<f8', 'shape': [1], 'data': 'not base64!'})
+    with pytest.raises(ValueError, match='needs 16 bytes of data, got 8'):
+        binary_arrays.decode({'dtype': '<f8', 'shape': [2], 'data': 'AAAAAAAA8D8='})
+
+
+@pytest.mark.parametrize('values, dtype', [([1.5, -2.0], '<f8'), ([1, 2, 3], '<i8'), ([True, False], '|b1'),
+                                           ([0.1, None], '<f8'), ([[1.0, 2.0], [3.0, 4.0]], '<f8')])
+def test_encode_round_trip(values, dtype):
+    column = binary_arrays.encode(values)
+    assert column['dtype'] == dtype
+    assert column['shape'] == list(numpy.shape(values))
+    expected = numpy.array(values, dtype=float if None in values else None)
+    numpy.testing.assert_array_equal(binary_arrays.decode(column), expected)
+
+
+def test_encode_response_keeps_scalars_and_strings():
+    response = {'result': [{'period': [1, 2], 'balance': [50.0, 0.0]}], 'converged': True, 'error': 'none'}
+    encoded = binary_arrays.encode_response(response)
+    assert encoded['converged'] is True and encoded['error'] == 'none'
+    assert binary_arrays.decode(encoded['result'][0]['balance']).tolist() == [50.0, 0.0]
+    assert binary_arrays.encode_response({'result': 1.5}) == {'result': 1.5}
@@ -1,6 +1,9 @@
+import math
 import pytest
 
-from datetime import date
+from datetime import date, timedelta
+import numpy
+import numpy_financial
 import core as ff
 
 def test_fvschedule():
@@ -37,22 +40,182 @@ def test_xnpv_dates_not_chronological_order():
             [-10000, 2000],
             [date(2016, 2, 1), date(2016, 1, 1)])
 
+def test_xnpv_numpy_kernel():
+    count = ff.XNPV_NUMPY_THRESHOLD * 4
+    values = [-10000] + [(index % 7) * 100.5 for index in range(1, count)]
+    dates = [date(2016, 1, 1) + timedelta(days=index * 3) for index in range(count)]
+
+    expected = sum([value / (1.05 ** ((day - dates[0]).days / 365.0)) for (value, day) in zip(values, dates)])
+    assert ff.xnpv(0.05, values, dates) == pytest.approx(expected, rel=1e-12)
+    assert ff.xnpv(0.05, values, numpy.array(dates, dtype='datetime64[D]')) == pytest.approx(expected, rel=1e-12)
+    assert ff.xnpv(0.05, values, numpy.array([day.toordinal() for day in dates])) == pytest.approx(expected, rel=1e-12)
+
+def test_xnpv_numpy_kernel_small_inputs():
+    dates = [date(2016, 1, 1), date(2016, 2, 1), date(2016, 5, 1), date(2016, 7, 1), date(2016, 9, 1), date(2017, 1, 1)]
+    assert ff.xnpv(
+        0.05,
+        [-10000, 2000, 2400, 2900, 3500, 4100],
+        numpy.array(dates, dtype='datetime64[D]')
+    ) == pytest.approx(4475.448794482614, rel=1e-12)
+
+def test_xnpv_numpy_kernel_dates_not_chronological_order():
+    count = ff.XNPV_NUMPY_THRESHOLD * 2
+    dates = [date(2016, 1, 1) + timedelta(days=index) for index in range(count)]
+    dates[-2], dates[-1] = dates[-1], dates[-2]
+    with pytest.raises(ValueError):
+        ff.xnpv(0.05, [100] * count, dates)
+
+def test_npv_profile():
+    numpy_financial = pytest.importorskip('numpy_financial')
+    values = [-10000, 3000, 4200, 6800, -500, 2000]
+    rates = [-0.5, 0.0, 0.01, 0.1, 0.25, 3.0]
+    assert ff.npv_profile(rates, values).tolist() == [numpy_financial.npv(rate, values) for rate in rates]
+
+def test_xnpv_profile():
+    dates = [date(2016, 1, 1) + timedelta(days=17 * day) for day in range(100)]
+    values = [-5000] + [90 + day for day in range(99)]
+    rates = numpy.linspace(-0.2, 0.8, 201)
+    assert ff.xnpv_profile(rates, values, dates) == pytest.approx([ff.xnpv(rate, values, dates) for rate in rates])
+
+def test_xnpv_profile_blocks(monkeypatch):
+    dates = [date(2016, 1, 1) + timedelta(days=30 * day) for day in range(10)]
+    values = [-1000] + [120] * 9
+    rates = numpy.linspace(0, 0.3, 25)
+    expected = ff.xnpv_profile(rates, values, dates)
+    monkeypatch.setattr(ff, 'PROFILE_BLOCK_ITEMS', 30)
+    assert ff.xnpv_profile(rates, values, dates).tolist() == expected.tolist()
+
+def test_xnpv_profile_dates_not_chronological_order():
+    with pytest.raises(ValueError):
+        ff.xnpv_profile([0.1, 0.2], [-100, 50, 60], [date(2016, 1, 1), date(2015, 1, 1), date(2017, 1, 1)])
+
+def test_cash_flow_series():
+    dates = [date(2016, 1, 1), date(2016, 2, 1), date(2016, 5, 1), date(2016, 7, 1), date(2016, 9, 1), date(2017, 1, 1)]
+    values = [-10000, 2000, 2400, 2900, 3500, 4100]
+    series = ff.cash_flow_series(values, dates)
+    assert len(series) == 6
+    assert series.has_both_signs
+    assert (series.minimum, series.maximum) == (-10000, 4100)
+    assert series.ordinals.dtype == numpy.int32
+    assert ff.xnpv(0.05, series) == pytest.approx(ff.xnpv(0.05, values, dates), rel=1e-12)
+    assert ff.xirr(series) == pytest.approx(ff.xirr(values, dates), rel=1e-9)
+    assert ff.xnpv_profile([0.05, 0.1], series).tolist() == ff.xnpv_profile([0.05, 0.1], values, dates).tolist()
+    assert not ff.cash_flow_series([1, 2]).has_both_signs
+    assert ff.cash_flow_series([1, 2]).ordinals is None
+
+def test_cash_flow_series_errors():
+    with pytest.raises(ValueError, match='same length'):
+        ff.cash_flow_series([-100, 50], [date(2016, 1, 1)])
+    with pytest.raises(ValueError, match='chronological order'):
+        ff.cash_flow_series([-100, 50, 60], [date(2016, 1, 1), date(2015, 1, 1), date(2017, 1, 1)])
+
+def test_xnpv_stream():
+    dates = [date(2016, 1, 1) + timedelta(days=11 * day) for day in range(200)]
+    values = [-20000] + [100 + day for day in range(199)]
+    assert ff.xnpv_stream(0.05, zip(values, dates)) == pytest.approx(ff.xnpv(0.05, values, dates), rel=1e-12)
+    ordinals = (value_and_date for value_and_date in zip(values, [day.toordinal() for day in dates]))
+    assert ff.xnpv_stream(0.05, ordinals) == pytest.approx(ff.xnpv(0.05, values, dates), rel=1e-12)
+    assert ff.xnpv_stream(0.05, iter([])) == 0
+
+def test_xnpv_stream_derivative():
+    dates = [date(2016, 1, 1), date(2016, 7, 1), date(2017, 3, 15), date(2018, 1, 1)]
+    values = [-1000, 300, 400, 500]
+    value, derivative = ff.xnpv_stream(0.1, zip(values, dates), derivative=True)
+    assert value == ff.xnpv_stream(0.1, zip(values, dates))
+    step = 1e-6
+    above = ff.xnpv_stream(0.1 + step, zip(values, dates))
+    below = ff.xnpv_stream(0.1 - step, zip(values, dates))
+    assert derivative == pytest.approx((above - below) / (2 * step), rel=1e-6)
+
+def test_xnpv_stream_compensated_sum():
+    # Naive summation loses the small cash flows entirely
+    cash_flows = [(1e16, 736330)] + [(1.0, 736330)] * 1000 + [(-1e16, 736330)]
+    assert ff.xnpv_stream(0.05, iter(cash_flows)) == 1000
+
+def test_xnpv_stream_dates_not_chronological_order():
+    consumed = []
+
+    def cash_flows():
+        for value, day in [(-100, 736330), (50, 736400), (60, 736390), (70, 736500)]:
+            consumed.append(day)
+            yield value, day
+
+    with pytest.raises(ValueError):
+        ff.xnpv_stream(0.05, cash_flows())
+    # The order is checked as the pairs are read
+    assert consumed == [736330, 736400, 736390]
+
+def test_xnpv_stream_extreme_rates():
+    cash_flows = [(-100, date(2016, 1, 1)), (50, date(2116, 1, 1))]
+    assert math.isnan(ff.xnpv_stream(-1.5, cash_flows))
+    assert ff.xnpv_stream(1e10, cash_flows) == -100
+    assert ff.xnpv_stream(-0.9999999, cash_flows) == math.inf
+
+def test_xirr_stream():
+    values = [-10000, 2750, 4250, 3250, 2750]
+    dates = [date(2008, 1, 1), date(2008, 3, 1), date(2008, 10, 30), date(2009, 2, 15), date(2009, 4, 1)]
+    expected = ff.xirr(values, dates)
+    assert ff.xirr_stream(list(zip(values, dates))) == pytest.approx(expected)
+    assert ff.xirr_stream(lambda: zip(values, dates)) == pytest.approx(expected)
+    with pytest.raises(TypeError):
+        ff.xirr_stream(zip(values, dates))
+
+def test_xirr_stream_scanned_bracket():
+    # Goes through the bracket scan of find_root, whose first bracket is centred on the default guess
+    cash_flows = [(-100, date(2000, 1, 1)), (110, date(2047, 1, 15))]
+    expected = 1.1 ** (365.0 / (cash_flows[1][1] - cash_flows[0][1]).days) - 1
+    result = ff.xirr_stream(cash_flows, full_output=True)
+    assert result.converged
+    assert result.root == pytest.approx(expected, rel=1e-9)
+
 def test_xirr():
     assert ff.xirr(
         [-100, 20, 40, 25],
         [date(2016, 1, 1), date(2016, 4, 1), date(2016, 10, 1), date(2017, 2, 1)]
-    ) == -0.19674386129832788
+    ) == pytest.approx(-0.19674386129832788, rel=1e-12)
 
     assert ff.xirr(
         [-100, 20, 40, 25, 8, 15],
         [date(2016, 1, 1), date(2016, 4, 1), date(2016, 10, 1), date(2017, 2, 1), date(2017, 3, 1), date(2017, 6, 1)]
-    ) == 0.09443907444452011
+    ) == pytest.approx(0.09443907444452011, rel=1e-12)
 
     assert ff.xirr(
         [-1000, 300, 400, 400, 300],
         [date(2011, 12, 1), date(2012, 1, 1), date(2013, 2, 1), date(2014, 3, 1), date(2015, 4, 1)],
         0.1
-    ) == 0.23860325587216993
+    ) == pytest.approx(0.23860325587216993, rel=1e-12)
+
+def test_xirr_full_output():
+    result = ff.xirr(
+        [-1000, 300, 400, 400, 300],
+        [date(2011, 12, 1), date(2012, 1, 1), date(2013, 2, 1), date(2014, 3, 1), date(2015, 4, 1)],
+        full_output=True
+    )
+    assert result.converged
+    assert result.root == pytest.approx(0.23860325587216993, rel=1e-12)
+    assert 0 < result.iterations <= 6
+
+def test_xirr_long_dated_flows():
+    # Newton's method alone diverges from this guess, the solver has to fall back to bisection
+    values = [-1000] + [30] * 40 + [1000]
+    dates = [date(1990, 1, 1)] + [date(year, 6, 1) for year in range(1991, 2031)] + [date(2035, 1, 1)]
+    assert ff.xirr(values, dates, 5.0) == pytest.approx(0.027854521321588, rel=1e-9)
+
+def test_xirr_scanned_bracket_around_guess():
+    # The Newton step from the default guess is unusable, and the scan finds the bracket (0, 0.2) whose middle is the
+    # guess itself. The middle has to be evaluated before the solver can converge.
+    dates = [date(2000, 1, 1), date(2047, 1, 15)]
+    expected = 1.1 ** (365.0 / (dates[1] - dates[0]).days) - 1
+    result = ff.xirr([-100, 110], dates, full_output=True)
+    assert result.converged
+    assert result.root == pytest.approx(expected, rel=1e-9)
+
+def test_xirr_no_solution():
+    with pytest.raises(RuntimeError):
+        ff.xirr([-100, 300, -250], [date(2000, 1, 1), date(2001, 1, 10), date(2002, 1, 1)])
+
+    result = ff.xirr([-100, 300, -250], [date(2000, 1, 1), date(2001, 1, 10), date(2002, 1, 1)], full_output=True)
+    assert not result.converged
 
 def test_xirr_mismatched_lists():
     with pytest.raises(ValueError):
@@ -64,6 +227,32 @@ def test_xirr_dates_not_chronological_order():
             [-100, 20],
             [date(2016, 4, 1), date(2016, 1, 1)])
 
+def test_irr_batch():
+    result = ff.irr_batch([
+        [-100, 39, 59, 55, 20],
+        [-1000, 300, 400, 400, 300],
+        [-100, 0, 0, 74],
+        [100, 200]
+    ])
+    assert result.root[:3] == pytest.approx([0.28094842115996066, 0.1489502812737551, -0.0954958303489728], rel=1e-10)
+    assert result.converged.tolist() == [True, True, True, False]
+    assert numpy.isnan(result.root[3])
+    assert result.iterations[3] == 0
+
+def test_irr_batch_padded():
+    ragged = ff.irr_batch([[-100, 39, 59, 55, 20], [-1000, 300, 400]])
+    padded = ff.irr_batch(numpy.array([[-100, 39, 59, 55, 20], [-1000, 300, 400, numpy.nan, numpy.nan]]))
+    assert padded.root == pytest.approx(ragged.root)
+    assert padded.converged.all()
+
+def test_irr_batch_scanned_brackets():
+    # Rows whose Newton step from the guess is unusable find a bracket by scanning, (0, 0.2) for the first one, whose
+    # middle is the default guess
+    series = [[-100] + [0] * 46 + [110], [-100] + [0] * 30 + [150], [-100, 39, 59, 55, 20]]
+    result = ff.irr_batch(series)
+    assert result.converged.all()
+    assert result.root == pytest.approx([numpy_financial.irr(row) for row in series], rel=1e-8)
+
 def test_effect():
     assert ff.effect(.12, 12) == 0.12682503013196977
     assert ff.effect(.10, 4) == 0.10381289062499954
@@ -76,8 +265,60 @@ def test_nominal():
     assert ff.nominal(.10, 2) == 0.09761769634030326
     assert ff.nominal(.025, 12) == 0.02471803523811289
 
+@pytest.mark.parametrize('nper, pmt, pv, fv, when', [(60, -200, 10000, 0, 0), (360, -1073.64, 200000, 0, 0),
+                                                     (10, -100, 500, 200, 1), (12, 0, -1000, 1500, 0)])
+def test_rate_matches_numpy_financial(nper, pmt, pv, fv, when):
+    numpy_financial = pytest.importorskip('numpy_financial')
+    assert ff.rate(nper, pmt, pv, fv, when) == numpy_financial.rate(nper, pmt, pv, fv, when)
+
+def test_rate_full_output():
+    result = ff.rate(60, -200, 10000, full_output=True)
+    assert result.converged
+    assert result.root == ff.rate(60, -200, 10000)
+    seeded = ff.rate(60, -200, 10000, guess=result.root, full_output=True)
+    assert seeded.root == pytest.approx(result.root)
+    assert seeded.iterations < result.iterations
+
 def test_sln():
     assert ff.sln(5000, 300, 10) == 470
     assert ff.sln(10000, 1000, 5) == 1800
     assert ff.sln(500, 100, 8) == 50
     assert ff.sln(1200, 200, 6) == 166.66666666666666
+
+@pytest.mark.parametrize("rate,fv,when", [(0.00625, 0, 0), (0.00625, 1000, 1), (0, 0, 0), (0, 1000, 1)])
+def test_amortization_schedule_matches_numpy_financial(rate, fv, when):
+    numpy_financial = pytest.importorskip('numpy_financial')
+    periods = numpy.arange(1, 181)
+    schedule = ff.amortization_schedule(rate, 180, 200000, fv, when)
+    assert schedule.period.tolist() == periods.tolist()
+    assert schedule.payment == pytest.approx(numpy.full(180, numpy_financial.pmt(rate, 180, 200000, fv, when)))
+    assert schedule.interest == pytest.approx(numpy_financial.ipmt(rate, periods, 180, 200000, fv, when), abs=1e-8)
+    assert schedule.principal == pytest.approx(numpy_financial.ppmt(rate, periods, 180, 200000, fv, when))
+    assert schedule.balance == pytest.approx(200000 + numpy.cumsum(schedule.principal), abs=1e-6)
+
+def test_amortization_schedule():
+    schedule = ff.amortization_schedule(0.01, 3, 100)
+    assert schedule.payment == pytest.approx([-34.00221115] * 3)
+    assert schedule.interest == pytest.approx([-1.0, -0.66997789, -0.33665556])
+    assert schedule.principal == pytest.approx([-33.00221115, -33.33223326, -33.66555559])
+    assert schedule.balance == pytest.approx([66.99778885, 33.66555559, 0.0], abs=1e-8)
+
+def test_amortization_schedule_arrays():
+    schedule = ff.amortization_schedule([0.005, 0.004, 0], [12, 24, 6], [1000, 2000, 600])
+    assert schedule.payment.shape == (3, 24)
+    single = ff.amortization_schedule(0.005, 12, 1000)
+    assert schedule.payment[0, :12] == pytest.approx(single.payment)
+    assert schedule.balance[0, :12] == pytest.approx(single.balance)
+    # Shorter loans are paid off, with no payments after their term
+    assert schedule.payment[0, 12:].tolist() == [0.0] * 12
+    assert schedule.balance[:, -1] == pytest.approx([0, 0, 0], abs=1e-8)
+    assert schedule.balance[2, :6] == pytest.approx([500, 400, 300, 200, 100, 0])
+
+def test_amortization_schedule_chunks():
+    rates = numpy.linspace(0.001, 0.01, 25)
+    whole = ff.amortization_schedule(rates, 36, 10000)
+    chunks = list(ff.amortization_schedule_chunks(rates, 36, 10000, chunk_size=10))
+    assert [start for start, _ in chunks] == [0, 10, 20]
+    assert [len(chunk.payment) for _, chunk in chunks] == [10, 10, 5]
+    assert numpy.concatenate([chunk.balance for _, chunk in chunks]) == pytest.approx(whole.balance)
+    assert [start for start, _ in ff.amortization_schedule_chunks(0.005, 12, 1000)] == [0]
@@ -0,0 +1,116 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+import http_server
+
+PMT = {"function_name": "pmt", "args": {"rate": 0.00625, "nper": 180, "pv": 200000}}
+XIRR = {"function_name": "xirr", "args": {"values": [-10000, 2750, 4250, 3250, 2750],
+                                          "dates": ["2008-01-01", "2008-03-01", "2008-10-30", "2009-02-15", "2009-04-01"]}}
+
+
+async def __exchange(reader, writer, method, path, body=b'', headers=''):
+    writer.write('{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n{}\r\n'.format(
+        method, path, len(body), headers).encode() + body)
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('the server closed the connection without a response')
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError('the server closed the connection in the response headers')
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode().partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+    payload = await reader.readexactly(int(response_headers['content-length']))
+    return int(status_line.split()[1]), response_headers, json.loads(payload)
+
+
+def __run(server, client):
+    async def scenario():
+        listener = await asyncio.start_server(server.handle_connection, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            return await client(port)
+    return asyncio.run(scenario())
+
+
+def test_keep_alive_connection():
+    async def client(port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        responses = [await __exchange(reader, writer, 'POST', '/', json.dumps(PMT).encode()),
+                     await __exchange(reader, writer, 'POST', '/', json.dumps(XIRR).encode()),
+                     await __exchange(reader, writer, 'POST', '/', json.dumps({'requests': [PMT, XIRR]}).encode()),
+                     await __exchange(reader, writer, 'POST', '/', b'{"function_name": '),
+                     await __exchange(reader, writer, 'PUT', '/'),
+                     await __exchange(reader, writer, 'GET', '/health', headers='Connection: close\r\n')]
+        assert await reader.read() == b''
+        writer.close()
+        return responses
+
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        server = http_server.FinancialFunctionsServer(executor)
+        pmt, xirr, batch, invalid, put, health = __run(server, client)
+
+    assert pmt[0] == 200 and pmt[1]['connection'] == 'keep-alive'
+    assert round(pmt[2]['result'], 5) == -1854.02472
+    assert round(xirr[2]['result'], 5) == 0.37336
+    assert batch[2]['results'] == [pmt[2], xirr[2]]
+    assert invalid[0] == 400 and invalid[2]['error'].startswith('invalid JSON')
+    assert put[0] == 405
+    assert health[0] == 200 and health[1]['connection'] == 'close'
+    assert health[2] == {'status': 'ok', 'connections': 1, 'requests': 4, 'evaluations': 3, 'coalesced': 0}
+
+
+def test_function_errors_are_responses():
+    # XIRR raises when it does not converge
+    failing = {"function_name": "xirr", "args": {"values": [-100, 1, 1],
+                                                 "dates": ["2016-01-01", "2016-02-01", "2016-03-01"]}}
+
+    async def client(port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        responses = [await __exchange(reader, writer, 'POST', '/', json.dumps(failing).encode()),
+                     await __exchange(reader, writer, 'POST', '/', json.dumps(PMT).encode())]
+        writer.close()
+        return responses
+
+    for executor in (None, concurrent.futures.ThreadPoolExecutor(1)):
+        failed, pmt = __run(http_server.FinancialFunctionsServer(executor), client)
+        assert failed[0] == 500
+        assert failed[2]['error'].startswith('Failed to converge')
+        assert pmt[0] == 200 and 'result' in pmt[2]
+        if executor is not None:
+            executor.shutdown()
+
+
+def test_concurrent_requests_are_coalesced():
+    requests = [dict(PMT, args=dict(PMT['args'], nper=nper)) for nper in range(120, 360, 12)] + [XIRR, XIRR]
+
+    async def client(port):
+        async def call(request):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            response = await __exchange(reader, writer, 'POST', '/', json.dumps(request).encode())
+            writer.close()
+            return response[2]
+        return await asyncio.gather(*[call(request) for request in requests])
+
+    server = http_server.FinancialFunctionsServer(coalesce_window=0.05)
+    results = __run(server, client)
+
+    assert results == [http_server.evaluate(request) for request in requests]
+    assert server.stats['evaluations'] == 2
+    assert server.stats['coalesced'] == len(requests)
+
+
+def test_coalesced_batches_are_bounded():
+    async def client(port):
+        return await asyncio.gather(*[server.evaluate(PMT) for _ in range(5)])
+
+    server = http_server.FinancialFunctionsServer(coalesce_window=10, max_coalesced=5)
+    assert __run(server, client) == [http_server.evaluate(PMT)] * 5
+    assert server.stats['evaluations'] == 1
@@ -1,4 +1,14 @@
+import base64
+import math
+import os
+import subprocess
+import sys
+import pytest
+from datetime import date
 import lambda_handlers as handlers
+import result_cache
+import binary_arrays
+import numpy
 
 REQUIRED_PROPERTY_ERR = "'{}' is a required property"
 INCORRECT_TYPE_ERR = "'{}' is not of type '{}'"
@@ -45,6 +55,28 @@ def test_fv_handler():
     assert round(response.get('result'), 6) == 15757.629844
 
 
+def test_fv_handler_array_args():
+    response = handlers.fv_handler({
+        "rate": [0.004166666666667, 0.004166666666667],
+        "nper": 120,
+        "pmt": -100,
+        "pv": [0, -100],
+        "type": [0, 1]
+    }, None)
+    assert 'result' in response
+    assert [round(result, 6) for result in response.get('result')] == [15528.227945, 15757.629844]
+
+
+def test_fv_handler_array_args_different_lengths():
+    response = handlers.fv_handler({
+        "rate": [0.004166666666667, 0.005],
+        "nper": [120, 180, 240],
+        "pmt": -100
+    }, None)
+
+    assert 'error' in response
+
+
 def test_fv_missing_rate():
     response = handlers.fv_handler({
         "nper": 120,
@@ -198,6 +230,34 @@ def test_irr_values_missing_neg():
     assert response.get('error') == "IRR requires at least one positive and one negative value"
 
 
+def test_irr_batch_handler():
+    response = handlers.irr_batch_handler({
+        "values": [[-100, 39, 59, 55, 20], [-1000, 300, 400, 400, 300], [100, 200]]
+    }, None)
+    assert 'result' in response
+    assert [round(result, 5) for result in response.get('result')[:2]] == [0.28095, 0.14895]
+    assert response.get('result')[2] is None
+    assert response.get('converged') == [True, True, False]
+
+
+def test_irr_batch_values_wrong_type():
+    response = handlers.irr_batch_handler({
+        "values": [[-100, 39], [-100, "test1"]]
+    }, None)
+
+    assert 'error' in response
+    assert response.get('error') == INCORRECT_TYPE_ERR.format("test1", "number")
+
+
+def test_irr_batch_values_too_few():
+    response = handlers.irr_batch_handler({
+        "values": [[-100, 39], [100]]
+    }, None)
+
+    assert 'error' in response
+    assert "is too short" in response.get('error')
+
+
 def test_mirr_handler():
     # TODO test data types & empty values array
     response = handlers.mirr_handler({
@@ -330,6 +390,25 @@ def test_xirr_no_negative_value():
     assert 'error' in response
 
 
+def test_xirr_dates_not_chronological_order():
+    response = handlers.xirr_handler({
+        "values": [-100, 20, 40, 25],
+        "dates": ['2016-01-01', '2016-10-1', '2016-4-1', '2017-2-1']
+    }, None)
+
+    assert response.get('error') == 'dates must be in chronological order'
+
+
+def test_xnpv_dates_not_chronological_order():
+    response = handlers.xnpv_handler({
+        "rate": 0.05,
+        "values": [-100, 20, 40, 25],
+        "dates": ['2016-01-01', '2016-10-1', '2016-4-1', '2017-2-1']
+    }, None)
+
+    assert response.get('error') == 'dates must be in chronological order'
+
+
 def test_nper_handler():
     # TODO test data types
     response = handlers.nper_handler({
@@ -369,6 +448,17 @@ def test_nper_handler():
     assert round(response.get('result'), 5) == 62.95762
 
 
+def test_nper_handler_array_args():
+    response = handlers.nper_handler({
+        "rate": [0.005833333333333, 0, 0.005833333333333],
+        "pmt": -150,
+        "pv": 8000,
+        "fv": [0, 0, -100]
+    }, None)
+    assert 'result' in response
+    assert [round(result, 5) for result in response.get('result')] == [64.07335, -53.33333, 63.40344]
+
+
 def test_nper_missing_rate():
     response = handlers.nper_handler({
         "pmt": -150,
@@ -407,6 +497,20 @@ def test_npv_handler():
     assert round(response.get('result'), 5) == 1188.44341
 
 
+def test_npv_profile():
+    values = [-10000, 3000, 4200, 6800]
+    rates = [0.0, 0.05, 0.1, 0.2]
+    response = handlers.npv_handler({"rate": rates, "values": values}, None)
+    expected = [handlers.npv_handler({"rate": rate, "values": values}, None)['result'] for rate in rates]
+    assert response['result'] == pytest.approx(expected)
+    assert round(response['result'][2], 5) == 1188.44341
+
+
+def test_npv_profile_empty_rates():
+    response = handlers.npv_handler({"rate": [], "values": [-10000, 3000]}, None)
+    assert 'error' in response
+
+
 def test_npv_missing_rate():
     response = handlers.npv_handler({
         "values": [-100, 39, 59, 55, 20]
@@ -436,6 +540,17 @@ def test_xnpv_handler():
     assert round(response.get('result'), 5) == 4475.44879
 
 
+def test_xnpv_profile():
+    request = {
+        "values": [-10000, 2000, 2400, 2900, 3500, 4100],
+        "dates": ['2016-1-1', '2016-2-1', '2016-5-1', '2016-7-1', '2016-9-1', '2017-1-1']
+    }
+    rates = [0.01, 0.05, 0.5, 1.0]
+    response = handlers.xnpv_handler(dict(request, rate=rates), None)
+    expected = [handlers.xnpv_handler(dict(request, rate=rate), None)['result'] for rate in rates]
+    assert response['result'] == pytest.approx(expected)
+
+
 def test_xnpv_missing_rate():
     response = handlers.xnpv_handler({
         "values": [-10000, 2000, 2400, 2900, 3500, 4100],
@@ -516,6 +631,29 @@ def test_pmt_handler():
     assert round(response.get('result'), 6) == -2742.918559
 
 
+def test_pmt_handler_array_args():
+    response = handlers.pmt_handler({
+        "rate": 0.00625,
+        "nper": [180, 180, 180],
+        "pv": 200000,
+        "fv": [0, 300000, 300000],
+        "type": [0, 0, 1]
+    }, None)
+    assert 'result' in response
+    assert [round(result, 6) for result in response.get('result')] == [-1854.02472, -2760.06180, -2742.918559]
+
+
+def test_pmt_handler_array_args_wrong_type():
+    response = handlers.pmt_handler({
+        "rate": 0.00625,
+        "nper": [180, "test"],
+        "pv": 200000
+    }, None)
+
+    assert 'error' in response
+    assert response.get('error') == INCORRECT_TYPE_ERR.format("test", "number")
+
+
 def test_pmt_missing_rate():
     response = handlers.pmt_handler({
         "nper": 180,
@@ -661,6 +799,20 @@ def test_rate_handler():
     assert round(response.get('result'), 6) == 0.079278
 
 
+def test_rate_handler_array_args():
+    response = handlers.rate_handler({
+        "nper": 6,
+        "pmt": [-200, 200, -200],
+        "pv": 1000,
+        "fv": [0, 0, 0.10]
+    }, None)
+    assert 'result' in response
+    result = response.get('result')
+    assert round(result[0], 6) == 0.054718
+    assert math.isnan(result[1])
+    assert round(result[2], 6) == 0.054695
+
+
 def test_rate_missing_nper():
     response = handlers.rate_handler({
         "pmt": -200,
@@ -759,6 +911,16 @@ def test_sln_handler():
     assert response.get('result') == 470
 
 
+def test_sln_handler_cold_start_imports():
+    # Simple functions must not pay for importing NumPy or jsonschema on a cold start
+    code = ("import sys, lambda_handlers; "
+            "assert lambda_handlers.sln_handler({'cost': 5000, 'salvage': 300, 'life': 10}, None)['result'] == 470; "
+            "print(sorted(set(['numpy', 'numpy_financial', 'jsonschema', 'scipy']) & set(sys.modules)))")
+    app_path = os.path.dirname(handlers.__file__)
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=app_path, universal_newlines=True)
+    assert output.strip() == '[]'
+
+
 def test_sln_handler_missing_cost():
     response = handlers.sln_handler({
         "salvage": 300,
@@ -794,3 +956,159 @@ def test_sln_handler_zero_life():
     }, None)
     
     assert 'error' in response
+
+
+def test_xnpv_date_formats():
+    expected = 4475.44879
+    dates = [date(2016, 1, 1), date(2016, 2, 1), date(2016, 5, 1), date(2016, 7, 1), date(2016, 9, 1), date(2017, 1, 1)]
+    values = [-10000, 2000, 2400, 2900, 3500, 4100]
+    epoch = date(1970, 1, 1).toordinal()
+
+    for request in [
+        {"dates": [d.isoformat() for d in dates]},
+        {"dates": [d.toordinal() for d in dates]},
+        {"dates": [d.toordinal() for d in dates], "date_format": "ordinal"},
+        {"dates": [d.toordinal() - epoch for d in dates], "date_format": "epoch"}
+    ]:
+        response = handlers.xnpv_handler(dict(request, rate=0.05, values=values), None)
+        assert round(response.get('result'), 5) == expected
+
+
+def test_xirr_epoch_days():
+    epoch = date(1970, 1, 1).toordinal()
+    dates = [date(2016, 1, 1), date(2016, 4, 1), date(2016, 10, 1), date(2017, 2, 1)]
+    response = handlers.xirr_handler({
+        "values": [-100, 20, 40, 25],
+        "dates": [d.toordinal() - epoch for d in dates],
+        "date_format": "epoch"
+    }, None)
+    assert round(response.get('result'), 5) == -0.19674
+
+
+@pytest.mark.parametrize("dates,date_format", [
+    ([736000, 10 ** 20], "ordinal"),
+    ([0, 736000], "ordinal"),
+    ([736000, 3652060], "ordinal"),
+    ([-719163, 16801], "epoch"),
+    ([16801, 2 ** 31], "epoch"),
+])
+def test_xirr_day_numbers_out_of_range(dates, date_format):
+    response = handlers.xirr_handler({"values": [-100, 120], "dates": dates, "date_format": date_format}, None)
+    assert response.get('error', '').startswith('dates must be {} day numbers between'.format(date_format))
+
+
+def test_xirr_day_numbers_at_bounds():
+    response = handlers.xirr_handler({"values": [-100, 120], "dates": [-719162, 2932896], "date_format": "epoch"},
+                                     None)
+    assert 'result' in response
+
+
+def test_xnpv_mixed_date_types():
+    response = handlers.xnpv_handler({
+        "rate": 0.05,
+        "values": [-10000, 2000],
+        "dates": ['2016-1-1', 736000]
+    }, None)
+    assert 'error' in response
+
+
+def test_xnpv_nonexistent_date():
+    response = handlers.xnpv_handler({
+        "rate": 0.05,
+        "values": [-10000, 2000],
+        "dates": ['2016-1-1', '2016-2-30']
+    }, None)
+    assert response.get('error') == "'2016-2-30' is not a valid date: day is out of range for month"
+
+
+def test_result_cache(monkeypatch):
+    cache = result_cache.ResultCache(100, 1024 * 1024)
+    monkeypatch.setattr(handlers, 'cache', cache)
+    request = {"rate": 0.00625, "nper": 180, "pv": 200000}
+
+    for _ in range(3):
+        response = handlers.pmt_handler(dict(request), None)
+        assert round(response.get('result'), 6) == -1854.02472
+    response = handlers.rate_handler({"nper": [6, 12], "pmt": -200, "pv": 1000}, None)
+    response = handlers.rate_handler({"nper": [6, 12], "pmt": -200, "pv": 1000}, None)
+    assert len(response.get('result')) == 2
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (3, 2, 2)
+
+
+def test_amortization_handler():
+    response = handlers.amortization_handler({"rate": 0.00625, "nper": 180, "pv": 200000}, None)
+    schedule = response.get('result')
+    assert sorted(schedule) == ['balance', 'interest', 'payment', 'period', 'principal']
+    assert schedule['period'] == list(range(1, 181))
+    assert round(schedule['payment'][0], 5) == -1854.02472
+    assert round(schedule['interest'][0], 2) == -1250.0
+    assert round(schedule['principal'][0], 5) == round(handlers.ppmt_handler(
+        {"rate": 0.00625, "per": 1, "nper": 180, "pv": 200000}, None).get('result'), 5)
+    assert abs(schedule['balance'][-1]) < 1e-6
+
+
+def test_amortization_handler_arrays():
+    response = handlers.amortization_handler({"rate": [0.01, 0.02], "nper": [2, 3], "pv": 100, "type": [0, 1]}, None)
+    schedules = response.get('result')
+    assert [schedule['period'] for schedule in schedules] == [[1, 2], [1, 2, 3]]
+    assert schedules[1]['interest'][0] == 0.0
+    assert [round(schedule['balance'][-1], 8) for schedule in schedules] == [0.0, 0.0]
+
+
+def test_amortization_handler_invalid_nper():
+    response = handlers.amortization_handler({"rate": 0.01, "nper": 3.5, "pv": 100}, None)
+    assert response.get('error') == "3.5 is not of type 'integer', 'array'"
+
+    response = handlers.amortization_handler({"rate": 0.01, "nper": [12, 1201], "pv": 100}, None)
+    assert 'error' in response
+
+    response = handlers.amortization_handler({"rate": [0.01, 0.02], "nper": [12, 24, 36], "pv": 100}, None)
+    assert response.get('error') == 'array arguments must all have the same length'
+
+
+def __column(values, dtype='<f8'):
+    data = base64.b64encode(numpy.array(values, dtype).tobytes()).decode()
+    return {'dtype': dtype, 'shape': [len(values)], 'data': data}
+
+
+@pytest.mark.parametrize('handler, arguments', [
+    (handlers.irr_handler, {"values": [-100, 39, 59, 55, 20]}),
+    (handlers.mirr_handler, {"values": [-100, 39, 59, 55, 20], "finance_rate": 0.1, "reinvest_rate": 0.12}),
+    (handlers.npv_handler, {"rate": 0.1, "values": [-10000, 3000, 4200, 6800]}),
+    (handlers.fvschedule_handler, {"principal": 10000, "schedule": [0.05, 0.035, 0.04]}),
+    (handlers.xirr_handler, {"values": [-10000, 2750, 4250, 3250, 2750],
+                             "dates": [733042, 733102, 733345, 733453, 733498]}),
+])
+def test_binary_columns_match_json_arrays(handler, arguments):
+    binary = dict((name, __column(value) if name in ('values', 'schedule') else value)
+                  for name, value in arguments.items())
+    assert handler(binary, None) == handler(arguments, None)
+
+
+def test_binary_dates():
+    request = {"rate": 0.05, "values": [-10000, 2000, 2400], "dates": [16801, 16832, 16922], "date_format": "epoch"}
+    binary = dict(request, values=__column(request['values']), dates=__column(request['dates'], '<i4'))
+    assert handlers.xnpv_handler(binary, None) == handlers.xnpv_handler(request, None)
+
+
+def test_binary_column_size_mismatch():
+    column = dict(__column([-100, 39, 59]), shape=[4])
+    response = handlers.irr_handler({"values": column}, None)
+    assert response == {'error': 'binary array of shape [4] and dtype <f8 needs 32 bytes of data, got 24'}
+
+
+def test_binary_column_without_positive_value():
+    response = handlers.irr_handler({"values": __column([])}, None)
+    assert response == {'error': 'IRR requires at least one positive and one negative value'}
+
+
+def test_binary_result_encoding():
+    request = {"rate": [0.05, 0.1], "values": [-10000, 3000, 4200, 6800]}
+    response = handlers.npv_handler(dict(request, result_encoding='base64'), None)
+    assert binary_arrays.decode(response['result']).tolist() == handlers.npv_handler(request, None)['result']
+
+    response = handlers.irr_batch_handler({"values": [[-100, 39, 59], [100, 10]], "result_encoding": "base64"}, None)
+    assert binary_arrays.decode(response['converged']).tolist() == [True, False]
+    assert numpy.isnan(binary_arrays.decode(response['result'])[1])
@@ -0,0 +1,57 @@
+import io
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+import ledger_convert
+import ledger_file
+
+ROWS = [('2016-01-01', -10000), ('2016-2-1', 2000), ('2016-05-01', 2400), ('2016-07-01', 2900)]
+
+
+def __read(path):
+    with ledger_file.LedgerFile(path) as ledger:
+        values, ordinals = next(ledger.chunks())
+    return values.tolist(), ordinals.tolist()
+
+
+def test_convert_csv(tmp_path):
+    source = io.StringIO('value,date,note\n' + ''.join('{},{},x\n'.format(value, day) for day, value in ROWS))
+    path = str(tmp_path / 'ledger.bin')
+    assert ledger_convert.convert(source, path, 'csv') == 4
+    values, ordinals = __read(path)
+    assert values == [-10000, 2000, 2400, 2900]
+    assert ordinals == [735964, 735995, 736085, 736146]
+
+
+def test_convert_ndjson_epoch_days(tmp_path):
+    source = io.StringIO('{"day": 16801, "amount": -100.5}\n\n{"day": 16832, "amount": 60}\n')
+    path = str(tmp_path / 'ledger.bin')
+    assert ledger_convert.convert(source, path, 'ndjson', 'day', 'amount', 'epoch') == 2
+    assert __read(path) == ([-100.5, 60], [735964, 735995])
+
+
+def test_convert_matches_xnpv_handler(tmp_path):
+    lambda_handlers = pytest.importorskip('lambda_handlers')
+    source = io.StringIO(''.join('{{"date": "{}", "value": {}}}\n'.format(day, value) for day, value in ROWS))
+    path = str(tmp_path / 'ledger.bin')
+    ledger_convert.convert(source, path, 'ndjson')
+    request = {'rate': 0.05, 'values': [value for _, value in ROWS], 'dates': [day for day, _ in ROWS]}
+    with ledger_file.LedgerFile(path) as ledger:
+        assert ledger.xnpv(0.05) == pytest.approx(lambda_handlers.xnpv_handler(request, None)['result'])
+
+
+@pytest.mark.parametrize('text, error', [
+    ('{"date": "2016-02-30", "value": 1}\n', "line 1: '2016-02-30' is not a valid date"),
+    ('{"date": "2016-02-01", "value": 1}\n{"date": 1.5, "value": 1}\n', "line 2: '1.5' is not a date or a day number"),
+    ('{"date": "2016-02-01", "value": "x"}\n', 'line 1: could not convert'),
+    ('{"date": "2016-02-01"}\n', 'line 1 has no date or value field'),
+    ('not json\n', 'line 1: invalid JSON'),
+])
+def test_convert_errors_name_the_line(tmp_path, text, error):
+    path = tmp_path / 'ledger.bin'
+    with pytest.raises(ValueError) as err:
+        ledger_convert.convert(io.StringIO(text), str(path), 'ndjson')
+    assert str(err.value).startswith(error)
+    assert not path.exists()
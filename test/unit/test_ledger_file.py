@@ -0,0 +1,113 @@
+from datetime import date
+import numpy
+import pytest
+import core
+import ledger_file
+
+
+def __ledger(rows, seed=0):
+    generator = numpy.random.default_rng(seed)
+    ordinals = numpy.sort(date(2010, 1, 1).toordinal() + generator.integers(0, 3650, rows))
+    values = generator.normal(100, 50, rows)
+    values[0] = -20 * rows
+    return values, ordinals
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    values, ordinals = __ledger(1000)
+    path = str(tmp_path / 'ledger.bin')
+    ledger_file.write(path, values, ordinals)
+    return path
+
+
+def test_round_trip(ledger_path):
+    values, ordinals = __ledger(1000)
+    with ledger_file.LedgerFile(ledger_path) as ledger:
+        assert len(ledger) == 1000
+        chunks = list(ledger.chunks(300))
+    assert [len(chunk_values) for chunk_values, _ in chunks] == [300, 300, 300, 100]
+    assert numpy.concatenate([chunk_values for chunk_values, _ in chunks]).tolist() == values.tolist()
+    assert numpy.concatenate([chunk_ordinals for _, chunk_ordinals in chunks]).tolist() == ordinals.tolist()
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 64, ledger_file.CHUNK_ROWS])
+def test_xnpv_matches_core(ledger_path, chunk_rows):
+    values, ordinals = __ledger(1000)
+    with ledger_file.LedgerFile(ledger_path) as ledger:
+        assert ledger.xnpv(0.07, chunk_rows) == pytest.approx(core.xnpv(0.07, values, ordinals))
+
+
+@pytest.mark.parametrize('chunk_rows', [13, ledger_file.CHUNK_ROWS])
+def test_xirr_matches_core(ledger_path, chunk_rows):
+    values, ordinals = __ledger(1000)
+    with ledger_file.LedgerFile(ledger_path) as ledger:
+        result = ledger.xirr(chunk_rows=chunk_rows, full_output=True)
+    assert result.converged
+    assert result.root == pytest.approx(core.xirr(values, ordinals))
+
+
+def test_xirr_long_dated_flows(tmp_path):
+    # Monthly rows over 47 years, on which find_root scans for a bracket from the default guess
+    ordinals = numpy.array([date(2000 + month // 12, month % 12 + 1, 15).toordinal() for month in range(565)])
+    values = numpy.zeros(565)
+    values[0], values[200], values[-1] = -100, 1, 110
+    path = str(tmp_path / 'long.bin')
+    ledger_file.write(path, values, ordinals)
+
+    years = (ordinals - ordinals[0]) / 365.0
+    low, high = 0.0, 0.2
+    for _ in range(100):
+        middle = (low + high) / 2
+        low, high = (middle, high) if (values * (1 + middle) ** -years).sum() > 0 else (low, middle)
+    with ledger_file.LedgerFile(path) as ledger:
+        result = ledger.xirr(chunk_rows=100, full_output=True)
+    assert result.converged
+    assert result.root == pytest.approx(low, rel=1e-8)
+
+
+def test_dates_not_chronological_order_across_chunks(tmp_path):
+    path = str(tmp_path / 'ledger.bin')
+    ledger_file.write(path, [-100, 50, 60, 70], [736330, 736400, 736390, 736500])
+    with ledger_file.LedgerFile(path) as ledger:
+        for chunk_rows in (1, 2, 4):
+            with pytest.raises(ValueError, match='chronological'):
+                ledger.xnpv(0.05, chunk_rows)
+            with pytest.raises(ValueError, match='chronological'):
+                ledger.xirr(chunk_rows=chunk_rows)
+
+
+def test_empty_ledger(tmp_path):
+    path = str(tmp_path / 'ledger.bin')
+    ledger_file.write(path, [], [])
+    with ledger_file.LedgerFile(path) as ledger:
+        assert len(ledger) == 0
+        with pytest.raises(ValueError, match='no rows'):
+            ledger.xnpv(0.05)
+
+
+def test_invalid_files(tmp_path, ledger_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a ledger file')
+    with pytest.raises(ValueError, match='not a ledger file'):
+        ledger_file.LedgerFile(str(path))
+
+    with open(ledger_path, 'rb') as ledger:
+        path.write_bytes(ledger.read()[:-4])
+    with pytest.raises(ValueError, match='should have'):
+        ledger_file.LedgerFile(str(path))
+
+
+def test_writer_appends_batches_and_discards_on_error(tmp_path):
+    values, ordinals = __ledger(100)
+    path = str(tmp_path / 'ledger.bin')
+    with ledger_file.LedgerWriter(path) as writer:
+        for start in range(0, 100, 30):
+            writer.append(values[start:start + 30], ordinals[start:start + 30])
+    with ledger_file.LedgerFile(path) as ledger:
+        assert numpy.concatenate([chunk for chunk, _ in ledger.chunks()]).tolist() == values.tolist()
+
+    with pytest.raises(ValueError, match='same length'):
+        with ledger_file.LedgerWriter(str(tmp_path / 'failed.bin')) as writer:
+            writer.append([1.0, 2.0], [736330])
+    assert not (tmp_path / 'failed.bin').exists()
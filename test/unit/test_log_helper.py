@@ -0,0 +1,79 @@
+import logging
+import numpy
+import log_helper
+
+
+class ReprCounter(object):
+    def __init__(self):
+        self.calls = 0
+
+    def __repr__(self):
+        self.calls += 1
+        return 'counted'
+
+
+def test_summarize_small_payload_is_logged_as_is():
+    assert str(log_helper.summarize({'rate': 0.05, 'values': [-100, 39, 59]})) == "{'rate': 0.05, 'values': [-100, 39, 59]}"
+    assert str(log_helper.summarize([0.1, (1, 2), (3,)])) == '[0.1, (1, 2), (3,)]'
+
+
+def test_summarize_large_array():
+    values = [-1000.0] + [float(value) for value in range(1, 100000)]
+    text = str(log_helper.summarize({'rate': 0.05, 'values': values}))
+    assert text.startswith("{'rate': 0.05, 'values': <list len=100000 min=-1000.0 max=99999.0 hash=")
+    assert len(text) < 200
+    # Identical payloads get identical hashes, different ones different hashes
+    assert text == str(log_helper.summarize({'rate': 0.05, 'values': list(values)}))
+    assert text != str(log_helper.summarize({'rate': 0.05, 'values': values[::-1]}))
+
+
+def test_summarize_large_mixed_and_nested_arrays():
+    text = str(log_helper.summarize([[1, 2]] * 20))
+    assert text.startswith('<list len=20 hash=')
+    assert 'min=' not in text
+
+    dates = ['2016-01-{:02d}'.format(day) for day in range(1, 31)]
+    assert "min='2016-01-01' max='2016-01-30'" in str(log_helper.summarize(dates))
+
+
+def test_summarize_numpy_array():
+    text = str(log_helper.summarize(numpy.arange(100.0)))
+    assert text.startswith('<ndarray shape=(100,) dtype=float64 min=0.0 max=99.0 hash=')
+    assert str(log_helper.summarize(numpy.arange(3))) == '[0, 1, 2]'
+
+
+def test_summarize_truncates_long_strings():
+    text = str(log_helper.summarize('x' * 1000))
+    assert text.endswith('...<1002 chars>')
+    assert len(text) < 250
+
+
+def test_summary_is_formatted_lazily(caplog):
+    logger = log_helper.getLogger('test_log_helper_lazy')
+    counter = ReprCounter()
+
+    logger.setLevel(logging.WARNING)
+    log_helper.log_request(logger, 'FV', {'arg': counter})
+    assert counter.calls == 0
+
+    logger.setLevel(logging.INFO)
+    with caplog.at_level(logging.INFO, logger='test_log_helper_lazy'):
+        log_helper.log_request(logger, 'FV', {'arg': counter})
+    assert counter.calls > 0
+    assert caplog.messages == ["FV request: {'arg': counted}"]
+
+
+def test_full_payload_sampling(caplog, monkeypatch):
+    logger = log_helper.getLogger('test_log_helper_sampling')
+    logger.setLevel(logging.DEBUG)
+    request = {'values': list(range(100))}
+
+    with caplog.at_level(logging.DEBUG, logger='test_log_helper_sampling'):
+        log_helper.log_request(logger, 'NPV', request)
+        assert len(caplog.records) == 1
+
+        monkeypatch.setattr(log_helper, 'PAYLOAD_SAMPLE_RATE', 1.0)
+        log_helper.log_request(logger, 'NPV', request)
+    assert len(caplog.records) == 3
+    assert caplog.records[2].levelno == logging.DEBUG
+    assert caplog.messages[2] == 'NPV full request: {}'.format(request)
@@ -0,0 +1,52 @@
+import io
+import json
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+import ndjson_runner
+
+REQUESTS = [
+    {"function_name": "pmt", "args": {"rate": 0.00625, "nper": 180, "pv": 200000}},
+    {"id": "deal-1", "function_name": "irr", "args": {"values": [-100, 39, 59, 55, 20]}},
+    {"function_name": "pmt", "args": {"rate": 0.00625, "nper": 180, "pv": 200000}},
+    {"function_name": "bogus", "args": {}},
+    {"function_name": "pmt", "args": {"rate": 0.005, "nper": 360, "pv": 350000}}
+]
+
+
+def __lines():
+    lines = [json.dumps(request) + '\n' for request in REQUESTS]
+    return lines[:2] + ['\n', 'not json\n'] + lines[2:]
+
+
+def __check_output(text, stats):
+    outputs = [json.loads(line) for line in text.splitlines()]
+    assert len(outputs) == 6
+    assert round(outputs[0]['result'], 5) == -1854.02472
+    assert outputs[1]['id'] == 'deal-1'
+    assert round(outputs[1]['result'], 5) == 0.28095
+    assert outputs[2]['error'].startswith('invalid JSON')
+    assert outputs[3] == outputs[0]
+    assert outputs[4]['error'].startswith('Invalid function name: bogus')
+    assert round(outputs[5]['result'], 5) == -2098.42684
+    assert (stats.records, stats.errors) == (6, 2)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1000])
+def test_run_in_process(chunk_size):
+    output = io.StringIO()
+    stats = ndjson_runner.run(iter(__lines()), output, workers=0, chunk_size=chunk_size)
+    __check_output(output.getvalue(), stats)
+
+
+def test_run_in_process_pool():
+    output = io.StringIO()
+    stats = ndjson_runner.run(iter(__lines()), output, workers=2, chunk_size=2, max_pending=1)
+    __check_output(output.getvalue(), stats)
+
+
+def test_chunks_skip_blank_lines():
+    assert list(ndjson_runner.chunks(['a\n', '\n', 'b\n', ' \n', 'c\n'], 2)) == [['a\n', 'b\n'], ['c\n']]
+    assert list(ndjson_runner.chunks([], 2)) == []
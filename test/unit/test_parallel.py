@@ -0,0 +1,80 @@
+import os
+from datetime import date, timedelta
+import numpy
+import numpy_financial
+import pytest
+import core
+import parallel
+
+
+def __ledger(size, start=date(2016, 1, 1)):
+    values = [-1000.0 * (size - 1)] + [1100.0 + index % 7 for index in range(size - 1)]
+    dates = [start + timedelta(days=30 * (index // 3)) for index in range(size)]
+    return values, dates
+
+
+@pytest.fixture(scope='module')
+def executor():
+    with parallel.ParallelExecutor(workers=2, shared_threshold=100) as pool:
+        yield pool
+
+
+def __shared_blocks():
+    return set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+
+def test_xnpv_and_npv_match_core(executor):
+    values, dates = __ledger(1000)
+    jobs = [(0.05, values, dates), (0.1, values, dates), (0.05, values[:10], dates[:10])]
+    results = executor.map('xnpv', jobs)
+    assert results == pytest.approx([core.xnpv(*job) for job in jobs], rel=1e-12)
+
+    jobs = [(0.01, values), (0.02, values[:50])]
+    results = executor.map('npv', jobs)
+    assert results == pytest.approx([numpy_financial.npv(*job) for job in jobs], rel=1e-12)
+
+
+def test_xirr_matches_core(executor):
+    values, dates = __ledger(1000)
+    small_values, small_dates = __ledger(20)
+    ordinals = numpy.array([value.toordinal() for value in dates])
+    assert executor.map('xirr', [(values, dates), (values, ordinals), (small_values, small_dates)]) == pytest.approx(
+        [core.xirr(values, dates), core.xirr(values, dates), core.xirr(small_values, small_dates)], rel=1e-12)
+
+
+def test_irr_batch_rows_are_split(executor):
+    series = [[-100.0 - row % 13, 30, 40, 50, 10 + row % 5] for row in range(200)] + [[-100, -20]]
+    result = executor.map('irr_batch', [(series,)])[0]
+    expected = core.irr_batch(series)
+    assert numpy.allclose(result.root, expected.root, equal_nan=True)
+    assert (result.iterations == expected.iterations).all()
+    assert (result.converged == expected.converged).all()
+
+
+def test_irr_batch_guess_per_row(executor):
+    series = [[-100.0 - row % 13, 30, 40, 50, 10 + row % 5] for row in range(3000)]
+    guesses = [0.05 + 0.01 * (row % 4) for row in range(3000)]
+    result = executor.map('irr_batch', [(series, guesses), (series, [0.1] * 3000)])
+    expected = core.irr_batch(series, guesses)
+    assert numpy.allclose(result[0].root, expected.root)
+    assert (result[0].iterations == expected.iterations).all()
+    assert numpy.allclose(result[1].root, core.irr_batch(series).root)
+
+
+def test_errors_are_raised_and_blocks_released(executor):
+    values, dates = __ledger(1000)
+    blocks = __shared_blocks()
+    with pytest.raises(ValueError, match='chronological order'):
+        executor.map('xnpv', [(0.05, values, dates[:500] + dates[:500])])
+    with pytest.raises(ValueError, match='same length'):
+        executor.map('xnpv', [(0.05, values, dates[:-1])])
+    with pytest.raises(ValueError, match='same length'):
+        executor.map('xnpv', [(0.05, values[:10], dates[:9])])
+    assert executor.map('xnpv', [(0.05, values, dates)]) == pytest.approx([core.xnpv(0.05, values, dates)])
+    assert __shared_blocks() == blocks
+
+
+def test_in_process_executor():
+    values, dates = __ledger(100)
+    with parallel.ParallelExecutor(workers=0) as executor:
+        assert executor.map('xnpv', [(0.05, values, dates)]) == [core.xnpv(0.05, values, dates)]
@@ -0,0 +1,118 @@
+import json
+import math
+import pytest
+import lambda_handlers as handlers
+import wrapper_handler
+import log_helper
+import phase_metrics
+
+XIRR_REQUEST = {'values': [-100, 20, 40, 25], 'dates': ['2016-01-01', '2016-4-1', '2016-10-1', '2017-2-1']}
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    sink = phase_metrics.HistogramSink()
+    monkeypatch.setattr(handlers, 'metrics', phase_metrics.Recorder(sink))
+    return sink
+
+
+def test_request_size_and_bucket():
+    assert phase_metrics.request_size({'rate': 0.05, 'nper': 10}) == 1
+    assert phase_metrics.request_size(XIRR_REQUEST) == 4
+    assert phase_metrics.request_size({'function_name': 'irr', 'args': {'values': list(range(250))}}) == 250
+    assert phase_metrics.request_size({'values': {'dtype': '<f8', 'shape': [1000], 'data': ''}}) == 1000
+    assert [phase_metrics.size_bucket(size) for size in [1, 4, 10, 11, 250, 100000]] == \
+        ['1', '10', '10', '100', '1000', '100000']
+
+
+def test_histogram():
+    histogram = phase_metrics.Histogram()
+    for milliseconds in [0.0005, 0.01, 0.02, 0.03, 5.0]:
+        histogram.add(milliseconds)
+    assert histogram.count == 5
+    assert histogram.mean == pytest.approx(1.0121)
+    # Bucket upper bounds, never above the largest duration
+    assert histogram.percentile(0.5) == 0.032
+    assert histogram.percentile(0.99) == 5.0
+    assert math.isnan(phase_metrics.Histogram().percentile(0.5))
+
+
+def test_histogram_sink_aggregates_phases(sink):
+    for _ in range(3):
+        assert 'result' in handlers.xirr_handler(XIRR_REQUEST, None)
+    assert sorted(key for key in sink.histograms if key[3] == 'compute') == \
+        [('xirr', '10', 'cold', 'compute'), ('xirr', '10', 'warm', 'compute')]
+    for phase in phase_metrics.PHASES:
+        assert sink.histogram('xirr', phase).count == 3
+    assert sink.histogram('xirr', 'compute').maximum > 0
+    assert set(sink.summary()) == set('xirr/' + phase for phase in phase_metrics.PHASES)
+
+
+def test_errors_are_recorded(sink):
+    assert 'error' in handlers.xirr_handler({'values': [-100, 20]}, None)
+    assert sink.histogram('xirr', 'validate').count == 1
+    assert sink.histogram('xirr', 'compute').maximum == 0
+
+
+def test_wrapper_records_its_function(sink):
+    response = wrapper_handler.financial_functions_handler({'function_name': 'xirr', 'args': XIRR_REQUEST}, None)
+    assert 'result' in response
+    assert sink.histogram('xirr', 'compute').count == 1
+    assert sink.histogram('wrapper', 'validate').count == 0
+
+    response = wrapper_handler.financial_functions_handler({'function_name': 'nope', 'args': {}}, None)
+    assert 'error' in response
+    assert sink.histogram('wrapper', 'validate').count == 1
+
+
+def test_batch_records_the_batch_and_its_sub_requests(sink):
+    response = wrapper_handler.financial_functions_handler({'requests': [
+        {'function_name': 'xirr', 'args': XIRR_REQUEST},
+        {'function_name': 'fv', 'args': {'rate': 0.05, 'nper': 10, 'pmt': -100, 'pv': -100}}]}, None)
+    assert all('result' in result for result in response['results'])
+    assert sink.histogram('batch', 'compute').count == 1
+    assert sink.histogram('xirr', 'compute').count == 1
+
+
+def test_disabled_metrics_do_not_time(monkeypatch):
+    class Unused(object):
+        def __init__(self, *args):
+            raise AssertionError('timed with metrics disabled')
+
+    assert not handlers.metrics.enabled
+    monkeypatch.setattr(phase_metrics, 'PhaseTimer', Unused)
+    assert 'result' in handlers.xirr_handler(XIRR_REQUEST, None)
+    assert 'result' in wrapper_handler.financial_functions_handler({'function_name': 'xirr', 'args': XIRR_REQUEST}, None)
+    assert 'results' in wrapper_handler.financial_functions_handler(
+        {'requests': [{'function_name': 'xirr', 'args': XIRR_REQUEST}]}, None)
+
+
+def test_emf_lines(monkeypatch, capsys):
+    monkeypatch.setattr(handlers, 'metrics', phase_metrics.Recorder(phase_metrics.EmfSink('Test')))
+    handlers.xirr_handler(XIRR_REQUEST, None)
+    line = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    metrics = line['_aws']['CloudWatchMetrics'][0]
+    assert metrics['Namespace'] == 'Test'
+    assert metrics['Dimensions'] == [['FunctionName', 'SizeBucket', 'Start']]
+    assert [metric['Name'] for metric in metrics['Metrics']] == list(phase_metrics.PHASES)
+    assert (line['FunctionName'], line['SizeBucket'], line['Start']) == ('xirr', '10', 'cold')
+    assert all(line[phase] >= 0 for phase in phase_metrics.PHASES)
+
+
+def test_metric_line():
+    line = json.loads(log_helper.metric_line('NS', {'FunctionName': 'fv'}, {'count': 3}, unit='Count'))
+    assert line['_aws']['CloudWatchMetrics'][0]['Metrics'] == [{'Name': 'count', 'Unit': 'Count'}]
+    assert line['FunctionName'] == 'fv' and line['count'] == 3
+    assert isinstance(line['_aws']['Timestamp'], int)
+
+
+def test_from_environment(monkeypatch):
+    assert not phase_metrics.from_environment().enabled
+    monkeypatch.setenv('PHASE_METRICS', 'local')
+    assert isinstance(phase_metrics.from_environment().sink, phase_metrics.HistogramSink)
+    monkeypatch.setenv('PHASE_METRICS', 'emf')
+    monkeypatch.setenv('PHASE_METRICS_NAMESPACE', 'Loans')
+    assert phase_metrics.from_environment().sink.namespace == 'Loans'
+    monkeypatch.setenv('PHASE_METRICS', 'statsd')
+    with pytest.raises(ValueError):
+        phase_metrics.from_environment()
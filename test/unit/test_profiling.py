@@ -0,0 +1,81 @@
+import os
+import pstats
+import pytest
+import lambda_handlers as handlers
+import wrapper_handler
+import profiling
+
+XIRR_REQUEST = {'values': [-100, 20, 40, 25], 'dates': ['2016-01-01', '2016-4-1', '2016-10-1', '2017-2-1']}
+
+
+@pytest.fixture
+def profiler(monkeypatch, tmp_path):
+    profiler = profiling.Profiler(1.0, str(tmp_path), response_top=5)
+    monkeypatch.setattr(handlers, 'profiler', profiler)
+    return profiler
+
+
+def test_profiles_are_aggregated_to_files(profiler):
+    for _ in range(2):
+        assert 'result' in handlers.xirr_handler(XIRR_REQUEST, None)
+    assert profiler.samples == {'xirr': 2}
+    stats = pstats.Stats(profiler.path('xirr'))
+    assert any(name == 'xirr' and filename.endswith('core.py') for filename, _, name in stats.stats)
+
+
+def test_hot_functions_in_response(profiler):
+    response = handlers.xirr_handler(XIRR_REQUEST, None)
+    assert round(response['result'], 5) == -0.19674
+    assert len(response['profile']) == 5
+    assert set(response['profile'][0]) == {'function', 'calls', 'own_ms', 'cumulative_ms'}
+    own = [row['own_ms'] for row in response['profile']]
+    assert own == sorted(own, reverse=True)
+
+
+def test_no_hot_functions_without_response_top(profiler):
+    profiler.response_top = 0
+    assert 'profile' not in handlers.xirr_handler(XIRR_REQUEST, None)
+
+
+def test_wrapper_requests_are_profiled_as_their_function(profiler):
+    response = wrapper_handler.financial_functions_handler({'function_name': 'xirr', 'args': XIRR_REQUEST}, None)
+    assert 'profile' in response
+    wrapper_handler.financial_functions_handler({'requests': [{'function_name': 'xirr', 'args': XIRR_REQUEST}]}, None)
+    wrapper_handler.financial_functions_handler({'function_name': 'nope', 'args': {}}, None)
+    assert profiler.samples == {'xirr': 1, 'batch': 1, 'wrapper': 1}
+    assert os.path.exists(profiler.path('batch'))
+
+
+def test_sample_rate(profiler, monkeypatch):
+    profiler.sample_rate = 0.5
+    draws = iter([0.7, 0.2, 0.5])
+    monkeypatch.setattr(profiling.random, 'random', lambda: next(draws))
+    responses = [handlers.xirr_handler(XIRR_REQUEST, None) for _ in range(3)]
+    assert ['profile' in response for response in responses] == [False, True, False]
+
+
+def test_errors_are_profiled(profiler):
+    with pytest.raises(ZeroDivisionError):
+        profiler.run('failing', lambda: 1 / 0)
+    assert profiler.samples == {'failing': 1}
+
+
+def test_disabled_profiler_does_not_profile(monkeypatch):
+    class Unused(object):
+        def __init__(self, *args):
+            raise AssertionError('profiled with profiling disabled')
+
+    assert not handlers.profiler.enabled
+    monkeypatch.setattr(profiling.cProfile, 'Profile', Unused)
+    assert 'profile' not in handlers.xirr_handler(XIRR_REQUEST, None)
+    assert 'profile' not in wrapper_handler.financial_functions_handler({'function_name': 'xirr', 'args': XIRR_REQUEST},
+                                                                        None)
+
+
+def test_from_environment(monkeypatch):
+    assert not profiling.from_environment().enabled
+    monkeypatch.setenv('PROFILE_SAMPLE_RATE', '0.01')
+    monkeypatch.setenv('PROFILE_RESPONSE_TOP', '10')
+    profiler = profiling.from_environment()
+    assert profiler.enabled
+    assert (profiler.directory, profiler.response_top) == ('/tmp', 10)
@@ -0,0 +1,128 @@
+import numpy
+import pytest
+import result_cache
+import core
+
+
+class Counter(object):
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def test_disabled_cache_always_computes():
+    cache = result_cache.ResultCache(0, 1024 * 1024)
+    compute = Counter(1.5)
+    assert cache.get_or_compute('numpy.pmt', [0.05, 10, 1000], compute) == 1.5
+    assert cache.get_or_compute('numpy.pmt', [0.05, 10, 1000], compute) == 1.5
+    assert compute.calls == 2
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'bytes': 0}
+
+
+def test_hits_and_misses():
+    cache = result_cache.ResultCache(10, 1024 * 1024)
+    compute = Counter(-1854.02472)
+    for _ in range(3):
+        assert cache.get_or_compute('numpy.pmt', [0.00625, 180, 200000, 0, 0], compute) == -1854.02472
+    cache.get_or_compute('numpy.pmt', [0.00625, 180, 300000, 0, 0], compute)
+    cache.get_or_compute('numpy.ppmt', [0.00625, 180, 200000, 0, 0], compute)
+
+    assert compute.calls == 3
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (2, 3, 0, 3)
+    assert stats['bytes'] > 0
+
+
+def test_exceptions_are_not_cached():
+    cache = result_cache.ResultCache(10, 1024 * 1024)
+
+    def fail():
+        raise RuntimeError('Failed to converge')
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            cache.get_or_compute('ff.xirr', [[-100, 20]], fail)
+    assert cache.stats()['entries'] == 0
+
+
+def test_evicts_least_recently_used_by_count():
+    cache = result_cache.ResultCache(2, 1024 * 1024)
+    cache.get_or_compute('f', [1], lambda: 1)
+    cache.get_or_compute('f', [2], lambda: 2)
+    cache.get_or_compute('f', [1], lambda: 1)
+    cache.get_or_compute('f', [3], lambda: 3)
+
+    compute = Counter(1)
+    cache.get_or_compute('f', [1], compute)
+    assert compute.calls == 0
+    cache.get_or_compute('f', [2], compute)
+    assert compute.calls == 1
+    assert cache.stats()['evictions'] == 2
+
+
+def test_evicts_by_bytes():
+    small = result_cache.approximate_size(result_cache.make_key('f', [0])) + result_cache.approximate_size(0.5)
+    cache = result_cache.ResultCache(100, small * 3)
+    for value in range(10):
+        cache.get_or_compute('f', [value], lambda: 0.5)
+    stats = cache.stats()
+    assert stats['entries'] == 3
+    assert stats['bytes'] <= small * 3
+    assert stats['evictions'] == 7
+
+    # Results larger than the whole cache are returned without being cached
+    assert cache.get_or_compute('g', [0], lambda: [0.5] * 1000) == [0.5] * 1000
+    assert cache.stats()['entries'] == 3
+
+
+def test_large_arrays_are_hashed():
+    values = [float(value) for value in range(1000)]
+    key = result_cache.make_key('numpy.npv', [0.05, values])
+    assert result_cache.approximate_size(key) < 1000
+    assert key == result_cache.make_key('numpy.npv', [0.05, list(values)])
+    assert key != result_cache.make_key('numpy.npv', [0.05, values[::-1]])
+    assert key != result_cache.make_key('numpy.npv', [0.05, values[:-1]])
+
+    ordinals = numpy.arange(736000, 737000)
+    key = result_cache.make_key('ff.xnpv', [0.05, values, ordinals])
+    assert result_cache.approximate_size(key) < 1000
+    assert key == result_cache.make_key('ff.xnpv', [0.05, values, ordinals.copy()])
+    assert key != result_cache.make_key('ff.xnpv', [0.05, values, ordinals.astype(numpy.int32)])
+
+
+def test_cash_flow_series_key():
+    series = core.cash_flow_series([-100, 50, 60], numpy.array([736000, 736100, 736200]))
+    same = core.cash_flow_series([-100, 50, 60], numpy.array([736000, 736100, 736200]))
+    later = core.cash_flow_series([-100, 50, 60], numpy.array([736000, 736100, 736300]))
+    assert result_cache.make_key('ff.xirr', [series]) == result_cache.make_key('ff.xirr', [same])
+    assert result_cache.make_key('ff.xirr', [series]) != result_cache.make_key('ff.xirr', [later])
+    assert result_cache.make_key('ff.xirr', [series])[1][0] == 'CashFlowSeries'
+
+
+def test_short_lists_are_kept_in_key():
+    assert result_cache.make_key('numpy.pmt', [[0.05, 0.06], 180, 1000]) == ('numpy.pmt', ('list', 0.05, 0.06), 180, 1000)
+    assert result_cache.make_key('f', [[1]]) != result_cache.make_key('f', [(1,)])
+
+
+def test_cached_lists_are_copies():
+    cache = result_cache.ResultCache(10, 1024 * 1024)
+    result = cache.get_or_compute('numpy.pmt', [[0.05, 0.06], 180, 1000], lambda: [1.0, 2.0])
+    result.append(3.0)
+    cached = cache.get_or_compute('numpy.pmt', [[0.05, 0.06], 180, 1000], lambda: None)
+    assert cached == [1.0, 2.0]
+    cached.append(3.0)
+    assert cache.get_or_compute('numpy.pmt', [[0.05, 0.06], 180, 1000], lambda: None) == [1.0, 2.0]
+
+
+def test_from_environment(monkeypatch):
+    assert not result_cache.from_environment().enabled
+
+    monkeypatch.setenv('RESULT_CACHE_SIZE', '100')
+    monkeypatch.setenv('RESULT_CACHE_MAX_BYTES', '4096')
+    cache = result_cache.from_environment()
+    assert cache.enabled
+    assert (cache.max_entries, cache.max_bytes, cache.hash_items) == (100, 4096, 32)
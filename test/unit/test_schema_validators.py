@@ -0,0 +1,83 @@
+import pytest
+
+from decimal import Decimal
+from jsonschema import validate
+from jsonschema.exceptions import ValidationError
+import schema_validators
+import validation_json_schemas as schemas
+
+def __error_message(validation, *args):
+    try:
+        validation(*args)
+    except ValidationError as err:
+        return err.message
+    return None
+
+@pytest.mark.parametrize("schema_name,instance", [
+    ('irr_schema', {"values": [-100, 39, 59.5, 55, 20]}),
+    ('irr_schema', {"values": [100]}),
+    ('irr_schema', {"values": [-100, True]}),
+    ('irr_schema', {"values": "test"}),
+    ('irr_schema', {"values": [-100, 39], "guess": 0.1}),
+    ('irr_schema', {}),
+    ('irr_schema', []),
+    ('xnpv_schema', {"rate": 0.05, "values": [-100, 20], "dates": ['2016-01-01', '2016-4-1']}),
+    ('xnpv_schema', {"rate": 0.05, "values": [-100, 20], "dates": ['2016-01-01', 'bogus']}),
+    ('xnpv_schema', {"rate": 0.05, "values": [-100, 20], "dates": ['2016-01-01', 20160401]}),
+    ('xnpv_schema', {"values": [-100, 20], "dates": ['2016-01-01', '2016-4-1']}),
+    ('xnpv_schema', {"rate": 0.05, "values": [-100, 20], "dates": [736000, 736091], "date_format": "ordinal"}),
+    ('xnpv_schema', {"rate": 0.05, "values": [-100, 20], "dates": [16801, 1.5], "date_format": "epoch"}),
+    ('xnpv_schema', {"rate": 0.05, "values": [-100, 20], "dates": [16801, True]}),
+    ('xnpv_schema', {"rate": 0.05, "values": [-100, 20], "dates": [16801, 16802], "date_format": "unix"}),
+    ('fvschedule_schema', {"principal": 10000, "schedule": [0.05, 0.035]}),
+    ('irr_batch_schema', {"values": [[-100, 39], [-1000, 300, 400]]}),
+    ('irr_batch_schema', {"values": [[-100, 39], [-1000]]}),
+    ('irr_batch_schema', {"values": [[-100, 39], "test"]}),
+    ('irr_batch_schema', {"values": [1, 'a']}),
+    ('irr_batch_schema', {"values": [[-100, 'x'], [-100]]}),
+    ('irr_batch_schema', {"values": [[-100, 39], 5, [-100, None]]}),
+    ('pmt_schema', {"rate": [0.00625, 0.005], "nper": 180, "pv": 200000}),
+    ('pmt_schema', {"rate": [0.00625, None], "nper": 180, "pv": 200000}),
+    ('pmt_schema', {"rate": 0.00625, "nper": 180, "pv": 200000, "type": 1.0}),
+    ('pmt_schema', {"rate": 0.00625, "nper": 180, "pv": 200000, "type": True}),
+    ('pmt_schema', {"rate": 0.00625, "nper": 180, "pv": 200000, "type": [0, 2]}),
+    ('pmt_schema', {"rate": Decimal('0.00625'), "nper": 180, "pv": 200000}),
+    ('ppmt_schema', {"rate": 0.1, "per": [1, 0], "nper": 3, "pv": 1000}),
+    ('amortization_schema', {"rate": 0.00625, "nper": 180, "pv": 200000}),
+    ('amortization_schema', {"rate": 0.00625, "nper": [180, 1200], "pv": 200000}),
+    ('amortization_schema', {"rate": 0.00625, "nper": [180, 1201], "pv": 200000}),
+    ('amortization_schema', {"rate": 0.00625, "nper": 180.0, "pv": 200000}),
+    ('amortization_schema', {"rate": 0.00625, "nper": 0, "pv": 200000}),
+    ('rate_schema', {"nper": 6, "pv": 1000}),
+    ('rate_schema', {"nper": 6, "pv": 1000, "fv": -100}),
+    ('effect_schema', {"nominal_rate": 0.12, "npery": 0.5}),
+    ('irr_schema', {"values": {"dtype": "<f8", "shape": [2], "data": "AAAAAAAAWcAAAAAAAIBDQA=="}}),
+    ('irr_schema', {"values": {"dtype": "<i4", "shape": [2], "data": "nP///ycAAAA="}}),
+    ('irr_schema', {"values": {"dtype": "<f8", "shape": [1, 2], "data": "AAAAAAAAWcAAAAAAAIBDQA=="}}),
+    ('irr_schema', {"values": {"dtype": "<f8", "data": "AAAAAAAAWcAAAAAAAIBDQA=="}}),
+    ('xirr_schema', {"values": [-100, 20], "dates": {"dtype": "<i4", "shape": [2], "data": "0DkLAGQ6CwA="}}),
+    ('xirr_schema', {"values": [-100, 20], "dates": {"dtype": "<f8", "shape": [2], "data": "0DkLAGQ6CwA="}}),
+    ('npv_schema', {"rate": 0.1, "values": [-100, 20], "result_encoding": "base64"}),
+    ('npv_schema', {"rate": 0.1, "values": [-100, 20], "result_encoding": "binary"}),
+])
+def test_validate_matches_jsonschema(schema_name, instance):
+    expected = __error_message(validate, instance, getattr(schemas, schema_name))
+    assert __error_message(schema_validators.validate, instance, schema_name) == expected
+
+@pytest.mark.parametrize("schema_name,instance", [
+    ('irr_schema', {"values": [-100, "test1", 20, "test2"]}),
+    ('pv_schema', {"rate": ['2016-1-1', 'x'], "nper": 10, "pmt": -100}),
+    ('pv_schema', {"rate": [0.05, None, 'x', [1]], "nper": [10, 'y'], "pmt": -100}),
+    ('npv_schema', {"rate": 0.05, "values": [True, -100, '20']}),
+    ('xnpv_schema', {"rate": 0.05, "values": [-100, 20], "dates": ['2016-01-01', 'x', 20160401, '2016-13-1']}),
+    ('fvschedule_schema', {"principal": 100, "schedule": ['a', None, 0.05]}),
+    ('amortization_schema', {"rate": 0.01, "nper": [12, 12.5, 'x', 1300], "pv": 1000}),
+])
+def test_invalid_elements_are_reported_like_jsonschema(schema_name, instance):
+    expected = __error_message(validate, instance, getattr(schemas, schema_name))
+    assert expected is not None
+    assert __error_message(schema_validators.validate, instance, schema_name) == expected
+
+def test_validators_built_for_all_schemas():
+    schema_names = [name for name in vars(schemas) if name.endswith('_schema')]
+    assert sorted(schema_validators.VALIDATORS) == sorted(schema_names)
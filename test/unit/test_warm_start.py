@@ -0,0 +1,94 @@
+import pytest
+import lambda_handlers as handlers
+import warm_start
+
+VALUES = [-10000, 2750, 4250, 3250, 2750, 1000]
+DATES = ['2008-01-01', '2008-03-01', '2008-10-30', '2009-02-15', '2009-04-01', '2009-06-01']
+
+
+def test_disabled_cache_has_no_seeds():
+    cache = warm_start.GuessCache(0)
+    assert not cache.enabled
+    assert not warm_start.from_environment().enabled
+
+
+def test_counts_iterations_saved():
+    cache = warm_start.GuessCache(10)
+    assert cache.get('deal') is None
+    cache.put('deal', 0.05, 7)
+
+    seed = cache.get('deal')
+    assert seed == warm_start.Seed(0.05, 7)
+    cache.put('deal', 0.051, 3, seed)
+    # The iterations of the first, unseeded solve stay the reference for later seeded solves
+    assert cache.get('deal') == warm_start.Seed(0.051, 7)
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'iterations_saved': 4, 'entries': 1}
+
+
+def test_evicts_least_recently_used():
+    cache = warm_start.GuessCache(2)
+    cache.put('a', 0.1, 5)
+    cache.put('b', 0.2, 5)
+    cache.get('a')
+    cache.put('c', 0.3, 5)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+
+def test_xirr_with_appended_cash_flows(monkeypatch):
+    monkeypatch.setattr(handlers, 'guesses', warm_start.GuessCache(10))
+    cold = handlers.xirr_handler({'values': VALUES[:5], 'dates': DATES[:5]}, None)
+    warm = handlers.xirr_handler({'values': VALUES, 'dates': DATES}, None)
+
+    handlers.guesses.clear()
+    assert handlers.xirr_handler({'values': VALUES, 'dates': DATES}, None)['result'] == pytest.approx(warm['result'])
+    assert round(cold['result'], 5) == 0.37336
+    stats = handlers.guesses.stats()
+    assert (stats['hits'], stats['misses']) == (0, 1)
+
+
+def test_explicit_guess_wins(monkeypatch):
+    monkeypatch.setattr(handlers, 'guesses', warm_start.GuessCache(10))
+    handlers.rate_handler({'nper': 60, 'pmt': -200, 'pv': 10000, 'instrument_id': 'loan-1'}, None)
+    handlers.rate_handler({'nper': 61, 'pmt': -200, 'pv': 10000, 'instrument_id': 'loan-1', 'guess': 0.2}, None)
+    assert handlers.guesses.stats()['hits'] == 0
+
+    response = handlers.rate_handler({'nper': 62, 'pmt': -200, 'pv': 10000, 'instrument_id': 'loan-1'}, None)
+    assert round(response['result'], 8) == round(handlers.__dict__['__rate'](62, -200, 10000, 0, 0, 0.1), 8)
+    stats = handlers.guesses.stats()
+    assert stats['hits'] == 1 and stats['iterations_saved'] > 0
+
+
+def test_irr_batch_rows_are_seeded(monkeypatch):
+    monkeypatch.setattr(handlers, 'guesses', warm_start.GuessCache(10))
+    # Series longer than the fingerprint prefix keep their fingerprint when a cash flow is appended
+    series = [[-100, 39, 59, 55, 20, 5, 5, 5, 5], [-1000, 100, 200, 300, 400, 500, 10, 10, 10, 10]]
+    first = handlers.irr_batch_handler({'values': series}, None)
+    second = handlers.irr_batch_handler({'values': [row + [10] for row in series]}, None)
+    assert first['converged'] == second['converged'] == [True, True]
+    assert handlers.guesses.stats()['hits'] == 2
+    cold = handlers.irr_batch_handler({'values': [row + [10] for row in series], 'guess': 0.1}, None)
+    assert second['result'] == pytest.approx(cold['result'])
+
+
+@pytest.mark.parametrize('seed', [float('nan'), 1e6])
+def test_poisoned_seed_is_retried_from_guess(monkeypatch, seed):
+    monkeypatch.setattr(handlers, 'guesses', warm_start.GuessCache(10))
+    cold_xirr = handlers.xirr_handler({'values': VALUES, 'dates': DATES}, None)
+    cold_rate = handlers.rate_handler({'nper': 60, 'pmt': -200, 'pv': 10000}, None)
+    series = [[-100, 39, 59, 55, 20, 5, 5, 5, 5]]
+    cold_batch = handlers.irr_batch_handler({'values': series, 'guess': 0.1}, None)
+
+    handlers.guesses.put(('xirr', 'id', 'deal'), seed, 5)
+    handlers.guesses.put(('rate', 'id', 'loan'), seed, 5)
+    handlers.guesses.put(('irr_batch',) + tuple(series[0][:8]), seed, 5)
+    xirr = handlers.xirr_handler({'values': VALUES, 'dates': DATES, 'instrument_id': 'deal'}, None)
+    rate = handlers.rate_handler({'nper': 60, 'pmt': -200, 'pv': 10000, 'instrument_id': 'loan'}, None)
+    batch = handlers.irr_batch_handler({'values': series}, None)
+    assert xirr['result'] == pytest.approx(cold_xirr['result'])
+    assert rate['result'] == pytest.approx(cold_rate['result'])
+    assert batch['result'] == pytest.approx(cold_batch['result'])
+    assert batch['converged'] == [True]
+    # The poisoned seeds are replaced by the solutions
+    assert handlers.guesses.get(('xirr', 'id', 'deal')).root == pytest.approx(cold_xirr['result'])
+    assert handlers.guesses.get(('rate', 'id', 'loan')).root == pytest.approx(cold_rate['result'])
@@ -22,3 +22,81 @@ def test_wrapper_handler_invalid_function_args():
     response = wrapper.financial_functions_handler({"function_name":"fv", 'args': {}}, None)
     assert 'error' in response
 
+
+def test_wrapper_handler_batch():
+    response = wrapper.financial_functions_handler({
+        "requests": [
+            {"function_name": "pmt", "args": {"rate": 0.00625, "nper": 180, "pv": 200000}},
+            {"function_name": "sln", "args": {"cost": 5000, "salvage": 300, "life": 10}},
+            {"function_name": "pmt", "args": {"rate": 0.00625, "nper": 180, "pv": 200000, "fv": 300000, "type": 1}},
+            {"function_name": "nper", "args": {"rate": 0.005833333333333, "pmt": -150, "pv": 8000}},
+            {"function_name": "nper", "args": {"rate": 0, "pmt": -150, "pv": 8000}},
+            {"function_name": "rate", "args": {"nper": 6, "pmt": -200, "pv": 1000}}
+        ]
+    }, None)
+
+    results = response.get('results')
+    assert len(results) == 6
+    assert round(results[0].get('result'), 6) == -1854.02472
+    assert results[1].get('result') == 470
+    assert round(results[2].get('result'), 6) == -2742.918559
+    assert round(results[3].get('result'), 5) == 64.07335
+    assert round(results[4].get('result'), 5) == -53.33333
+    assert round(results[5].get('result'), 6) == 0.054718
+
+def test_wrapper_handler_batch_duplicates():
+    request = {"function_name": "fv", "args": {"rate": 0.004166666666667, "nper": 120, "pmt": -100}}
+    response = wrapper.financial_functions_handler({"requests": [request, request, request]}, None)
+
+    results = response.get('results')
+    assert len(results) == 3
+    assert all(round(result.get('result'), 6) == 15528.227945 for result in results)
+
+def test_wrapper_handler_batch_partial_failure():
+    response = wrapper.financial_functions_handler({
+        "requests": [
+            {"function_name": "pmt", "args": {"rate": 0.00625, "nper": 180}},
+            {"function_name": "pmt", "args": {"rate": 0.00625, "nper": 180, "pv": 200000}},
+            {"function_name": "not_available", "args": {}},
+            {"function_name": "sln", "args": {"cost": 5000, "salvage": 300, "life": 0}},
+            {"function_name": "rate", "args": {"nper": 6, "pmt": 200, "pv": 1000}},
+            {"function_name": "rate", "args": {"nper": 6, "pmt": -200, "pv": 1000}},
+            "bogus"
+        ]
+    }, None)
+
+    results = response.get('results')
+    assert len(results) == 7
+    assert results[0].get('error') == "'pv' is a required property"
+    assert round(results[1].get('result'), 6) == -1854.02472
+    assert 'error' in results[2]
+    assert 'error' in results[3]
+    assert round(results[5].get('result'), 6) == 0.054718
+    assert 'error' in results[6]
+
+def test_wrapper_handler_batch_invalid():
+    response = wrapper.financial_functions_handler({"requests": {}}, None)
+    assert 'error' in response
+
+def test_wrapper_handler_batch_matches_single_requests(monkeypatch):
+    import lambda_handlers as handlers
+    import phase_metrics
+    import result_cache
+    sink = phase_metrics.HistogramSink()
+    monkeypatch.setattr(handlers, 'metrics', phase_metrics.Recorder(sink))
+    monkeypatch.setattr(handlers, 'cache', result_cache.ResultCache(100, 1 << 20))
+    requests = [
+        {"function_name": "pmt", "args": {"rate": 0.00625, "nper": 180, "pv": 200000, "result_encoding": "base64"}},
+        {"function_name": "pmt", "args": {"rate": [0.00625, 0.005], "nper": 180, "pv": 200000,
+                                          "result_encoding": "base64"}},
+        {"function_name": "fv", "args": {"rate": 0.004166666666667, "nper": 120, "pmt": -100}},
+        {"function_name": "fv", "args": {"rate": 0.05, "nper": 10, "pmt": -100, "pv": -100, "type": 1}},
+        {"function_name": "pv", "args": {"rate": 0.05, "nper": 10, "pmt": -100}},
+    ]
+    results = wrapper.financial_functions_handler({"requests": requests}, None)['results']
+    # The vectorized rows are recorded as their function, and their results are cached
+    assert sink.histogram('fv', 'compute').count == 2
+    assert handlers.cache.stats()['entries'] == 5
+    assert [wrapper.financial_functions_handler(request, None) for request in requests] == results
+    assert handlers.cache.stats()['hits'] == 5
+    assert results[1]['result']['dtype'] == '<f8'
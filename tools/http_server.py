@@ -0,0 +1,242 @@
+"""
+HTTP server for the financial functions, for running them on our own hosts and testing them without AWS.
+
+POST a JSON request to any path, the same {"function_name", "args"} request or {"requests"} batch the API app takes, and
+the response body is what wrapper_handler.financial_functions_handler returns. GET /health returns the status and
+request counters of the server. Connections are kept alive between requests.
+
+The server runs on asyncio with the standard library only. Requests for the iterative solvers, batches and large
+payloads are evaluated in a pool of worker processes, so that they never block the event loop. With --coalesce-ms,
+single requests for the same function arriving within that many milliseconds are evaluated together as one batch, in
+which the wrapper computes identical requests once and vectorizes the periodic functions.
+
+Usage:
+    python tools/http_server.py [--host 127.0.0.1] [--port 8080] [--workers 4] [--coalesce-ms 2]
+"""
+from __future__ import print_function
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import sys
+import traceback
+
+from ndjson_runner import load_handler
+
+# Functions solved iteratively, which can take long enough to stall other connections
+HEAVY_FUNCTIONS = frozenset(['irr', 'irr_batch', 'rate', 'xirr'])
+# Request bodies from this size are evaluated in the worker processes whatever their function
+INLINE_MAX_BYTES = 64 * 1024
+# Larger request bodies are refused
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# Seconds an idle connection is kept open
+KEEP_ALIVE_TIMEOUT = 15.0
+
+REASONS = {200: 'OK', 400: 'Bad Request', 405: 'Method Not Allowed', 411: 'Length Required',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def evaluate(request):
+    """
+    Evaluate a request with the wrapper handler, in this process or in a worker process
+    """
+    return load_handler()(request, None)
+
+
+class FinancialFunctionsServer(object):
+    """
+    Connection handler for asyncio.start_server evaluating requests with the wrapper handler
+    """
+
+    def __init__(self, executor=None, coalesce_window=0.0, max_coalesced=1000, keep_alive_timeout=KEEP_ALIVE_TIMEOUT):
+        """
+        :param executor: concurrent.futures executor for heavy requests, None to evaluate every request on the event loop
+        :param coalesce_window: Seconds single requests for the same function are gathered into a batch, 0 to disable
+        :param max_coalesced: Requests from which a gathered batch is evaluated without waiting for the window to end
+        :param keep_alive_timeout: Seconds an idle connection is kept open
+        """
+        self.executor = executor
+        self.coalesce_window = coalesce_window
+        self.max_coalesced = max_coalesced
+        self.keep_alive_timeout = keep_alive_timeout
+        self.stats = {'connections': 0, 'requests': 0, 'evaluations': 0, 'coalesced': 0}
+        # Function name mapped to the requests gathered for it with their futures, and the timer evaluating them
+        self.__pending = {}
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve the requests of a connection until the client closes it, asks to, or stays idle for too long
+        """
+        self.stats['connections'] += 1
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.keep_alive_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                keep_alive = await self.__serve(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # The client went away or sent a request that is not valid HTTP, such as a non-numeric Content-Length
+            pass
+        finally:
+            writer.close()
+
+    async def __serve(self, request_line, reader, writer):
+        """
+        Read the headers and body of one request and write its response
+        :return: Whether the connection stays open
+        """
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            _write_response(writer, 400, {'error': 'malformed request line'}, False)
+            return False
+        method, path, version = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+        if 'transfer-encoding' in headers:
+            _write_response(writer, 411, {'error': 'a Content-Length is required'}, False)
+            return False
+        length = int(headers.get('content-length') or 0)
+        if length > MAX_BODY_BYTES:
+            _write_response(writer, 413, {'error': 'request body larger than {} bytes'.format(MAX_BODY_BYTES)}, False)
+            return False
+        body = await reader.readexactly(length)
+
+        if method == 'GET' and path.split('?')[0] == '/health':
+            status, response = 200, dict(self.stats, status='ok')
+        elif method != 'POST':
+            status, response = 405, {'error': 'use POST to call a function or GET /health'}
+        else:
+            self.stats['requests'] += 1
+            try:
+                request = json.loads(body)
+            except ValueError as err:
+                status, response = 400, {'error': 'invalid JSON: {}'.format(err)}
+            else:
+                try:
+                    status, response = 200, await self.evaluate(request, length)
+                except Exception as err:
+                    # Errors of the functions themselves, such as an XIRR that does not converge, fail this request
+                    # only and keep the connection usable
+                    traceback.print_exc(file=sys.stderr)
+                    status, response = 500, {'error': str(err)}
+        _write_response(writer, status, response, keep_alive)
+        return keep_alive
+
+    async def evaluate(self, request, size=0):
+        """
+        Evaluate a request with the wrapper handler, gathering single requests into batches when coalescing
+        :param request: Decoded request
+        :param size: Size of the request body in bytes
+        :return: Response of the wrapper handler
+        """
+        function_name = request.get('function_name') if isinstance(request, dict) else None
+        if not isinstance(function_name, str) or 'requests' in request:
+            return await self.__call(request, True)
+        heavy = function_name in HEAVY_FUNCTIONS or size >= INLINE_MAX_BYTES
+        if self.coalesce_window <= 0:
+            return await self.__call(request, heavy)
+
+        future = asyncio.get_running_loop().create_future()
+        entries, timer, batch_heavy = self.__pending.get(function_name) or ([], None, False)
+        entries.append((request, future))
+        if timer is None:
+            timer = asyncio.get_running_loop().call_later(self.coalesce_window, self.__flush, function_name)
+        self.__pending[function_name] = (entries, timer, batch_heavy or heavy)
+        if len(entries) >= self.max_coalesced:
+            self.__flush(function_name)
+        return await future
+
+    def __flush(self, function_name):
+        """
+        Start evaluating the requests gathered for a function
+        """
+        entries, timer, heavy = self.__pending.pop(function_name)
+        timer.cancel()
+        asyncio.ensure_future(self.__evaluate_coalesced(entries, heavy))
+
+    async def __evaluate_coalesced(self, entries, heavy):
+        try:
+            if len(entries) == 1:
+                results = [await self.__call(entries[0][0], heavy)]
+            else:
+                self.stats['coalesced'] += len(entries)
+                response = await self.__call({'requests': [request for request, _ in entries]}, heavy)
+                results = response.get('results') or [response] * len(entries)
+        except Exception as err:
+            for _, future in entries:
+                if not future.done():
+                    future.set_exception(err)
+            return
+        for (_, future), result in zip(entries, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def __call(self, request, heavy):
+        """
+        Evaluate a request in the executor when it is heavy, otherwise directly on the event loop
+        """
+        self.stats['evaluations'] += 1
+        if heavy and self.executor is not None:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, evaluate, request)
+        return evaluate(request)
+
+
+def _write_response(writer, status, response, keep_alive):
+    body = json.dumps(response).encode()
+    writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'
+                 .format(status, REASONS[status], len(body), 'keep-alive' if keep_alive else 'close').encode('latin-1'))
+    writer.write(body)
+
+
+async def serve(host, port, server):
+    """
+    Serve until cancelled
+    """
+    listener = await asyncio.start_server(server.handle_connection, host, port)
+    addresses = ', '.join('{}:{}'.format(*sock.getsockname()[:2]) for sock in listener.sockets)
+    print('Serving financial functions on {}'.format(addresses), file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes for heavy requests, 0 to evaluate every request on the event loop')
+    parser.add_argument('--coalesce-ms', type=float, default=0.0,
+                        help='milliseconds single requests for the same function are gathered into a batch')
+    parser.add_argument('--max-coalesced', type=int, default=1000, help='largest batch of gathered requests')
+    parser.add_argument('--keep-alive', type=float, default=KEEP_ALIVE_TIMEOUT, help='idle connection timeout')
+    options = parser.parse_args()
+
+    executor = concurrent.futures.ProcessPoolExecutor(options.workers) if options.workers else None
+    server = FinancialFunctionsServer(executor, options.coalesce_ms / 1000.0, options.max_coalesced, options.keep_alive)
+    try:
+        asyncio.run(serve(options.host, options.port, server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Convert a CSV or NDJSON ledger of dated cash flows into a ledger file, the memory-mapped binary layout that
+ledger_file.LedgerFile evaluates XNPV and XIRR over in constant memory.
+
+A CSV ledger has a header row naming its columns. An NDJSON ledger has one object per line. Dates are year-month-day
+strings, zero padded or not such as "2016-04-01" or "2016-4-1", or integer day numbers counted as --date-format says,
+like the dates of the XNPV and XIRR functions. The input is read and written in batches of rows, so ledgers of any size
+are converted in constant memory.
+
+Usage:
+    python tools/ledger_convert.py ledger.csv ledger.bin [--date-column date] [--value-column value]
+
+The format is taken from the extension of the input (.csv, .ndjson or .jsonl), or from --format. Use - for stdin.
+"""
+from __future__ import print_function
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'financial_functions'))
+
+import ledger_file
+
+# Rows converted at once
+BATCH_ROWS = 1 << 16
+# Day ordinal of 1970-01-01, day 0 of epoch day numbers
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def day_ordinal(date, date_format='ordinal'):
+    """
+    Day ordinal of a date of a ledger row
+    :param date: Year-month-day string, or integer day number as an int or a string of digits
+    :param date_format: What integer day numbers count from, 'ordinal' or 'epoch'
+    :raises ValueError: if the date is not a valid date or day number
+    """
+    if isinstance(date, str) and '-' in date.strip().lstrip('-'):
+        year, month, day = date.strip().split('-')
+        try:
+            return datetime.date(int(year), int(month), int(day)).toordinal()
+        except ValueError as err:
+            raise ValueError("'{}' is not a valid date: {}".format(date, err))
+    if isinstance(date, bool) or not isinstance(date, (int, str)):
+        raise ValueError("'{}' is not a date or a day number".format(date))
+    return int(date) + EPOCH_ORDINAL if date_format == 'epoch' else int(date)
+
+
+def read_rows(source, file_format, date_column, value_column):
+    """
+    Iterate over the rows of a ledger
+    :param source: Iterable of the lines of the ledger, such as a file
+    :param file_format: 'csv' or 'ndjson'
+    :return: Iterator of (line number, date, value) tuples
+    """
+    if file_format == 'csv':
+        for line, row in enumerate(csv.DictReader(source), 2):
+            if date_column not in row or value_column not in row:
+                raise ValueError('the CSV header has no {} or {} column'.format(date_column, value_column))
+            yield line, row[date_column], row[value_column]
+        return
+    for line, text in enumerate(source, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as err:
+            raise ValueError('line {}: invalid JSON: {}'.format(line, err))
+        if not isinstance(row, dict) or date_column not in row or value_column not in row:
+            raise ValueError('line {} has no {} or {} field'.format(line, date_column, value_column))
+        yield line, row[date_column], row[value_column]
+
+
+def convert(source, path, file_format, date_column='date', value_column='value', date_format='ordinal'):
+    """
+    Convert a CSV or NDJSON ledger into a ledger file
+    :param source: Iterable of the lines of the ledger, such as a file
+    :param path: Path of the ledger file to write
+    :param file_format: 'csv' or 'ndjson'
+    :param date_column: Name of the column or field of the dates
+    :param value_column: Name of the column or field of the cash flows
+    :param date_format: What integer day numbers count from, 'ordinal' or 'epoch'
+    :return: Number of rows written
+    :raises ValueError: if a row cannot be converted, naming its line. The ledger file is removed.
+    """
+    rows = read_rows(source, file_format, date_column, value_column)
+    with ledger_file.LedgerWriter(path) as writer:
+        while True:
+            batch = list(itertools.islice(rows, BATCH_ROWS))
+            if not batch:
+                break
+            values = []
+            ordinals = []
+            for line, date, value in batch:
+                try:
+                    ordinals.append(day_ordinal(date, date_format))
+                    values.append(float(value))
+                except (TypeError, ValueError) as err:
+                    raise ValueError('line {}: {}'.format(line, err))
+            writer.append(values, ordinals)
+        return writer.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="CSV or NDJSON ledger, '-' for stdin")
+    parser.add_argument('output', help='ledger file to write')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help='format of the input, defaults to its extension')
+    parser.add_argument('--date-column', default='date', help='column or field of the dates')
+    parser.add_argument('--value-column', default='value', help='column or field of the cash flows')
+    parser.add_argument('--date-format', choices=['ordinal', 'epoch'], default='ordinal',
+                        help='what integer day numbers count from')
+    options = parser.parse_args()
+
+    file_format = options.format
+    if file_format is None:
+        extension = os.path.splitext(options.input)[1].lower()
+        file_format = 'csv' if extension == '.csv' else 'ndjson' if extension in ('.ndjson', '.jsonl') else None
+    if file_format is None:
+        parser.error('cannot tell the format of {}, use --format'.format(options.input))
+
+    start = time.perf_counter()
+    source = sys.stdin if options.input == '-' else open(options.input, newline='')
+    try:
+        rows = convert(source, options.output, file_format, options.date_column, options.value_column,
+                       options.date_format)
+    except ValueError as err:
+        parser.exit(1, '{}: error: {}\n'.format(parser.prog, err))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print('{} rows written to {} in {:.2f} s'.format(rows, options.output, time.perf_counter() - start),
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
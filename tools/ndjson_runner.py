@@ -0,0 +1,160 @@
+"""
+Offline batch runner for files of financial function requests.
+
+Reads an NDJSON file with one {"function_name", "args"} request per line and evaluates them with
+wrapper_handler.financial_functions_handler, the code behind the Lambda functions. Lines are sent to a pool of worker
+processes in chunks, and each chunk is evaluated as one batch request, so identical requests are computed once and
+requests for the same periodic function are vectorized. The output NDJSON file has one {"result"} or {"error"} line
+per request line, in input order. A request line may carry an "id", which is copied to its output line.
+
+Only a bounded number of chunks is in flight at any time, so files of any size are processed in constant memory.
+
+Usage:
+    python tools/ndjson_runner.py requests.ndjson results.ndjson [--workers 4] [--chunk-size 1000]
+
+Use - for stdin or stdout. Throughput and error counts are reported on stderr.
+"""
+from __future__ import print_function
+import argparse
+import collections
+import concurrent.futures
+import io
+import itertools
+import json
+import os
+import sys
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'financial_functions')
+
+# Statistics of a run: the number of request lines, how many of them failed and the duration in seconds
+RunStats = collections.namedtuple('RunStats', ['records', 'errors', 'seconds'])
+
+
+def load_handler():
+    """
+    The wrapper handler, imported from the application directory like in the Lambda functions
+    """
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    import wrapper_handler
+    return wrapper_handler.financial_functions_handler
+
+
+def evaluate_chunk(lines):
+    """
+    Evaluate a chunk of request lines as one batch request
+    :param lines: List of NDJSON request lines
+    :return: Tuple of the output lines joined into one string and the number of failed requests
+    """
+    handler = load_handler()
+    outputs = [None] * len(lines)
+    ids = {}
+    requests = []
+    positions = []
+    for index, line in enumerate(lines):
+        try:
+            request = json.loads(line)
+        except ValueError as err:
+            outputs[index] = {'error': 'invalid JSON: {}'.format(err)}
+            continue
+        if isinstance(request, dict) and 'id' in request:
+            request = dict(request)
+            ids[index] = request.pop('id')
+        requests.append(request)
+        positions.append(index)
+
+    if requests:
+        response = handler({'requests': requests}, None)
+        results = response.get('results') or [response] * len(requests)
+        for index, result in zip(positions, results):
+            outputs[index] = result
+
+    errors = 0
+    text = io.StringIO()
+    for index, output in enumerate(outputs):
+        if 'error' in output:
+            errors += 1
+        if index in ids:
+            output = dict(output, id=ids[index])
+        text.write(json.dumps(output))
+        text.write('\n')
+    return text.getvalue(), errors
+
+
+def chunks(lines, chunk_size):
+    """
+    Split an iterable of lines into lists of at most chunk_size non-blank lines
+    """
+    lines = (line for line in lines if line.strip())
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(source, destination, workers=None, chunk_size=1000, max_pending=None):
+    """
+    Evaluate every request line of source and write the results to destination in input order
+    :param source: Iterable of NDJSON request lines, such as a file
+    :param destination: File the NDJSON result lines are written to
+    :param workers: Number of worker processes, 0 to evaluate in this process. Defaults to the number of CPUs.
+    :param chunk_size: Request lines per batch sent to a worker
+    :param max_pending: Maximum number of chunks submitted but not written yet. Defaults to twice the workers.
+    :return: RunStats of the run
+    """
+    start = time.perf_counter()
+    totals = {'records': 0, 'errors': 0}
+
+    def write(count, output):
+        text, errors = output
+        destination.write(text)
+        totals['records'] += count
+        totals['errors'] += errors
+
+    if workers == 0:
+        for chunk in chunks(source, chunk_size):
+            write(len(chunk), evaluate_chunk(chunk))
+    else:
+        workers = workers or os.cpu_count() or 1
+        max_pending = max_pending or 2 * workers
+        pending = collections.deque()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk in chunks(source, chunk_size):
+                if len(pending) >= max_pending:
+                    count, future = pending.popleft()
+                    write(count, future.result())
+                pending.append((len(chunk), executor.submit(evaluate_chunk, chunk)))
+            while pending:
+                count, future = pending.popleft()
+                write(count, future.result())
+    return RunStats(totals['records'], totals['errors'], time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="NDJSON file of requests, '-' for stdin")
+    parser.add_argument('output', help="NDJSON file for the results, '-' for stdout")
+    parser.add_argument('--workers', type=int, help='worker processes, 0 to run in this process, defaults to the CPUs')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='requests per batch sent to a worker')
+    parser.add_argument('--max-pending', type=int, help='chunks in flight, defaults to twice the workers')
+    options = parser.parse_args()
+
+    source = sys.stdin if options.input == '-' else open(options.input)
+    destination = sys.stdout if options.output == '-' else open(options.output, 'w')
+    try:
+        stats = run(source, destination, options.workers, options.chunk_size, options.max_pending)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if destination is not sys.stdout:
+            destination.close()
+
+    print('{} requests, {} errors in {:.2f} s ({:.0f} requests/s)'.format(
+        stats.records, stats.errors, stats.seconds, stats.records / stats.seconds if stats.seconds else 0),
+        file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()